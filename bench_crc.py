@@ -0,0 +1,270 @@
+"""
+Mikrobenchmarki CRC z zapisem wyników (JSON) i porównaniem z zapisanym wzorcem.
+
+Mierzone są funkcje modułu crc (ciągi '0'/'1' i ramki binarne), obie wersje
+bitowe (tylko dla małych danych) oraz silnik tablicowy i wsadowy (numpy),
+dla każdego rozmiaru danych i stopnia wielomianu.
+
+    python bench_crc.py -o base.json                    # pomiar, zapis wzorca
+    python bench_crc.py -o new.json --baseline base.json  # pomiar i porównanie
+    python bench_crc.py --compare base.json new.json    # tylko porównanie plików
+
+Porównanie kończy się kodem 1, gdy któryś przypadek jest wolniejszy od wzorca
+o więcej niż --threshold (domyślnie 10%).
+"""
+
+import argparse
+import json
+import platform
+import random
+import string
+import sys
+import time
+from crc import (text_to_bitstr, compute_crc_remainder, compute_crc_bytes, validate_crc, create_frame,
+                 build_frame, check_frame, get_engine, crc_batch, _compute_crc_remainder_bitwise,
+                 _validate_crc_bitwise)
+
+# Wielomiany (z wiodącą jedynką) dla typowych stopni; inne stopnie dostają x^n + 1
+POLYNOMIALS = {
+    3: '1011',
+    8: '1' + format(0x07, '08b'),
+    16: '1' + format(0x1021, '016b'),
+    32: '1' + format(0x04C11DB7, '032b'),
+    64: '1' + format(0x42F0E1EBA9EA3693, '064b'),
+}
+DEFAULT_SIZES = '16,1K,64K,1M'
+DEFAULT_DEGREES = '3,8,16,32,64'
+# Wersje bitowe są kwadratowe względem długości - mierzone tylko do tego rozmiaru
+BITWISE_MAX_BYTES = 4096
+# Ramki w pomiarze wsadowym (crc_batch): dane dzielone na wiersze tej długości
+BATCH_ROW_BYTES = 256
+DEFAULT_THRESHOLD = 0.10
+SCHEMA_VERSION = 1
+
+
+def parse_size(spec: str) -> int:
+    """'64', '1K', '4M' -> bajty."""
+    spec = spec.strip().upper()
+    units = {'K': 1024, 'M': 1024 * 1024}
+    if spec[-1:] in units:
+        return int(spec[:-1]) * units[spec[-1]]
+    return int(spec)
+
+
+def polynomial(degree: int) -> str:
+    return POLYNOMIALS.get(degree) or '1' + '0' * (degree - 1) + '1'
+
+
+def _payload(size: int) -> str:
+    rng = random.Random(size)
+    return ''.join(rng.choices(string.ascii_letters + string.digits, k=size))
+
+
+def _batch_case(text: str, poly: str):
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    data = text.encode()
+    rows = max(1, len(data) // BATCH_ROW_BYTES)
+    width = len(data) // rows
+    matrix = np.frombuffer(data[:rows * width], dtype=np.uint8).reshape(rows, width)
+    crc_batch(matrix, poly)  # tablice numpy liczone przed pomiarem
+    return lambda: crc_batch(matrix, poly)
+
+
+def build_cases(size: int, degree: int):
+    """Przypadki dla rozmiaru i stopnia: {nazwa: funkcja bez argumentów} (tylko dostępne)."""
+    text = _payload(size)
+    poly = polynomial(degree)
+    data = text.encode()
+    bits = text_to_bitstr(text)
+    frame_bits = create_frame(text, poly)
+    frame = build_frame(text, poly)
+    engine = get_engine(poly)
+    cases = {
+        'compute_crc_remainder': lambda: compute_crc_remainder(bits, poly),
+        'compute_crc_bytes': lambda: compute_crc_bytes(data, poly),
+        'validate_crc': lambda: validate_crc(frame_bits, poly),
+        'create_frame': lambda: create_frame(text, poly),
+        'build_frame': lambda: build_frame(text, poly),
+        'check_frame': lambda: check_frame(frame, poly),
+        'engine.remainder[slice1]': lambda: engine.remainder(data, 1),
+        'engine.remainder[slice4]': lambda: engine.remainder(data, 4),
+        'engine.remainder[slice8]': lambda: engine.remainder(data, 8),
+    }
+    if size <= BITWISE_MAX_BYTES:
+        cases['compute_crc_remainder_bitwise'] = lambda: _compute_crc_remainder_bitwise(bits, poly)
+        cases['validate_crc_bitwise'] = lambda: _validate_crc_bitwise(frame_bits, poly)
+    batch = _batch_case(text, poly)
+    if batch is not None:
+        cases['crc_batch'] = batch
+    return cases
+
+
+def measure(fn, min_time: float = 0.05, repeat: int = 5):
+    """
+    Jak timeit: liczba wywołań rośnie, aż jedna seria trwa min_time; potem
+    `repeat` serii. Zwraca (najlepszy, mediana) czas jednego wywołania i liczbę wywołań w serii.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed * 1.2) + 1))
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    times.sort()
+    return times[0], times[len(times) // 2], number
+
+
+def case_key(name: str, degree, size: int) -> str:
+    return f"{name}/deg{degree}/{size}B"
+
+
+def _result(name: str, degree, size: int, fn, min_time: float, repeat: int) -> dict:
+    best, median, number = measure(fn, min_time, repeat)
+    return {
+        'key': case_key(name, '-' if degree is None else degree, size),
+        'function': name,
+        'degree': degree,
+        'size': size,
+        'seconds': best,
+        'median': median,
+        'number': number,
+        'repeat': repeat,
+        'mb_per_s': size / best / 1e6 if best else None,
+    }
+
+
+def _iter_cases(sizes, degrees):
+    """(nazwa, stopień, rozmiar, funkcja); dane przygotowywane po kolei, nie wszystkie naraz."""
+    for degree in degrees:
+        for size in sizes:
+            for name, fn in build_cases(size, degree).items():
+                yield name, degree, size, fn
+    # text_to_bitstr nie zależy od wielomianu - mierzony raz na rozmiar
+    for size in sizes:
+        text = _payload(size)
+        yield 'text_to_bitstr', None, size, lambda: text_to_bitstr(text)
+
+
+def run_suite(sizes, degrees, name_filter=None, min_time=0.05, repeat=5, progress=None):
+    """Mierzy wszystkie przypadki; `progress(wynik)` dostaje każdy wynik od razu."""
+    results = []
+    for name, degree, size, fn in _iter_cases(sizes, degrees):
+        if name_filter and name_filter not in name:
+            continue
+        row = _result(name, degree, size, fn, min_time, repeat)
+        results.append(row)
+        if progress:
+            progress(row)
+    return results
+
+
+def environment():
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'numpy': numpy_version,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD):
+    """
+    Porównuje najlepsze czasy wspólnych przypadków. Zwraca listę
+    (klucz, czas wzorca, czas bieżący, stosunek, werdykt), werdykt: 'REGRESJA',
+    'poprawa' albo ''.
+    """
+    base = {row['key']: row for row in baseline['results']}
+    rows = []
+    for row in current['results']:
+        ref = base.get(row['key'])
+        if ref is None or not ref['seconds']:
+            continue
+        ratio = row['seconds'] / ref['seconds']
+        verdict = 'REGRESJA' if ratio > 1 + threshold else 'poprawa' if ratio < 1 - threshold else ''
+        rows.append((row['key'], ref['seconds'], row['seconds'], ratio, verdict))
+    return rows
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * scale >= 1:
+            return f"{seconds * scale:.2f} {unit}"
+    return f"{seconds * 1e9:.0f} ns"
+
+
+def print_comparison(rows, threshold: float) -> int:
+    """Drukuje porównanie; zwraca liczbę regresji."""
+    width = max((len(r[0]) for r in rows), default=10)
+    for key, base_s, cur_s, ratio, verdict in rows:
+        print(f"{key:<{width}}  {_format_time(base_s):>10} -> {_format_time(cur_s):>10}  x{ratio:5.2f}  {verdict}")
+    regressions = sum(1 for r in rows if r[4] == 'REGRESJA')
+    print(f"{len(rows)} przypadków, regresje (> {threshold:.0%}): {regressions}")
+    return regressions
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mikrobenchmarki CRC")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="rozmiary danych (np. 16,1K,64K,1M)")
+    parser.add_argument('--degrees', default=DEFAULT_DEGREES, help="stopnie wielomianów (3..64)")
+    parser.add_argument('--filter', default=None, help="tylko przypadki, których nazwa zawiera ten tekst")
+    parser.add_argument('--min-time', type=float, default=0.05, help="minimalny czas jednej serii (s)")
+    parser.add_argument('--repeat', type=int, default=5, help="liczba serii (wynik: najlepsza)")
+    parser.add_argument('-o', '--output', default=None, help="zapisz wyniki (JSON) do pliku")
+    parser.add_argument('--baseline', default=None, help="porównaj wyniki z zapisanym wzorcem")
+    parser.add_argument('--compare', nargs=2, metavar=('WZORZEC', 'WYNIKI'), default=None,
+                        help="porównaj dwa pliki wyników bez pomiaru")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="względne spowolnienie uznawane za regresję (0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, current = map(_load, args.compare)
+        return 1 if print_comparison(compare(baseline, current, args.threshold), args.threshold) else 0
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    degrees = [int(d) for d in args.degrees.split(',') if d.strip()]
+    if any(d < 1 for d in degrees) or any(s < 1 for s in sizes):
+        parser.error("rozmiary i stopnie muszą być dodatnie")
+
+    def progress(row):
+        mbps = f"{row['mb_per_s']:10.2f} MB/s" if row['mb_per_s'] else ''
+        print(f"{row['key']:<48} {_format_time(row['seconds']):>10} {mbps}", file=sys.stderr)
+
+    results = run_suite(sizes, degrees, args.filter, args.min_time, args.repeat, progress)
+    report = {'schema': SCHEMA_VERSION, 'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+    elif not args.baseline:
+        print(json.dumps(report, indent=1))
+    if args.baseline:
+        return 1 if print_comparison(compare(_load(args.baseline), report, args.threshold), args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
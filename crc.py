@@ -1,56 +1,705 @@
+import base64
+import struct
+from collections import namedtuple
+from functools import lru_cache
+
+# numpy potrzebne tylko do funkcji wsadowych (crc_batch) - ładowane przy pierwszym
+# użyciu, żeby nie wydłużać startu procesów węzłów
+np = None
+
+# Szerokość rejestru roboczego silnika tablicowego. Wielomiany węższe niż
+# 64 bity są przesuwane w górę, dzięki czemu slice-by-8 działa dla każdego
+# stopnia (także dla krótkich wielomianów z GUI, np. "1010").
+_MIN_REGISTER_WIDTH = 64
+
+_unpack_u32 = struct.Struct('>I').iter_unpack
+_unpack_u64 = struct.Struct('>Q').iter_unpack
+
+# Odwrócenie kolejności bitów w bajcie (dla refin)
+_REFLECT_BYTE = bytes(int(f'{b:08b}'[::-1], 2) for b in range(256))
+
+# Parametry CRC w modelu Rocksoft; `poly` bez wiodącej jedynki (jak w katalogach CRC)
+CrcSpec = namedtuple('CrcSpec', 'name width poly init refin refout xorout check')
+
+CRC_CATALOG = {spec.name: spec for spec in (
+    CrcSpec('CRC-8', 8, 0x07, 0x00, False, False, 0x00, 0xF4),
+    CrcSpec('CRC-16/CCITT', 16, 0x1021, 0xFFFF, False, False, 0x0000, 0x29B1),
+    CrcSpec('CRC-16/KERMIT', 16, 0x1021, 0x0000, True, True, 0x0000, 0x2189),
+    CrcSpec('CRC-32', 32, 0x04C11DB7, 0xFFFFFFFF, True, True, 0xFFFFFFFF, 0xCBF43926),
+    CrcSpec('CRC-32C', 32, 0x1EDC6F41, 0xFFFFFFFF, True, True, 0xFFFFFFFF, 0xE3069283),
+    CrcSpec('CRC-64', 64, 0x42F0E1EBA9EA3693, 0x0, False, False, 0x0, 0x6C40DF5F0B497347),
+    CrcSpec('CRC-64/XZ', 64, 0x42F0E1EBA9EA3693, 0xFFFFFFFFFFFFFFFF, True, True,
+            0xFFFFFFFFFFFFFFFF, 0x995DC9BBDF1939FA),
+)}
+
+
+def _reflect(value: int, width: int) -> int:
+    return int(format(value, f'0{width}b')[::-1], 2)
+
+
 def bytes_to_bitstr(b: bytes) -> str:
-    return ''.join(f'{byte:08b}' for byte in b)
+    if not b:
+        return ''
+    return format(int.from_bytes(b, 'big'), f'0{len(b) * 8}b')
 
 def text_to_bitstr(s: str) -> str:
     return bytes_to_bitstr(s.encode('utf-8'))
 
-def compute_crc_remainder(bits: str, poly: str) -> str:
+
+class CrcEngine:
+    """
+    Tablicowy silnik CRC (model Rocksoft: init, refin, refout, xorout) dla jednego wielomianu.
+
+    Tablice 256-elementowe są liczone raz przy tworzeniu silnika; `remainder`
+    przetwarza dane typu bytes po 8, 4 lub 1 bajcie na iterację. Silniki
+    pobiera się przez get_engine / compile_engine, które trzymają je w pamięci podręcznej.
+    """
+
+    def __init__(self, width: int, poly: int, init: int = 0, refin: bool = False,
+                 refout: bool = False, xorout: int = 0):
+        if width < 1:
+            raise ValueError(f"Nieprawidłowa szerokość CRC: {width}")
+
+        self.width = width
+        self.poly = poly & ((1 << width) - 1)
+        self.init = init
+        self.refin = refin
+        self.refout = refout
+        self.xorout = xorout
+        self.register_width = max(width, _MIN_REGISTER_WIDTH)
+        self.shift = self.register_width - width
+        self.mask = (1 << self.register_width) - 1
+        self.register_poly = self.poly << self.shift
+        self.register_init = (init << self.shift) & self.mask
+        self.tables = self._build_tables(8)
+        self.table = self.tables[0]
+
+    def _build_tables(self, slices: int):
+        """Buduje tablice T0..T(slices-1); Tk[b] = CRC bajtu b z k bajtami zer."""
+        top = 1 << (self.register_width - 1)
+        low_shift = self.register_width - 8
+        mask = self.mask
+        poly = self.register_poly
+
+        t0 = []
+        for b in range(256):
+            crc = b << low_shift
+            for _ in range(8):
+                crc = ((crc << 1) & mask) ^ poly if crc & top else (crc << 1) & mask
+            t0.append(crc)
+
+        tables = [t0]
+        for _ in range(1, slices):
+            prev = tables[-1]
+            tables.append([((c << 8) & mask) ^ t0[c >> low_shift] for c in prev])
+        return tables
+
+    def _update_bytewise(self, crc: int, data) -> int:
+        table = self.table
+        mask = self.mask
+        low_shift = self.register_width - 8
+        for byte in data:
+            crc = ((crc << 8) & mask) ^ table[(crc >> low_shift) ^ byte]
+        return crc
+
+    def _update_slice4(self, crc: int, data) -> int:
+        t0, t1, t2, t3 = self.tables[:4]
+        mask = self.mask
+        low_shift = self.register_width - 32
+        for (word,) in _unpack_u32(data):
+            idx = (crc >> low_shift) ^ word
+            crc = (((crc << 32) & mask)
+                   ^ t3[idx >> 24] ^ t2[(idx >> 16) & 0xFF]
+                   ^ t1[(idx >> 8) & 0xFF] ^ t0[idx & 0xFF])
+        return crc
+
+    def _update_slice8(self, crc: int, data) -> int:
+        t0, t1, t2, t3, t4, t5, t6, t7 = self.tables
+        mask = self.mask
+        low_shift = self.register_width - 64
+        for (word,) in _unpack_u64(data):
+            idx = (crc >> low_shift) ^ word
+            crc = (((crc << 64) & mask)
+                   ^ t7[idx >> 56] ^ t6[(idx >> 48) & 0xFF]
+                   ^ t5[(idx >> 40) & 0xFF] ^ t4[(idx >> 32) & 0xFF]
+                   ^ t3[(idx >> 24) & 0xFF] ^ t2[(idx >> 16) & 0xFF]
+                   ^ t1[(idx >> 8) & 0xFF] ^ t0[idx & 0xFF])
+        return crc
+
+    def update(self, crc: int, data, slices: int = 8) -> int:
+        """Przetwarza bajty `data`, zwraca nowy stan rejestru (wewnętrzny)."""
+        if self.refin:
+            data = bytes(data).translate(_REFLECT_BYTE)
+        view = memoryview(data).cast('B')
+        if slices == 8:
+            head = len(view) - len(view) % 8
+            crc = self._update_slice8(crc, view[:head])
+        elif slices == 4:
+            head = len(view) - len(view) % 4
+            crc = self._update_slice4(crc, view[:head])
+        elif slices == 1:
+            head = 0
+        else:
+            raise ValueError(f"Nieobsługiwany wariant slice-by-{slices}")
+        return self._update_bytewise(crc, view[head:])
+
+    def update_bits(self, crc: int, value: int, nbits: int) -> int:
+        """Przetwarza `nbits` najmłodszych bitów `value` (od najstarszego) bit po bicie."""
+        if self.refin:
+            raise ValueError("CRC z refin wymaga danych wyrównanych do bajtu")
+        top_shift = self.register_width - 1
+        mask = self.mask
+        poly = self.register_poly
+        for i in range(nbits - 1, -1, -1):
+            bit = ((crc >> top_shift) ^ (value >> i)) & 1
+            crc = (crc << 1) & mask
+            if bit:
+                crc ^= poly
+        return crc
+
+    def finalize(self, crc: int) -> int:
+        """Zamienia stan rejestru na resztę CRC o szerokości `width`."""
+        crc >>= self.shift
+        if self.refout:
+            crc = _reflect(crc, self.width)
+        return crc ^ self.xorout
+
+    def remainder(self, data: bytes, slices: int = 8) -> int:
+        """CRC danych; dla init = 0 i bez odbić to reszta z dzielenia data * x^width."""
+        return self.finalize(self.update(self.register_init, data, slices))
+
+    def remainder_bits(self, bits: str) -> int:
+        """CRC dla ciągu '0'/'1' dowolnej długości (pełne bajty tablicą, końcówka bit po bicie)."""
+        n = len(bits)
+        tail = n % 8
+        crc = self.register_init
+        if n >= 8:
+            crc = self.update(crc, int(bits[:n - tail], 2).to_bytes(n // 8, 'big'))
+        if tail:
+            crc = self.update_bits(crc, int(bits[n - tail:], 2), tail)
+        return self.finalize(crc)
+
+
+class Frame:
+    """
+    Ramka jako bajty + długość w bitach (bity MSB-first, dopełnienie zerami na końcu).
+
+    Zajmuje 8x mniej pamięci niż ciąg '0'/'1'; postać tekstowa służy tylko do wyświetlania.
+    """
+    __slots__ = ('data', 'bit_len')
+
+    def __init__(self, data=b'', bit_len=None):
+        self.data = bytearray(data)
+        self.bit_len = len(self.data) * 8 if bit_len is None else bit_len
+        if not 0 <= self.bit_len <= len(self.data) * 8:
+            raise ValueError(f"Długość ramki {self.bit_len} nie pasuje do {len(self.data)} bajtów")
+
+    @classmethod
+    def from_bitstr(cls, bits: str):
+        n = len(bits)
+        if not n:
+            return cls()
+        pad = -n % 8
+        return cls((int(bits, 2) << pad).to_bytes((n + pad) // 8, 'big'), n)
+
+    @classmethod
+    def from_int(cls, value: int, bit_len: int):
+        pad = -bit_len % 8
+        return cls((value << pad).to_bytes((bit_len + pad) // 8, 'big'), bit_len)
+
+    @classmethod
+    def from_base64(cls, payload: str, bit_len: int):
+        return cls(base64.b64decode(payload), bit_len)
+
+    def to_base64(self) -> str:
+        """Zwarta postać do przesłania w JSON (razem z `bit_len`)."""
+        return base64.b64encode(self.data).decode('ascii')
+
+    def to_int(self) -> int:
+        return int.from_bytes(self.data, 'big') >> (len(self.data) * 8 - self.bit_len)
+
+    def to_bitstr(self) -> str:
+        if not self.bit_len:
+            return ''
+        return format(self.to_int(), f'0{self.bit_len}b')
+
+    def tail(self, n: int) -> str:
+        """Ostatnie `n` bitów jako tekst (np. pole CRC do wyświetlenia)."""
+        n = min(n, self.bit_len)
+        if n <= 0:
+            return ''
+        start = (self.bit_len - n) // 8
+        end = (self.bit_len + 7) // 8
+        chunk = int.from_bytes(self.data[start:end], 'big') >> (end * 8 - self.bit_len)
+        return format(chunk & ((1 << n) - 1), f'0{n}b')
+
+    def bit(self, idx: int) -> int:
+        if not 0 <= idx < self.bit_len:
+            raise IndexError(idx)
+        return (self.data[idx >> 3] >> (7 - (idx & 7))) & 1
+
+    def flip_bit(self, idx: int):
+        """Odwraca bit na pozycji `idx` (liczone od lewej, jak w ciągu '0'/'1')."""
+        if not 0 <= idx < self.bit_len:
+            raise IndexError(idx)
+        self.data[idx >> 3] ^= 0x80 >> (idx & 7)
+
+    def copy(self):
+        return Frame(self.data, self.bit_len)
+
+    def __len__(self):
+        return self.bit_len
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def __eq__(self, other):
+        if not isinstance(other, Frame):
+            return NotImplemented
+        return self.bit_len == other.bit_len and self.to_int() == other.to_int()
+
+    def __str__(self):
+        return self.to_bitstr()
+
+    def __repr__(self):
+        return f"Frame(bit_len={self.bit_len}, data={bytes(self.data)!r})"
+
+
+class CrcStream:
+    """
+    Przyrostowe CRC: update(chunk) dla kolejnych porcji danych, digest() na końcu.
+
+    Wynik jest taki sam jak compute_crc_remainder dla całości, ale pamięć jest stała.
+    """
+    __slots__ = ('engine', '_crc', '_pending', '_pending_len')
+
+    def __init__(self, poly, data=b''):
+        self.engine = poly if isinstance(poly, CrcEngine) else get_engine(poly)
+        if self.engine is None:
+            raise ValueError(f"Wielomian {poly!r} nie ma wiodącej jedynki - brak trybu strumieniowego")
+        self._crc = self.engine.register_init
+        # bity z update_bits, które nie złożyły się jeszcze w pełny bajt
+        self._pending = 0
+        self._pending_len = 0
+        if data:
+            self.update(data)
+
+    @property
+    def width(self) -> int:
+        return self.engine.width
+
+    def _flush_pending(self):
+        if self._pending_len:
+            self._crc = self.engine.update_bits(self._crc, self._pending, self._pending_len)
+            self._pending = 0
+            self._pending_len = 0
+
+    def update(self, chunk):
+        """Dodaje bajty (bytes/bytearray/memoryview)."""
+        self._flush_pending()
+        self._crc = self.engine.update(self._crc, chunk)
+        return self
+
+    def update_bits(self, bits: str):
+        """Dodaje bity w postaci '0'/'1' (dowolna długość)."""
+        if not bits:
+            return self
+        value = (self._pending << len(bits)) | int(bits, 2)
+        nbits = self._pending_len + len(bits)
+        tail = nbits % 8
+        if nbits >= 8:
+            head = value >> tail
+            self._crc = self.engine.update(self._crc, head.to_bytes(nbits // 8, 'big'))
+        self._pending = value & ((1 << tail) - 1)
+        self._pending_len = tail
+        return self
+
+    def digest(self) -> int:
+        """Reszta CRC dla wszystkich dotychczasowych danych."""
+        crc = self._crc
+        if self._pending_len:
+            crc = self.engine.update_bits(crc, self._pending, self._pending_len)
+        return self.engine.finalize(crc)
+
+    def bitdigest(self) -> str:
+        """Reszta jako ciąg '0'/'1' (jak compute_crc_remainder)."""
+        return format(self.digest(), f'0{self.engine.width}b')
+
+    def copy(self):
+        other = CrcStream.__new__(CrcStream)
+        other.engine = self.engine
+        other._crc = self._crc
+        other._pending = self._pending
+        other._pending_len = self._pending_len
+        return other
+
+
+class FrameValidator:
+    """
+    Sprawdzanie ramki w trakcie odbioru (bajty jak w Frame.data, długość w bitach znana z nagłówka).
+
+    Część danych trafia od razu do CrcStream; buforowane jest tylko pole CRC na końcu.
+    """
+
+    def __init__(self, poly, bit_len: int):
+        self.stream = CrcStream(poly)
+        self.bit_len = bit_len
+        self.data_len = bit_len - self.stream.width
+        self._data_bytes = max(self.data_len, 0) // 8
+        self._received = 0
+        self._tail = bytearray()
+
+    def update(self, chunk):
+        view = memoryview(chunk).cast('B')
+        take = min(len(view), max(self._data_bytes - self._received, 0))
+        if take:
+            self.stream.update(view[:take])
+        self._tail += view[take:]
+        self._received += len(view)
+        return self
+
+    def is_valid(self) -> bool:
+        """Wynik po odebraniu całej ramki (tak samo jak check_frame)."""
+        if self._received * 8 < self.bit_len:
+            raise ValueError("Ramka nie została odebrana w całości")
+        tail_bits = self.bit_len - self._data_bytes * 8
+        tail_bytes = (tail_bits + 7) // 8
+        tail = int.from_bytes(self._tail[:tail_bytes], 'big') >> (tail_bytes * 8 - tail_bits)
+        width = self.stream.width
+        if self.data_len < 0:
+            return tail == 0
+        stream = self.stream.copy()
+        extra = tail_bits - width
+        if extra:
+            stream.update_bits(format(tail >> width, f'0{extra}b'))
+        return stream.digest() == tail & ((1 << width) - 1)
+
+
+def find_crc(name: str):
+    """Zwraca CrcSpec z katalogu (nazwa bez rozróżniania wielkości liter) albo None."""
+    return _CATALOG_BY_KEY.get(name.strip().upper())
+
+_CATALOG_BY_KEY = {name.upper(): spec for name, spec in CRC_CATALOG.items()}
+
+
+@lru_cache(maxsize=128)
+def compile_engine(width: int, poly: int, init: int = 0, refin: bool = False,
+                   refout: bool = False, xorout: int = 0) -> CrcEngine:
+    """Silnik dla zestawu parametrów; pamięć podręczna LRU, więc tablice liczone są raz."""
+    return CrcEngine(width, poly, init, refin, refout, xorout)
+
+
+@lru_cache(maxsize=256)
+def get_engine(poly: str):
+    """
+    Zwraca silnik dla nazwy z katalogu (np. "CRC-32") albo wielomianu '0'/'1' z wiodącą
+    jedynką. None oznacza wielomian bez wiodącej jedynki, liczony starą metodą bitową.
+    """
+    spec = find_crc(poly)
+    if spec is not None:
+        return compile_engine(spec.width, spec.poly, spec.init, spec.refin, spec.refout, spec.xorout)
+    poly_int = int(poly, 2)  # nieprawidłowe znaki -> ValueError jak wcześniej
+    width = len(poly) - 1
+    if width < 1 or poly_int.bit_length() != len(poly):
+        return None
+    return compile_engine(width, poly_int)
+
+
+def crc_width(poly: str) -> int:
+    """Liczba bitów pola CRC dla wielomianu albo nazwy z katalogu."""
+    spec = find_crc(poly)
+    return spec.width if spec is not None else len(poly) - 1
+
+
+def _compute_crc_remainder_bitwise(bits: str, poly: str) -> str:
     """Oblicza resztę CRC używając XOR."""
     degree = len(poly) - 1
     poly_int = int(poly, 2)
-    
+
     # Konwertuj dane na liczbę i dołącz zera
     dividend = int(bits + "0" * degree, 2)
-    
+
     # XOR z wielomianem
     for i in range(len(bits)):
         # Sprawdź bit na pozycji i (od lewej)
         if dividend & (1 << (len(bits) + degree - 1 - i)):
             dividend ^= (poly_int << (len(bits) + degree - 1 - i - degree))
-    
+
     # Zwróć resztę jako bity
     return format(dividend, f'0{degree}b')
 
+def compute_crc_remainder(bits: str, poly: str) -> str:
+    """Oblicza resztę CRC (silnik tablicowy, wynik jak w wersji bitowej)."""
+    engine = get_engine(poly)
+    if engine is None:
+        return _compute_crc_remainder_bitwise(bits, poly)
+    return format(engine.remainder_bits(bits), f'0{engine.width}b')
+
+def compute_crc_bytes(data: bytes, poly: str) -> str:
+    """Reszta CRC liczona bezpośrednio na bajtach (bez konwersji na '0'/'1')."""
+    engine = get_engine(poly)
+    if engine is None:
+        return _compute_crc_remainder_bitwise(bytes_to_bitstr(data), poly)
+    return format(engine.remainder(data), f'0{engine.width}b')
+
 def create_frame(text: str, poly: str) -> str:
     """
     Nadawca:
     data_bits + crc_bits
     """
-    data_bits = text_to_bitstr(text)
-    crc_bits = compute_crc_remainder(data_bits, poly)
-    return data_bits + crc_bits
+    data = text.encode('utf-8')
+    return bytes_to_bitstr(data) + compute_crc_bytes(data, poly)
 
-def validate_crc(frame_with_checksum: str, polynomial: str) -> bool:
+def build_frame(text: str, poly: str) -> Frame:
+    """
+    Nadawca (postać binarna):
+    data_bytes + crc_bits
+    """
+    data = text.encode('utf-8')
+    engine = get_engine(poly)
+    if engine is None:
+        return Frame.from_bitstr(create_frame(text, poly))
+    width = engine.width
+    crc = engine.remainder(data)
+    pad = -width % 8
+    return Frame(data + (crc << pad).to_bytes((width + pad) // 8, 'big'), len(data) * 8 + width)
+
+def _validate_crc_bitwise(frame_with_checksum: str, polynomial: str) -> bool:
     """Sprawdza CRC używając XOR."""
     degree = len(polynomial) - 1
     poly_int = int(polynomial, 2)
-    
+
     # Konwertuj całą ramkę na liczbę
     dividend = int(frame_with_checksum, 2)
-    
+
     # XOR z wielomianem
     for i in range(len(frame_with_checksum) - degree):
         if dividend & (1 << (len(frame_with_checksum) - 1 - i)):
             dividend ^= (poly_int << (len(frame_with_checksum) - 1 - i - degree))
-    
+
     # Sprawdź czy reszta to zera
     remainder = dividend & ((1 << degree) - 1)
     return remainder == 0
 
-def check_frame(frame_bits: str, poly: str) -> bool:
+def validate_crc(frame_with_checksum: str, polynomial: str) -> bool:
+    """Sprawdza CRC: ramka = dane * x^n + crc, więc wystarczy porównać crc(dane) z końcówką."""
+    engine = get_engine(polynomial)
+    if engine is None:
+        return _validate_crc_bitwise(frame_with_checksum, polynomial)
+
+    degree = engine.width
+    data_len = len(frame_with_checksum) - degree
+    if data_len < 0:
+        return int(frame_with_checksum, 2) == 0
+    expected = engine.remainder_bits(frame_with_checksum[:data_len])
+    return expected == int(frame_with_checksum[data_len:], 2)
+
+def _validate_frame(frame: Frame, poly: str) -> bool:
+    """Sprawdza CRC ramki binarnej; dane wyrównane do bajtu idą prosto do silnika."""
+    engine = get_engine(poly)
+    if engine is None:
+        return _validate_crc_bitwise(frame.to_bitstr(), poly)
+
+    degree = engine.width
+    data_len = frame.bit_len - degree
+    if data_len < 0 or data_len % 8:
+        return validate_crc(frame.to_bitstr(), poly)
+    split = data_len // 8
+    expected = engine.remainder(memoryview(frame.data)[:split])
+    end = (frame.bit_len + 7) // 8
+    actual = int.from_bytes(frame.data[split:end], 'big') >> (end * 8 - frame.bit_len)
+    return expected == actual
+
+def check_frame(frame_bits, poly: str) -> bool:
     """
     Odbiorca:
     dzieli CAŁĄ ramkę (data + crc)
     Jeśli ramka jest OK, remainder powinien być ALL ZEROS
+    Przyjmuje Frame albo ciąg '0'/'1'.
     """
+    if isinstance(frame_bits, Frame):
+        return _validate_frame(frame_bits, poly)
     return validate_crc(frame_bits, poly)
+
+
+# --- Wsadowe CRC (NumPy) ---------------------------------------------------
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("Wsadowe CRC wymaga pakietu numpy") from None
+        np = numpy
+
+
+def _np_tables(engine: CrcEngine):
+    """Tablice silnika jako uint64 (liczone raz na silnik)."""
+    tables = getattr(engine, '_np_tables', None)
+    if tables is None:
+        tables = np.array(engine.tables, dtype=np.uint64)
+        engine._np_tables = tables
+    return tables
+
+
+def _np_reflect(values, width: int):
+    """Odwraca kolejność `width` najmłodszych bitów każdego elementu uint64."""
+    reflect = np.frombuffer(_REFLECT_BYTE, dtype=np.uint8)
+    as_bytes = values.astype('>u8').view(np.uint8)
+    return reflect[as_bytes].view('<u8').astype(np.uint64) >> np.uint64(64 - width)
+
+
+def pack_frames(frames):
+    """
+    Pakuje ramki do jednego bufora.
+
+    Zwraca (bufor uint8, długości w bajtach, długości w bitach); ramka i
+    zajmuje ceil(bit_len / 8) bajtów, kolejne ramki leżą jedna za drugą.
+    """
+    _require_numpy()
+    frames = [f if isinstance(f, Frame) else Frame.from_bitstr(f) for f in frames]
+    lengths = np.fromiter(((f.bit_len + 7) // 8 for f in frames), dtype=np.int64, count=len(frames))
+    bit_lens = np.fromiter((f.bit_len for f in frames), dtype=np.int64, count=len(frames))
+    buffer = np.frombuffer(b''.join(bytes(f.data[:(f.bit_len + 7) // 8]) for f in frames), dtype=np.uint8)
+    return buffer, lengths, bit_lens
+
+
+def crc_batch(data, poly: str, lengths=None):
+    """
+    CRC wielu ramek naraz (wynik identyczny z CrcEngine.remainder dla każdej z nich).
+
+    data: tablica 2D uint8 (ramki równej długości, po wierszu) albo bufor 1D
+    z ramkami zmiennej długości opisanymi przez `lengths` (w bajtach).
+    Zwraca tablicę uint64 z resztami.
+    """
+    _require_numpy()
+    engine = get_engine(poly)
+    data = np.asarray(data, dtype=np.uint8)
+    if lengths is None:
+        if data.ndim != 2:
+            raise ValueError("Bez `lengths` dane muszą być tablicą 2D (ramki równej długości)")
+        lengths = np.full(data.shape[0], data.shape[1], dtype=np.int64)
+        matrix, order = data, None
+    else:
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if lengths.sum() != data.size:
+            raise ValueError("Suma długości nie zgadza się z rozmiarem bufora")
+        # Sortowanie malejąco po długości: w każdym kroku aktywne są wiersze 0..k
+        order = np.argsort(-lengths, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        lengths = lengths[order]
+        width = int(lengths[0]) if len(lengths) else 0
+        width += -width % 8
+        matrix = np.zeros((len(lengths), width), dtype=np.uint8)
+        cols = np.arange(width)
+        mask = cols[None, :] < lengths[:, None]
+        matrix[mask] = data[(offsets[order][:, None] + cols[None, :])[mask]]
+
+    if engine is None or engine.width > 64:
+        # Stara metoda bitowa albo szerokość > 64: pętla po ramkach (wynik ten sam)
+        out = np.zeros(len(lengths), dtype=object)
+        for i, n in enumerate(lengths):
+            row = matrix[i, :n].tobytes()
+            out[i] = engine.remainder(row) if engine is not None else int(compute_crc_bytes(row, poly), 2)
+        return out if order is None else out[np.argsort(order)]
+
+    rem = _crc_batch_matrix(engine, matrix, lengths)
+    if order is not None:
+        restored = np.empty_like(rem)
+        restored[order] = rem
+        rem = restored
+    return rem
+
+
+def _crc_batch_matrix(engine: CrcEngine, matrix, lengths):
+    """Rdzeń wsadowy: slice-by-8 po kolumnach macierzy, końcówki bajt po bajcie."""
+    t = _np_tables(engine)
+    n, cols = matrix.shape
+    if engine.refin:
+        matrix = np.frombuffer(_REFLECT_BYTE, dtype=np.uint8)[matrix]
+    crc = np.full(n, engine.register_init, dtype=np.uint64)
+    sh = [np.uint64(8 * k) for k in range(8)]
+    ff = np.uint64(0xFF)
+
+    heads = lengths // 8
+    padded = cols + (-cols % 8)
+    if padded != cols:
+        matrix = np.concatenate((matrix, np.zeros((n, padded - cols), dtype=np.uint8)), axis=1)
+    words = np.ascontiguousarray(matrix).view('>u8').astype(np.uint64)
+    # aktywne[k] = liczba wierszy (z początku, bo posortowane) z co najmniej k+1 pełnymi słowami
+    uniform = bool((lengths == lengths[0]).all()) if n else True
+    for k in range(int(heads.max()) if n else 0):
+        a = n if uniform else int(np.count_nonzero(heads > k))
+        idx = crc[:a] ^ words[:a, k]
+        crc[:a] = (t[7][idx >> sh[7]] ^ t[6][(idx >> sh[6]) & ff]
+                   ^ t[5][(idx >> sh[5]) & ff] ^ t[4][(idx >> sh[4]) & ff]
+                   ^ t[3][(idx >> sh[3]) & ff] ^ t[2][(idx >> sh[2]) & ff]
+                   ^ t[1][(idx >> sh[1]) & ff] ^ t[0][idx & ff])
+
+    tails = lengths % 8
+    rows = np.arange(n)
+    for j in range(int(tails.max()) if n else 0):
+        sel = rows[tails > j]
+        byte = matrix[sel, heads[sel] * 8 + j].astype(np.uint64)
+        c = crc[sel]
+        crc[sel] = (c << sh[1]) ^ t[0][(c >> sh[7]) ^ byte]
+
+    crc >>= np.uint64(engine.shift)
+    if engine.refout:
+        crc = _np_reflect(crc, engine.width)
+    return crc ^ np.uint64(engine.xorout)
+
+
+def check_frames_batch(frames, poly: str, bit_lens=None, lengths=None):
+    """
+    Odbiorca, wersja wsadowa: tablica bool jak check_frame dla każdej ramki.
+
+    frames: lista Frame / ciągów '0'/'1' albo bufor z pack_frames (wtedy
+    potrzebne `bit_lens` i `lengths`).
+    """
+    _require_numpy()
+    if bit_lens is None:
+        buffer, lengths, bit_lens = pack_frames(frames)
+    else:
+        buffer = np.asarray(frames, dtype=np.uint8)
+        bit_lens = np.asarray(bit_lens, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+    n = len(bit_lens)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+    engine = get_engine(poly)
+    result = np.zeros(n, dtype=bool)
+    if not n:
+        return result
+
+    width = crc_width(poly)
+    data_bits = bit_lens - width
+    fast = (data_bits >= 0) & (data_bits % 8 == 0)
+    if engine is None or engine.width > 64:
+        fast[:] = False
+
+    # Ramki nietypowe (dane niewyrównane do bajtu, stara metoda) - pojedynczo
+    for i in np.flatnonzero(~fast):
+        raw = buffer[offsets[i]:offsets[i] + lengths[i]].tobytes()
+        result[i] = check_frame(Frame(raw, int(bit_lens[i])), poly)
+
+    idx = np.flatnonzero(fast)
+    if not len(idx):
+        return result
+    data_bytes = data_bits[idx] // 8
+    starts = offsets[idx]
+    # Bufor danych (bez pola CRC) dla ramek wyrównanych
+    total = int(data_bytes.sum())
+    data_starts = np.concatenate(([0], np.cumsum(data_bytes)[:-1]))
+    gather = np.repeat(starts - data_starts, data_bytes) + np.arange(total)
+    expected = crc_batch(buffer[gather], poly, lengths=data_bytes)
+
+    # Pole CRC: kolejne ceil(width / 8) bajtów po danych, wyrównane do lewej
+    field = (width + 7) // 8
+    pos = (starts + data_bytes)[:, None] + np.arange(field)[None, :]
+    actual = np.zeros(len(idx), dtype=np.uint64)
+    for k in range(field):
+        actual = (actual << np.uint64(8)) | buffer[pos[:, k]].astype(np.uint64)
+    actual >>= np.uint64(field * 8 - width)
+    result[idx] = expected == actual
+    return result
@@ -1,5 +1,134 @@
 from PyQt5 import QtWidgets, QtGui, QtCore
+from array import array
+from collections import defaultdict
+from itertools import compress
 import math
+import time
+
+# Bok komórki siatki do trafień myszą (px)
+HIT_GRID_CELL = 24
+# Kliknięcie bliżej niż tyle pikseli od łącza przełącza łącze
+EDGE_HIT_DISTANCE = 6
+# Mniejsze węzły (duże sieci) rysowane są bez numeru
+LABEL_MIN_RADIUS = 8
+# Powyżej tylu łączy warstwa łączy jest rysowana bez wygładzania (kilkukrotnie szybciej)
+EDGE_ANTIALIAS_LIMIT = 2000
+# Margines obszaru odświeżanego wokół animacji (aura, tekst nad pakietem)
+ANIMATION_MARGIN = 50
+# Wspólny zegar animacji: co tyle ms jedna klatka dla wszystkich animacji
+FRAME_MS = 30
+# Najwięcej trwających animacji naraz - przy przepełnieniu znikają najstarsze
+MAX_ANIMATIONS = 256
+# Przy większej liczbie animacji klatka odświeża cały widżet zamiast sumy prostokątów
+FULL_UPDATE_ANIMATIONS = 24
+
+_PACKET = 0
+_ERROR = 1
+
+_NODE = 0
+_EDGE = 1
+
+
+class _SpatialGrid:
+    """Siatka kubełków: element trafia do komórek, przez które przechodzi; zapytanie czyta kilka komórek."""
+
+    def __init__(self, cell: int):
+        self.cell = cell
+        self.cells = defaultdict(list)
+
+    def add_point(self, key, x, y, r):
+        c = self.cell
+        for cx in range(int((x - r) // c), int((x + r) // c) + 1):
+            for cy in range(int((y - r) // c), int((y + r) // c) + 1):
+                self.cells[(cx, cy)].append(key)
+
+    def add_segment(self, key, x1, y1, x2, y2):
+        """Przejście po komórkach odcinka (Amanatides-Woo) - bez pomijania narożników."""
+        c = self.cell
+        cx, cy = int(x1 // c), int(y1 // c)
+        ex, ey = int(x2 // c), int(y2 // c)
+        dx, dy = x2 - x1, y2 - y1
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        t_max_x = ((cx + (step_x > 0)) * c - x1) / dx if dx else math.inf
+        t_max_y = ((cy + (step_y > 0)) * c - y1) / dy if dy else math.inf
+        t_delta_x = c / abs(dx) if dx else math.inf
+        t_delta_y = c / abs(dy) if dy else math.inf
+        self.cells[(cx, cy)].append(key)
+        for _ in range(abs(ex - cx) + abs(ey - cy)):
+            if t_max_x < t_max_y:
+                cx += step_x
+                t_max_x += t_delta_x
+            else:
+                cy += step_y
+                t_max_y += t_delta_y
+            self.cells[(cx, cy)].append(key)
+
+    def query(self, x, y, r, kind):
+        """Elementy rodzaju `kind` z komórek pokrywających kwadrat (x±r, y±r)."""
+        c = self.cell
+        found = []
+        seen = set()
+        for cx in range(int((x - r) // c), int((x + r) // c) + 1):
+            for cy in range(int((y - r) // c), int((y + r) // c) + 1):
+                for k, item in self.cells.get((cx, cy), ()):
+                    if k == kind and item not in seen:
+                        seen.add(item)
+                        found.append(item)
+        return found
+
+
+class _AnimationTable:
+    """
+    Trwające animacje w zwartych tablicach (array): rodzaj, węzły, początek i
+    czas trwania (s, zegar monotoniczny). Postęp liczony jest z czasu, więc
+    pominięta klatka nie spowalnia animacji. Etykiety (wiadomość, CRC) w liście.
+    """
+
+    def __init__(self, capacity: int = MAX_ANIMATIONS):
+        self.capacity = capacity
+        self.kind = array('b')
+        self.src = array('i')
+        self.dst = array('i')
+        self.start = array('d')
+        self.duration = array('d')
+        self.label = []
+        self.dropped = 0  # animacje usunięte przez przepełnienie
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, kind, src, dst, start, duration, label=None):
+        if len(self.kind) >= self.capacity:
+            for column in (self.kind, self.src, self.dst, self.start, self.duration, self.label):
+                del column[0]
+            self.dropped += 1
+        self.kind.append(kind)
+        self.src.append(src)
+        self.dst.append(dst)
+        self.start.append(start)
+        self.duration.append(max(duration, 1e-3))
+        self.label.append(label)
+
+    def started(self, now):
+        """(rodzaj, src, dst, postęp, etykieta) animacji, które już się zaczęły."""
+        for i in range(len(self.kind)):
+            progress = (now - self.start[i]) / self.duration[i]
+            if progress >= 0:
+                yield self.kind[i], self.src[i], self.dst[i], min(progress, 1.0), self.label[i]
+
+    def prune(self, now):
+        """Usuwa zakończone animacje."""
+        keep = [now < self.start[i] + self.duration[i] for i in range(len(self.kind))]
+        if all(keep):
+            return
+        self.kind = array('b', compress(self.kind, keep))
+        self.src = array('i', compress(self.src, keep))
+        self.dst = array('i', compress(self.dst, keep))
+        self.start = array('d', compress(self.start, keep))
+        self.duration = array('d', compress(self.duration, keep))
+        self.label = list(compress(self.label, keep))
+
 
 class GraphWidget(QtWidgets.QWidget):
     node_clicked = QtCore.pyqtSignal(int)
@@ -13,27 +142,20 @@ class GraphWidget(QtWidgets.QWidget):
         self.center = None
         self.positions = {}
         self.edges = {}  # key (a,b) with a<b -> active bool
+        # Warstwy statyczne i siatka trafień - None znaczy "do przeliczenia"
+        self._edge_layer = None
+        self._node_layer = None
+        self._index = None
         self.init_positions()
+        self.init_edges()
         self.setMinimumSize(600, 600)
         
-        # Animation state
-        self.animation_active = False
-        self.animation_progress = 0.0  # 0 to 1
-        self.animation_from = None
-        self.animation_to = None
-        self.animation_timer = QtCore.QTimer()
+        # Animation state - przesył pakietów i błędy węzłów w jednej tablicy,
+        # wszystkie przesuwane jednym zegarem (timer działa tylko, gdy coś trwa)
+        self.animations = _AnimationTable(MAX_ANIMATIONS)
+        self.animation_timer = QtCore.QTimer(self)
+        self.animation_timer.setInterval(FRAME_MS)
         self.animation_timer.timeout.connect(self.update_animation)
-        self.animation_duration = 500  # ms
-        self.animation_message = ""  # Message being sent
-        self.animation_crc = ""  # CRC being sent
-        
-        # Error animation state
-        self.error_animation_node = None
-        self.error_animation_active = False
-        self.error_animation_timer = QtCore.QTimer()
-        self.error_animation_timer.timeout.connect(self.update_error_animation)
-        self.error_animation_duration = 600  # ms
-        self.error_animation_progress = 0.0
         
         # Node error state - dict with node_id -> True/False for having errors
         self.node_errors = {i: False for i in range(self.n)}
@@ -49,7 +171,21 @@ class GraphWidget(QtWidgets.QWidget):
             x = cx + int(self.radius*math.cos(ang))
             y = cy + int(self.radius*math.sin(ang))
             self.positions[i] = (x,y)
-        # init fully connected edges
+        # Przy wielu węzłach koła maleją, żeby się nie nakładały
+        self.node_radius = max(3, min(20, int(math.pi * self.radius / self.n * 0.8)))
+        self.invalidate_layers(geometry=True)
+
+    def invalidate_layers(self, edges=True, nodes=True, geometry=False):
+        """Oznacza warstwy (i po zmianie położeń - siatkę trafień) do ponownego narysowania."""
+        if edges:
+            self._edge_layer = None
+        if nodes:
+            self._node_layer = None
+        if geometry:
+            self._index = None
+
+    def init_edges(self):
+        # init fully connected edges (tylko raz - zmiana rozmiaru okna nie resetuje łączy)
         self.edges = {}
         for i in range(self.n):
             for j in range(i+1, self.n):
@@ -60,118 +196,154 @@ class GraphWidget(QtWidgets.QWidget):
         super().resizeEvent(event)
 
     def paintEvent(self, event):
+        # Tło, łącza i węzły leżą w gotowych warstwach (QPixmap) - co klatkę
+        # rysowane są tylko elementy animowane i tylko w obszarze event.rect()
+        self._ensure_layers()
         p = QtGui.QPainter(self)
+        rect = event.rect()
+        self._blit(p, self._edge_layer, rect)
         p.setRenderHint(QtGui.QPainter.Antialiasing)
-        # background
-        p.fillRect(self.rect(), QtGui.QColor(30,30,30))
-        # draw edges
-        pen = QtGui.QPen()
-        pen.setWidth(2)
+
+        # Przesyłane pakiety; węzły biorące udział w animacjach zapamiętujemy z rolą
+        # (nadawca > odbiorca > błąd - jak wcześniej kolejność sprawdzania kolorów)
+        now = time.monotonic()
+        roles = {}
+        for kind, src, dst, progress, label in self.animations.started(now):
+            if progress >= 1.0:
+                continue
+            if kind == _PACKET:
+                self.draw_animation(p, src, dst, progress, label)
+                if roles.get(src, (-1,))[0] < 2:
+                    roles[src] = (2, 'from', progress)
+                if roles.get(dst, (-1,))[0] < 1:
+                    roles[dst] = (1, 'to', progress)
+            elif src not in roles:
+                roles[src] = (0, 'error', progress)
+
+        self._blit(p, self._node_layer, rect)
+        # Węzły animowane rysowane na warstwie węzłów
+        for i, (_, role, progress) in roles.items():
+            self._draw_node(p, i, self._node_color(i, role, progress), role, progress)
+
+    def _blit(self, p, pixmap, rect):
+        dpr = pixmap.devicePixelRatio()
+        source = QtCore.QRectF(rect.x() * dpr, rect.y() * dpr, rect.width() * dpr, rect.height() * dpr)
+        p.drawPixmap(QtCore.QRectF(rect), pixmap, source)
+
+    def _new_layer(self, fill):
+        dpr = self.devicePixelRatioF()
+        pixmap = QtGui.QPixmap(max(1, int(self.width() * dpr)), max(1, int(self.height() * dpr)))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(fill)
+        return pixmap
+
+    def _ensure_layers(self):
+        if self._edge_layer is None:
+            self._edge_layer = self._render_edges()
+        if self._node_layer is None:
+            self._node_layer = self._render_nodes()
+
+    def _render_edges(self):
+        """Warstwa tła i łączy - odświeżana tylko przy zmianie topologii albo rozmiaru."""
+        layer = self._new_layer(QtGui.QColor(30,30,30))
+        p = QtGui.QPainter(layer)
+        p.setRenderHint(QtGui.QPainter.Antialiasing, len(self.edges) <= EDGE_ANTIALIAS_LIMIT)
+        lines = {True: [], False: []}
         for (a,b),active in self.edges.items():
             x1,y1 = self.positions[a]
             x2,y2 = self.positions[b]
-            
-            # Highlight the edge being used for transmission
-            is_transmission_edge = (
-                self.animation_active and 
-                ((a == self.animation_from and b == self.animation_to) or 
-                 (b == self.animation_from and a == self.animation_to))
+            lines[active].append(QtCore.QLineF(x1,y1,x2,y2))
+        pen = QtGui.QPen()
+        pen.setWidth(2)
+        pen.setStyle(QtCore.Qt.DashLine)
+        pen.setColor(QtGui.QColor(90,90,90))
+        p.setPen(pen)
+        p.drawLines(lines[False])
+        pen.setStyle(QtCore.Qt.SolidLine)
+        pen.setColor(QtGui.QColor(160,160,160))
+        p.setPen(pen)
+        p.drawLines(lines[True])
+        p.end()
+        return layer
+
+    def _render_nodes(self):
+        """Warstwa węzłów w stanie spoczynku (kolor błędów, etykiety) - przezroczyste tło."""
+        layer = self._new_layer(QtCore.Qt.transparent)
+        p = QtGui.QPainter(layer)
+        p.setRenderHint(QtGui.QPainter.Antialiasing)
+        for i in self.positions:
+            self._draw_node(p, i, self._static_node_color(i))
+        p.end()
+        return layer
+
+    def _static_node_color(self, i):
+        if self.node_errors.get(i, False):
+            # Permanent red for nodes with errors
+            return QtGui.QColor(220, 80, 80)
+        # Normal color when no animation or errors
+        return QtGui.QColor(120, 200, 140)
+
+    def _node_color(self, i, role=None, progress=0.0):
+        # Determine node color based on state priority:
+        # 1. Animation (highest priority)
+        # 2. Node errors (red if has errors)
+        # 3. Normal state (green)
+        if role == 'from':
+            # Sender node - red/orange with pulsing effect
+            pulse = 0.5 + 0.5 * math.sin(progress * math.pi * 4)
+            return QtGui.QColor(
+                int(220 * pulse),
+                int(100 * pulse),
+                int(50 * pulse)
             )
-            
-            if is_transmission_edge:
-                # Animated edge highlighting
-                pen.setStyle(QtCore.Qt.SolidLine)
-                pen.setWidth(4)
-                glow_intensity = int(255 * (0.5 + 0.5 * math.sin(self.animation_progress * math.pi * 4)))
-                pen.setColor(QtGui.QColor(glow_intensity, 200, 50))
-            elif active:
-                pen.setStyle(QtCore.Qt.SolidLine)
-                pen.setWidth(2)
-                pen.setColor(QtGui.QColor(160,160,160))
-            else:
-                pen.setStyle(QtCore.Qt.DashLine)
-                pen.setWidth(2)
-                pen.setColor(QtGui.QColor(90,90,90))
-            p.setPen(pen)
-            p.drawLine(x1,y1,x2,y2)
-        
-        # Draw animation if active
-        if self.animation_active and self.animation_from is not None and self.animation_to is not None:
-            self.draw_animation(p)
-        
-        # draw nodes
-        for i,(x,y) in self.positions.items():
-            rect = QtCore.QRectF(x-self.node_radius, y-self.node_radius, self.node_radius*2, self.node_radius*2)
-            
-            # Determine node color based on state priority:
-            # 1. Animation (highest priority)
-            # 2. Node errors (red if has errors)
-            # 3. Normal state (green)
-            
-            if self.animation_active:
-                if i == self.animation_from:
-                    # Sender node - red/orange with pulsing effect
-                    pulse = 0.5 + 0.5 * math.sin(self.animation_progress * math.pi * 4)
-                    node_color = QtGui.QColor(
-                        int(220 * pulse),
-                        int(100 * pulse),
-                        int(50 * pulse)
-                    )
-                elif i == self.animation_to:
-                    # Receiver node - blue/cyan
-                    node_color = QtGui.QColor(50, 150, 220)
-                else:
-                    # Other nodes - check for errors
-                    if self.node_errors.get(i, False):
-                        node_color = QtGui.QColor(220, 80, 80)  # Red for error
-                    else:
-                        node_color = QtGui.QColor(120, 200, 140)
-            elif self.error_animation_active and i == self.error_animation_node:
-                # Error node - red with flash effect
-                flash = 0.5 + 0.5 * math.cos(self.error_animation_progress * math.pi * 3)
-                node_color = QtGui.QColor(
-                    int(220 + 35 * flash),
-                    int(100 - 100 * flash),
-                    int(50 - 50 * flash)
-                )
-            elif self.node_errors.get(i, False):
-                # Permanent red for nodes with errors
-                node_color = QtGui.QColor(220, 80, 80)
-            else:
-                # Normal color when no animation or errors
-                node_color = QtGui.QColor(120, 200, 140)
-            
-            p.setBrush(QtGui.QBrush(node_color))
-            p.setPen(QtGui.QPen(QtGui.QColor(200,200,200)))
-            p.drawEllipse(rect)
-            
-            # Draw aura around sender/receiver nodes during animation
-            if self.animation_active:
-                if i == self.animation_from:
-                    # Pulsing aura for sender
-                    aura_size = self.node_radius + 8 + int(5 * math.sin(self.animation_progress * math.pi * 4))
-                    aura_rect = QtCore.QRectF(x - aura_size, y - aura_size, aura_size * 2, aura_size * 2)
-                    aura_color = QtGui.QColor(220, 100, 50, 80)
-                    p.setPen(QtGui.QPen(aura_color, 2))
-                    p.setBrush(QtGui.QBrush(QtCore.Qt.NoBrush))
-                    p.drawEllipse(aura_rect)
-                elif i == self.animation_to:
-                    # Growing aura for receiver
-                    aura_size = self.node_radius + 8 + int(5 * self.animation_progress)
-                    aura_rect = QtCore.QRectF(x - aura_size, y - aura_size, aura_size * 2, aura_size * 2)
-                    aura_color = QtGui.QColor(50, 150, 220, int(100 * (1 - self.animation_progress)))
-                    p.setPen(QtGui.QPen(aura_color, 2))
-                    p.setBrush(QtGui.QBrush(QtCore.Qt.NoBrush))
-                    p.drawEllipse(aura_rect)
-            
-            # Draw error indicator (X) if node has errors
-            if self.node_errors.get(i, False):
-                error_size = self.node_radius - 5
-                p.setPen(QtGui.QPen(QtGui.QColor(255, 255, 255), 2))
-                p.drawLine(int(x - error_size), int(y - error_size), int(x + error_size), int(y + error_size))
-                p.drawLine(int(x - error_size), int(y + error_size), int(x + error_size), int(y - error_size))
-            
-            # label
+        if role == 'to':
+            # Receiver node - blue/cyan
+            return QtGui.QColor(50, 150, 220)
+        if role == 'error':
+            # Error node - red with flash effect
+            flash = 0.5 + 0.5 * math.cos(progress * math.pi * 3)
+            return QtGui.QColor(
+                int(220 + 35 * flash),
+                int(100 - 100 * flash),
+                int(50 - 50 * flash)
+            )
+        return self._static_node_color(i)
+
+    def _draw_node(self, p, i, node_color, role=None, progress=0.0):
+        x,y = self.positions[i]
+        rect = QtCore.QRectF(x-self.node_radius, y-self.node_radius, self.node_radius*2, self.node_radius*2)
+        p.setBrush(QtGui.QBrush(node_color))
+        p.setPen(QtGui.QPen(QtGui.QColor(200,200,200)))
+        p.drawEllipse(rect)
+
+        # Draw aura around sender/receiver nodes during animation
+        if role is not None:
+            if role == 'from':
+                # Pulsing aura for sender
+                aura_size = self.node_radius + 8 + int(5 * math.sin(progress * math.pi * 4))
+                aura_rect = QtCore.QRectF(x - aura_size, y - aura_size, aura_size * 2, aura_size * 2)
+                aura_color = QtGui.QColor(220, 100, 50, 80)
+                p.setPen(QtGui.QPen(aura_color, 2))
+                p.setBrush(QtGui.QBrush(QtCore.Qt.NoBrush))
+                p.drawEllipse(aura_rect)
+            elif role == 'to':
+                # Growing aura for receiver
+                aura_size = self.node_radius + 8 + int(5 * progress)
+                aura_rect = QtCore.QRectF(x - aura_size, y - aura_size, aura_size * 2, aura_size * 2)
+                aura_color = QtGui.QColor(50, 150, 220, int(100 * (1 - progress)))
+                p.setPen(QtGui.QPen(aura_color, 2))
+                p.setBrush(QtGui.QBrush(QtCore.Qt.NoBrush))
+                p.drawEllipse(aura_rect)
+
+        # Draw error indicator (X) if node has errors
+        if self.node_errors.get(i, False):
+            error_size = self.node_radius - 5
+            p.setPen(QtGui.QPen(QtGui.QColor(255, 255, 255), 2))
+            p.drawLine(int(x - error_size), int(y - error_size), int(x + error_size), int(y + error_size))
+            p.drawLine(int(x - error_size), int(y + error_size), int(x + error_size), int(y - error_size))
+
+        # label (małe węzły bez etykiety - i tak by się nie zmieściła)
+        if self.node_radius >= LABEL_MIN_RADIUS:
             p.setPen(QtGui.QPen(QtGui.QColor(20,20,20)))
             f = p.font(); f.setBold(True)
             p.setFont(f)
@@ -179,25 +351,41 @@ class GraphWidget(QtWidgets.QWidget):
 
     def mousePressEvent(self, event):
         pos = event.pos()
+        px, py = pos.x(), pos.y()
+        index = self._hit_index()
         # check nodes first
-        for i,(x,y) in self.positions.items():
-            dx = pos.x() - x; dy = pos.y() - y
-            if dx*dx + dy*dy <= self.node_radius*self.node_radius:
+        r2 = self.node_radius*self.node_radius
+        for i in index.query(px, py, 0, kind=_NODE):
+            x,y = self.positions[i]
+            dx = px - x; dy = py - y
+            if dx*dx + dy*dy <= r2:
                 self.node_clicked.emit(i)
                 return
         # otherwise check edges (nearest line)
-        for (a,b),active in list(self.edges.items()):
-            x1,y1 = self.positions[a]
-            x2,y2 = self.positions[b]
+        best = None
+        for key in index.query(px, py, EDGE_HIT_DISTANCE, kind=_EDGE):
+            x1,y1 = self.positions[key[0]]
+            x2,y2 = self.positions[key[1]]
             # distance from point to segment
-            dist = self._point_line_distance(pos.x(), pos.y(), x1,y1,x2,y2)
-            if dist < 6:
-                # toggle
-                new_state = not active
-                self.edges[(a,b)] = new_state
-                self.edge_toggled.emit(a,b,new_state)
-                self.update()
-                return
+            dist = self._point_line_distance(px, py, x1,y1,x2,y2)
+            if dist < EDGE_HIT_DISTANCE and (best is None or dist < best[0]):
+                best = (dist, key)
+        if best is not None:
+            # toggle
+            self.toggle_edge(*best[1])
+
+    def _hit_index(self):
+        """Siatka do trafień myszą; budowana przy pierwszym kliknięciu po zmianie rozmiaru."""
+        if self._index is None:
+            index = _SpatialGrid(HIT_GRID_CELL)
+            for i,(x,y) in self.positions.items():
+                index.add_point((_NODE, i), x, y, self.node_radius)
+            for a, b in self.edges:
+                x1,y1 = self.positions[a]
+                x2,y2 = self.positions[b]
+                index.add_segment((_EDGE, (a, b)), x1, y1, x2, y2)
+            self._index = index
+        return self._index
 
     def _point_line_distance(self, px,py, x1,y1,x2,y2):
         # distance from point p to segment (x1,y1)-(x2,y2)
@@ -209,42 +397,73 @@ class GraphWidget(QtWidgets.QWidget):
         projx = x1 + t*dx; projy = y1 + t*dy
         return math.hypot(px-projx, py-projy)
 
-    def start_animation(self, from_node: int, to_node: int, message: str = "", crc: str = "", duration_ms: int = 500):
-        """Start animation from one node to another"""
-        self.animation_from = from_node
-        self.animation_to = to_node
-        self.animation_progress = 0.0
-        self.animation_active = True
-        self.animation_duration = duration_ms
-        self.animation_message = message
-        self.animation_crc = crc
-        self.animation_timer.start(30)  # 30ms per frame (~33 FPS)
-        self.update()
+    def _node_rect(self, i, margin=0):
+        x,y = self.positions[i]
+        r = self.node_radius + margin
+        return QtCore.QRect(int(x - r), int(y - r), int(2 * r), int(2 * r))
+
+    def _animation_rect(self, kind, src, dst):
+        """Obszar, który zmienia animacja (odcinek z marginesem na aurę i tekst albo węzeł z błędem)."""
+        if kind == _ERROR:
+            return self._node_rect(src, self.node_radius)
+        return self._node_rect(src, ANIMATION_MARGIN).united(self._node_rect(dst, ANIMATION_MARGIN))
+
+    @property
+    def animation_active(self) -> bool:
+        return len(self.animations) > 0
+
+    def _add_animation(self, kind, src, dst, duration_ms, delay_ms=0, label=None):
+        now = time.monotonic()
+        self.animations.add(kind, src, dst, now + delay_ms / 1000.0, duration_ms / 1000.0, label)
+        if delay_ms <= 0:
+            self.update(self._animation_rect(kind, src, dst))
+        if not self.animation_timer.isActive():
+            self.animation_timer.start()
+
+    def start_animation(self, from_node: int, to_node: int, message: str = "", crc: str = "", duration_ms: int = 500,
+                        delay_ms: int = 0):
+        """Start animation from one node to another (obok innych trwających; opcjonalnie z opóźnieniem)"""
+        self._add_animation(_PACKET, from_node, to_node, duration_ms, delay_ms, (message, crc))
+
+    def animate_path(self, path, message: str = "", crc: str = "", hop_ms: int = 500):
+        """Animacja trasy: kolejne skoki startują jeden po drugim na wspólnym zegarze"""
+        for k, (a, b) in enumerate(zip(path, path[1:])):
+            self.start_animation(a, b, message=message, crc=crc, duration_ms=hop_ms, delay_ms=k * hop_ms)
 
     def update_animation(self):
-        """Update animation progress"""
-        if not self.animation_active:
-            return
-        
-        self.animation_progress += 30.0 / self.animation_duration
-        
-        if self.animation_progress >= 1.0:
-            self.animation_progress = 1.0
-            self.animation_active = False
+        """
+        Jedna klatka wszystkich animacji: odświeżany jest tylko obszar animacji,
+        które już trwają (albo właśnie się skończyły), potem zakończone są usuwane.
+        """
+        now = time.monotonic()
+        table = self.animations
+        started = [(kind, src, dst) for kind, src, dst, _, _ in table.started(now)]
+        if len(started) > FULL_UPDATE_ANIMATIONS:
+            self.update()
+        elif started:
+            region = QtGui.QRegion()
+            for kind, src, dst in started:
+                region = region.united(self._animation_rect(kind, src, dst))
+            self.update(region)
+        table.prune(now)
+        if not len(table):
             self.animation_timer.stop()
-        
-        self.update()
 
-    def draw_animation(self, painter: QtGui.QPainter):
+    def draw_animation(self, painter: QtGui.QPainter, src: int, dst: int, t: float, label=None):
         """Draw the animated line showing data transmission"""
-        if self.animation_from is None or self.animation_to is None:
-            return
-        
-        x1, y1 = self.positions[self.animation_from]
-        x2, y2 = self.positions[self.animation_to]
+        x1, y1 = self.positions[src]
+        x2, y2 = self.positions[dst]
+
+        # Highlight the edge being used for transmission
+        pen = QtGui.QPen()
+        pen.setStyle(QtCore.Qt.SolidLine)
+        pen.setWidth(4)
+        glow_intensity = int(255 * (0.5 + 0.5 * math.sin(t * math.pi * 4)))
+        pen.setColor(QtGui.QColor(glow_intensity, 200, 50))
+        painter.setPen(pen)
+        painter.drawLine(x1, y1, x2, y2)
         
         # Current position along the line
-        t = self.animation_progress
         current_x = x1 + t * (x2 - x1)
         current_y = y1 + t * (y2 - y1)
         
@@ -269,7 +488,8 @@ class GraphWidget(QtWidgets.QWidget):
         painter.drawLine(int(x1), int(y1), int(current_x), int(current_y))
         
         # Draw info text along the path
-        if self.animation_message or self.animation_crc:
+        message, crc = label or ("", "")
+        if message or crc:
             # Calculate text position slightly above the packet
             text_x = current_x
             text_y = current_y - 20
@@ -277,9 +497,9 @@ class GraphWidget(QtWidgets.QWidget):
             painter.setPen(QtGui.QPen(QtGui.QColor(255, 255, 100)))
             painter.setFont(QtGui.QFont("Arial", 8, QtGui.QFont.Bold))
             
-            info_text = f"{self.animation_from}→{self.animation_to}"
-            if self.animation_message:
-                info_text += f"\n'{self.animation_message}'"
+            info_text = f"{src}→{dst}"
+            if message:
+                info_text += f"\n'{message}'"
             
             painter.drawText(int(text_x - 30), int(text_y - 15), 60, 30, 
                            QtCore.Qt.AlignCenter, info_text)
@@ -291,6 +511,9 @@ class GraphWidget(QtWidgets.QWidget):
         key = (min(a, b), max(a, b))
         return self.edges.get(key, False)
 
+    def active_edges(self):
+        return [key for key, active in self.edges.items() if active]
+
     def toggle_edge(self, a: int, b: int):
         """Toggle edge state and emit signal"""
         if a == b:
@@ -298,37 +521,22 @@ class GraphWidget(QtWidgets.QWidget):
         key = (min(a, b), max(a, b))
         new_state = not self.edges.get(key, False)
         self.edges[key] = new_state
+        self.invalidate_layers(nodes=False)
         self.edge_toggled.emit(a, b, new_state)
         self.update()
 
-    def start_error_animation(self, node_id: int, duration_ms: int = 600):
+    def start_error_animation(self, node_id: int, duration_ms: int = 600, delay_ms: int = 0):
         """Start animation showing error on a node"""
-        self.error_animation_node = node_id
-        self.error_animation_progress = 0.0
-        self.error_animation_active = True
-        self.error_animation_duration = duration_ms
-        self.error_animation_timer.start(30)
-        self.update()
-
-    def update_error_animation(self):
-        """Update error animation progress"""
-        if not self.error_animation_active:
-            return
-        
-        self.error_animation_progress += 30.0 / self.error_animation_duration
-        
-        if self.error_animation_progress >= 1.0:
-            self.error_animation_progress = 1.0
-            self.error_animation_active = False
-            self.error_animation_timer.stop()
-        
-        self.update()
+        self._add_animation(_ERROR, node_id, node_id, duration_ms, delay_ms)
 
     def set_node_errors(self, node_id: int, has_errors: bool):
         """Set whether a node has errors (shows red permanently)"""
         if 0 <= node_id < self.n:
+            if self.node_errors.get(node_id) == has_errors:
+                return
             self.node_errors[node_id] = has_errors
-            self.update()
+            self.invalidate_layers(edges=False)
+            self.update(self._node_rect(node_id, 2))
 
     def get_node_errors(self, node_id: int) -> bool:
         """Check if a node has errors"""
@@ -1,60 +1,26 @@
 import sys
-import json
-import socket
 import random
 from PyQt5 import QtWidgets, QtGui, QtCore
 from graph_widget import GraphWidget
-from crc import create_frame
-
-BASE_PORT = 12000
-
-def send_control_to_node(node_id:int, payload:dict, timeout=2.0):
-    port = BASE_PORT + node_id
-    try:
-        with socket.create_connection(('127.0.0.1', port), timeout=timeout) as s:
-            s.sendall((json.dumps({'type':'control', **payload}) + '\n').encode('utf-8'))
-            # read response
-            data = b''
-            while True:
-                chunk = s.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                if b'\n' in data:
-                    break
-            if not data:
-                return None
-            return json.loads(data.decode('utf-8').strip())
-    except Exception as e:
-        return {'status':'error','reason':str(e)}
-
-def send_message_to_node(node_id:int, payload:dict, timeout=3.0):
-    port = BASE_PORT + node_id
-    try:
-        with socket.create_connection(('127.0.0.1', port), timeout=timeout) as s:
-            s.sendall((json.dumps({'type':'message', **payload}) + '\n').encode('utf-8'))
-            data = b''
-            while True:
-                chunk = s.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                if b'\n' in data:
-                    break
-            if not data:
-                return None
-            return json.loads(data.decode('utf-8').strip())
-    except Exception as e:
-        return {'status':'error','reason':str(e)}
-
-def get_node_status(node_id:int, timeout=2.0):
-    """Get status of a node including its errors"""
-    return send_control_to_node(node_id, {'cmd': 'get_status'}, timeout=timeout)
+from crc import build_frame, crc_width, CRC_CATALOG
+from node_client import send_message_to_node, ConnectionPool, StatusCache
+from node_io import NodeIO
+from supervisor import NodeRegistry
+from routing import RoutingTable
+from log_sink import LogSink, DEFAULT_MAX_ENTRIES
+from tracing import Trace, TraceRecorder, span, now as trace_now
 
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    # Stan węzła z subskrypcji (wątek połączenia -> wątek GUI)
+    node_status_changed = QtCore.pyqtSignal(int, object)
+
+    def __init__(self, registry: NodeRegistry = None, log_file: str = None, log_max_entries: int = DEFAULT_MAX_ENTRIES,
+                 trace_file: str = None):
         super().__init__()
-        self.setWindowTitle("CRC - Symulacja sieci (10 węzłów)")
+        # Spis węzłów od nadzorcy (main.py); domyślnie 10 węzłów od portu 12000
+        self.registry = registry or NodeRegistry()
+        n = len(self.registry)
+        self.setWindowTitle(f"CRC - Symulacja sieci ({n} węzłów)")
         self.resize(1100, 700)
         central = QtWidgets.QWidget()
         self.setCentralWidget(central)
@@ -68,10 +34,12 @@ class MainWindow(QtWidgets.QMainWindow):
         layout.addWidget(self.info_panel)
 
         # center graph
-        self.graph = GraphWidget(10)
+        self.graph = GraphWidget(n)
         self.graph.node_clicked.connect(self.on_node_selected)
         self.graph.edge_toggled.connect(self.on_edge_toggled)
         layout.addWidget(self.graph, 1)
+        # Trasy po aktywnych łączach; przeliczane przy zmianie łącza (on_edge_toggled)
+        self.routes = RoutingTable(n, self.graph.active_edges())
 
         # right control panel
         ctrl = QtWidgets.QWidget()
@@ -79,8 +47,8 @@ class MainWindow(QtWidgets.QMainWindow):
         # send segment
         ctrl_layout.addWidget(QtWidgets.QLabel("<b>Wysyłanie</b>"))
         row = QtWidgets.QHBoxLayout()
-        self.sender_spin = QtWidgets.QSpinBox(); self.sender_spin.setRange(0,9)
-        self.receiver_spin = QtWidgets.QSpinBox(); self.receiver_spin.setRange(0,9)
+        self.sender_spin = QtWidgets.QSpinBox(); self.sender_spin.setRange(0,n-1)
+        self.receiver_spin = QtWidgets.QSpinBox(); self.receiver_spin.setRange(0,n-1)
         row.addWidget(QtWidgets.QLabel("Nadawca:")); row.addWidget(self.sender_spin)
         row.addWidget(QtWidgets.QLabel("Adresat:")); row.addWidget(self.receiver_spin)
         ctrl_layout.addLayout(row)
@@ -88,8 +56,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.msg_edit.setPlaceholderText("Wiadomość")
         ctrl_layout.addWidget(self.msg_edit)
         self.crc_poly_edit = QtWidgets.QLineEdit("1010")
-        self.crc_poly_edit.setPlaceholderText("wielomian CRC, np. 1011")
+        self.crc_poly_edit.setPlaceholderText("wielomian CRC, np. 1011 lub CRC-32")
         ctrl_layout.addWidget(QtWidgets.QLabel("Wielomian CRC:"))
+        self.crc_preset_combo = QtWidgets.QComboBox()
+        self.crc_preset_combo.addItem("Własny wielomian")
+        self.crc_preset_combo.addItems(list(CRC_CATALOG))
+        self.crc_preset_combo.currentTextChanged.connect(self.on_crc_preset_changed)
+        ctrl_layout.addWidget(self.crc_preset_combo)
         ctrl_layout.addWidget(self.crc_poly_edit)
         self.send_btn = QtWidgets.QPushButton("Wyślij")
         self.send_btn.clicked.connect(self.on_send)
@@ -98,7 +71,7 @@ class MainWindow(QtWidgets.QMainWindow):
         ctrl_layout.addSpacing(10)
         # errors panel
         ctrl_layout.addWidget(QtWidgets.QLabel("<b>Wstrzykiwanie błędów</b>"))
-        self.error_node_spin = QtWidgets.QSpinBox(); self.error_node_spin.setRange(0,9)
+        self.error_node_spin = QtWidgets.QSpinBox(); self.error_node_spin.setRange(0,n-1)
         ctrl_layout.addWidget(QtWidgets.QLabel("Węzeł:"))
         ctrl_layout.addWidget(self.error_node_spin)
         self.chk_bitflip = QtWidgets.QCheckBox("BIT_FLIP")
@@ -127,6 +100,10 @@ class MainWindow(QtWidgets.QMainWindow):
         ctrl_layout.addLayout(row_all)
 
         ctrl_layout.addSpacing(10)
+        # Ślady wysłanych wiadomości (etapy nadawcy i węzłów)
+        self.export_traces_btn = QtWidgets.QPushButton("Zapisz ślady (Chrome trace)")
+        self.export_traces_btn.clicked.connect(self.on_export_traces)
+        ctrl_layout.addWidget(self.export_traces_btn)
         # repair all
         self.repair_all_btn = QtWidgets.QPushButton("Napraw wszystkie (usuń błędy)")
         self.repair_all_btn.clicked.connect(self.on_repair_all)
@@ -143,27 +120,55 @@ class MainWindow(QtWidgets.QMainWindow):
         console_dock.setWidget(self.console)
         console_dock.setAllowedAreas(QtCore.Qt.BottomDockWidgetArea)
         self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, console_dock)
+        # Wpisy trafiają do konsoli paczkami, konsola trzyma tylko ostatnie log_max_entries
+        self.log_sink = LogSink(self.console, self, max_entries=log_max_entries, file_path=log_file)
 
         # selected node
         self.selected_node = None
+
+        # Każda wysłana wiadomość jest śledzona: etapy nadawcy i węzłów, histogramy etapów
+        self.traces = TraceRecorder()
+        self.trace_file = trace_file
+
+        # Wszystkie żądania do węzłów idą przez pulę wątków - GUI nie czeka na gniazda
+        self.pool = ConnectionPool(self.registry.base_port, self.registry.host)
+        self.io = NodeIO(self, pool=self.pool)
+        # Stan węzłów przychodzi sam (subskrypcja) - bez pytania węzła przed każdą akcją
+        self.node_status_changed.connect(self._on_node_status_pushed)
+        self.status_cache = StatusCache(self.registry, self.pool, on_change=self.node_status_changed.emit)
+        self.cluster = self.status_cache.cluster
         
         # Initialize node error states
         self.refresh_all_node_states()
         
         # Log startup message
         self.log("╔═══════════════════════════════════════════════════════════╗", "INFO")
-        self.log("║ CRC - Symulacja sieci 10 komputerów                       ║", "INFO")
+        self.log(f"║ {f'CRC - Symulacja sieci {n} komputerów':<57} ║", "INFO")
         self.log("║ Gotowe do wysyłania wiadomości                            ║", "INFO")
         self.log("╚═══════════════════════════════════════════════════════════╝", "INFO")
 
     def refresh_all_node_states(self):
         """Synchronize graph with current state of all nodes"""
-        for node_id in range(10):
-            status = send_control_to_node(node_id, {'cmd':'get_status'})
-            if status and status.get('status') == 'ok':
-                errors = status.get('errors', {})
-                has_errors = any(errors.values())
-                self.graph.set_node_errors(node_id, has_errors)
+        self.io.call(self.status_cache.subscribe, callback=self._apply_cluster_status)
+
+    def _apply_cluster_status(self, result):
+        for node_id, status in result.results.items():
+            self._apply_node_status(node_id, status)
+        if result.failures:
+            failed = ', '.join(f"{n} ({reason})" for n, reason in sorted(result.failures.items()))
+            self.log(f"Brak odpowiedzi węzłów: {failed}", 'WARNING')
+
+    def _apply_node_status(self, node_id:int, status):
+        if status and status.get('status') == 'ok':
+            errors = status.get('errors', {})
+            has_errors = any(errors.values())
+            self.graph.set_node_errors(node_id, has_errors)
+
+    def _on_node_status_pushed(self, node_id:int, status):
+        self._apply_node_status(node_id, status)
+        if node_id == self.selected_node:
+            self._show_node_info(node_id, status)
+
     def log(self, text:str, level:str="INFO"):
         """Log message with formatting
         
@@ -171,36 +176,23 @@ class MainWindow(QtWidgets.QMainWindow):
             text: Message to log
             level: One of 'INFO', 'SUCCESS', 'ERROR', 'WARNING'
         """
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        # Color mapping for different log levels
-        colors = {
-            'INFO': '#87CEEB',      # Sky blue
-            'SUCCESS': '#90EE90',   # Light green
-            'ERROR': '#FF6B6B',     # Light red
-            'WARNING': '#FFD700',   # Gold
-            'DEBUG': '#D8BFD8'      # Thistle
-        }
-        
-        color = colors.get(level, '#87CEEB')
-        
-        # Format message with timestamp and level
-        html = f"""
-        <div style="margin: 5px 0; padding: 5px; border-left: 3px solid {color}; background-color: #f8f8f8;">
-            <span style="color: #888; font-size: 11px;">[{timestamp}]</span>
-            <span style="color: {color}; font-weight: bold; margin-left: 8px;">[{level}]</span>
-            <span style="color: #333; margin-left: 8px;">{text}</span>
-        </div>
-        """
-        self.console.append(html)
+        self.log_sink.write(text, level)
 
     def on_node_selected(self, node_id:int):
         self.selected_node = node_id
-        status = send_control_to_node(node_id, {'cmd':'get_status'})
+        status = self.status_cache.get(node_id)
+        if status is not None:
+            self._show_node_info(node_id, status)
+            return
+        self.io.call(self.status_cache.subscribe, node_ids=[node_id],
+                     callback=lambda result: self._show_node_info(node_id, result.results.get(node_id)))
+
+    def _show_node_info(self, node_id:int, status):
+        if node_id != self.selected_node:
+            return  # w międzyczasie wybrano inny węzeł
         if status and status.get('status')=='ok':
             info = f"<b>Węzeł {node_id}</b><br>"
-            info += f"Port: {BASE_PORT + node_id}<br>"
+            info += f"Port: {self.registry.port(node_id)}<br>"
             info += "Błędy:<br>"
             
             # Get errors and update graph visualization
@@ -215,7 +207,7 @@ class MainWindow(QtWidgets.QMainWindow):
             info += "<br>Ostatnia ramka CRC:<br>"
             if lm:
                 poly = self.crc_poly_edit.text().strip()
-                crc_len = len(poly) - 1 if poly else 0
+                crc_len = crc_width(poly) if poly else 0
                 frame_len = lm.get('frame_len', 0)
                 data_len = frame_len - crc_len if frame_len else 0
                 message = lm.get('message', '')
@@ -236,11 +228,19 @@ class MainWindow(QtWidgets.QMainWindow):
         else:
             self.info_panel.setHtml(f"<b>Węzeł {node_id}</b><br>Brak połączenia.")
 
+    def on_crc_preset_changed(self, name:str):
+        """Wpisz nazwę CRC z katalogu - węzły rozpoznają ją w polu crc_poly"""
+        if name in CRC_CATALOG:
+            self.crc_poly_edit.setText(name)
+
     def on_edge_toggled(self, a:int, b:int, state:bool):
+        self.routes.set_edge(a, b, state)
         status = 'AKTYWNE ✓' if state else 'NIEAKTYWNE ✗'
         self.log(f"Połączenie {a} <→ {b} ustawione na {status}", 'SUCCESS')
 
     def on_send(self):
+        trace = Trace()
+        started = trace_now()
         sender = int(self.sender_spin.value())
         receiver = int(self.receiver_spin.value())
 
@@ -248,8 +248,9 @@ class MainWindow(QtWidgets.QMainWindow):
             self.log("Nie można wysłać do samego siebie.", 'ERROR')
             return
 
-        if not self.graph.is_edge_active(sender, receiver):
-            self.log(f"Brak aktywnego połączenia {sender} ↔ {receiver}.", 'WARNING')
+        path = self.routes.path(sender, receiver)
+        if path is None:
+            self.log(f"Brak trasy {sender} → {receiver} (żadna ścieżka aktywnych połączeń).", 'WARNING')
             return
 
         message = self.msg_edit.text()
@@ -260,50 +261,89 @@ class MainWindow(QtWidgets.QMainWindow):
             return
 
         try:
-            frame_bits = create_frame(message, poly)
+            frame = build_frame(message, poly)
         except Exception as e:
             self.log(f"Błąd CRC: {e}", 'ERROR')
             return
 
-        crc_check = frame_bits[-(len(poly)-1):]
+        crc_check = frame.tail(crc_width(poly))
         self.log(
             f"📤 Nadawca {sender} → {receiver} | Dane: '{message}' | CRC: {crc_check}",
             'SUCCESS'
         )
+        if len(path) > 2:
+            self.log(f"   └─ Trasa: {' → '.join(map(str, path))} ({len(path) - 1} skoki)", 'INFO')
 
-        # Start animation with message info
-        crc_bits = frame_bits[-(len(poly)-1):]
-        self.graph.start_animation(sender, receiver, message=message, crc=crc_bits, duration_ms=800)
+        # Start animation with message info (kolejne skoki trasy jeden po drugim)
+        self.graph.animate_path(path, message=message, crc=crc_check, hop_ms=800)
+
+        trace.meta.update({'from': sender, 'to': receiver, 'poly': poly, 'frame_len': len(frame)})
+        trace.add('gui.on_send', started)
 
         # Send message after a short delay to allow animation to show
-        QtCore.QTimer.singleShot(100, lambda: self.send_message_async(sender, receiver, message, poly, frame_bits))
+        scheduled = trace_now()
+
+        def send():
+            trace.add('gui.timer', scheduled)
+            self.send_message_async(sender, receiver, message, poly, frame, path, trace)
+
+        QtCore.QTimer.singleShot(100, send)
+
+    def send_message_async(self, sender: int, receiver: int, message: str, poly: str, frame, path=None, trace=None):
+        """Send message to node (called during animation) - w tle, wynik w _on_message_result"""
+        queued = trace_now()
+        self.io.call(self._send_message_task, sender, receiver, message, poly, frame, path, trace, queued,
+                     callback=lambda result: self._on_message_result(sender, receiver, result, trace))
+
+    def _send_message_task(self, sender: int, receiver: int, message: str, poly: str, frame, path=None,
+                           trace=None, queued=None):
+        """
+        Wątek roboczy: sprawdza błędy nadawcy, ewentualnie psuje bit, wysyła ramkę
+        do pierwszego węzła trasy - dalej węzły przekazują ją same (pole 'route')
+        """
+        if trace is not None and queued is not None:
+            trace.add('gui.queue', queued)
+        # Check if sender has errors - apply them BEFORE sending (stan z subskrypcji)
+        with span(trace, 'sender.status'):
+            sender_errors = self.status_cache.errors(sender)
+            if sender_errors is None:
+                self.status_cache.subscribe(node_ids=[sender])
+                sender_errors = self.status_cache.errors(sender) or {}
 
-    def send_message_async(self, sender: int, receiver: int, message: str, poly: str, frame_bits: str):
-        """Send message to node (called during animation)"""
-        
-        # Check if sender has errors - apply them BEFORE sending
-        sender_status = get_node_status(sender)
-        print(f"[DEBUG] sender_status: {sender_status}")
-        sender_errors = sender_status.get('errors', {}) if sender_status else {}
-        print(f"[DEBUG] sender_errors: {sender_errors}")
-        
         # Apply BIT_FLIP on sender side (before sending)
-        if sender_errors.get('BIT_FLIP', False) and frame_bits:
-            idx = random.randrange(len(frame_bits))
-            original_bit = frame_bits[idx]
-            flipped = '1' if frame_bits[idx] == '0' else '0'
-            frame_bits = frame_bits[:idx] + flipped + frame_bits[idx+1:]
-            print(f"[DEBUG] BIT_FLIP applied at index {idx}")
-            self.log(f"   [SENDER {sender}] BIT_FLIP: zmieniono bit {idx}: '{original_bit}' -> '{flipped}'", 'WARNING')
-        else:
-            print(f"[DEBUG] No BIT_FLIP: BIT_FLIP={sender_errors.get('BIT_FLIP', False)}, frame_bits empty={not frame_bits}")
-        
-        res = send_message_to_node(receiver, {
+        bit_flip = None
+        if sender_errors.get('BIT_FLIP', False) and len(frame):
+            idx = random.randrange(len(frame))
+            original_bit = frame.bit(idx)
+            frame.flip_bit(idx)
+            bit_flip = (idx, original_bit, frame.bit(idx))  # zapis w logu: _on_message_result (wątek GUI)
+
+        payload = {
             'from': sender,
             'message': message,
-            'frame_bits': frame_bits,
+            'frame': frame,
             'crc_poly': poly
-        })
+        }
+        first_hop = receiver
+        if path and len(path) > 2:
+            first_hop = path[1]
+            payload['route'] = path[2:]
+        res = send_message_to_node(first_hop, payload, timeout=3.0 + 2.0 * len(payload.get('route', ())),
+                                   pool=self.pool, trace=trace)
+        return {'bit_flip': bit_flip, 'res': res, 'finished': trace_now()}
+
+    def _on_message_result(self, sender: int, receiver: int, result, trace=None):
+        if trace is not None:
+            if 'finished' in result:
+                trace.add('gui.result', result['finished'])
+            trace.meta['status'] = (result.get('res') or result).get('status')
+            self.traces.record(trace)
+        if result.get('bit_flip'):
+            idx, original_bit, flipped = result['bit_flip']
+            self.log(f"   [SENDER {sender}] BIT_FLIP: zmieniono bit {idx}: '{original_bit}' -> '{flipped}'", 'WARNING')
+        res = result.get('res', result)
+        if res and len(res.get('hops', ())) > 1:
+            self.log(f"   └─ Skoki: {self._format_hops(res['hops'])}", 'DEBUG')
 
         if res and res.get('status') == 'received':
             crc_ok = res.get('crc_ok')
@@ -320,22 +360,62 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.log(f"📥 Węzeł {receiver} odebrał ramkę | ❌ CRC BŁĄD! Dane uszkodzone | Rozmiar: {frame_len} bit{delay_str}", 'ERROR')
                 self.log(f"   └─ Przyczyna: Błąd w transmisji (np. BIT_FLIP, szum sieciowy)", 'DEBUG')
         elif res and res.get('status') == 'dropped':
-            self.log(f"⚠️ Węzeł {receiver} odrzucił pakiet (DROP_PACKET) - pakiet nigdy nie dotarł", 'WARNING')
+            self.log(f"⚠️ Węzeł {res.get('node', receiver)} odrzucił pakiet (DROP_PACKET) - pakiet nigdy nie dotarł", 'WARNING')
+            self.graph.start_error_animation(res.get('node', receiver))
+        elif res and res.get('status') == 'discarded':
+            self.log(f"❌ Węzeł pośredni {res.get('node')} wykrył błąd CRC i odrzucił ramkę - nie dotarła do {receiver}", 'ERROR')
+            if res.get('node') is not None:
+                self.graph.start_error_animation(res['node'])
         else:
             self.log(f"❌ Błąd komunikacji z węzłem {receiver}: {res}", 'ERROR')
 
+    @staticmethod
+    def _format_hops(hops):
+        parts = []
+        for hop in hops:
+            mark = {True: '✓', False: '✗'}.get(hop.get('crc_ok'), hop.get('status', '?'))
+            part = f"{hop['node']} {mark}"
+            if 'bit_flip' in hop:
+                part += f" (BIT_FLIP bit {hop['bit_flip']})"
+            if 'delay' in hop:
+                part += f" (⏱️ {hop['delay']}s)"
+            parts.append(part)
+        return ' → '.join(parts)
+
+    def on_export_traces(self):
+        if not self.traces.traces:
+            self.log("Brak śladów - wyślij najpierw jakąś wiadomość.", 'WARNING')
+            return
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Zapisz ślady", "crc_trace.json", "Chrome trace (*.json)")
+        if not path:
+            return
+        self._save_traces(path)
+
+    def _save_traces(self, path: str):
+        try:
+            self.traces.save_chrome_trace(path)
+        except OSError as e:
+            self.log(f"Nie udało się zapisać śladów: {e}", 'ERROR')
+            return
+        self.log(f"📈 Zapisano {len(self.traces.traces)} śladów do {path} (chrome://tracing, ui.perfetto.dev)", 'INFO')
+        for line in self.traces.summary().splitlines():
+            self.log(f"   {line}", 'DEBUG')
+
     def on_apply_errors(self):
         node = int(self.error_node_spin.value())
         errors = []
         if self.chk_bitflip.isChecked(): errors.append('BIT_FLIP')
         if self.chk_droppkt.isChecked(): errors.append('DROP_PACKET')
         if self.chk_delay.isChecked(): errors.append('DELAY_PACKET')
-        res = send_control_to_node(node, {'cmd':'set_errors','errors':errors})
         
         # Update graph to show node with errors
         has_errors = len(errors) > 0
         self.graph.set_node_errors(node, has_errors)
-        
+        self.io.control(node, {'cmd':'set_errors','errors':errors},
+                        callback=lambda res: self._on_errors_applied(node, errors, res))
+
+    def _on_errors_applied(self, node:int, errors:list, res):
         if res and res.get('status') == 'ok':
             errors_str = ', '.join(errors) if errors else 'brak'
             self.log(f"⚡ Błędy ustawione na węźle {node}: {errors_str}", 'WARNING')
@@ -346,11 +426,12 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def on_repair(self):
         node = int(self.error_node_spin.value())
-        res = send_control_to_node(node, {'cmd':'repair'})
         
         # Update graph to remove error indicator
         self.graph.set_node_errors(node, False)
-        
+        self.io.control(node, {'cmd':'repair'}, callback=lambda res: self._on_repaired(node, res))
+
+    def _on_repaired(self, node:int, res):
         if res and res.get('status') == 'ok':
             self.log(f"✅ Węzeł {node} naprawiony - wszystkie błędy usunięte", 'SUCCESS')
         else:
@@ -361,8 +442,9 @@ class MainWindow(QtWidgets.QMainWindow):
     def on_enable_all(self):
         """Włącz wszystkie węzły (aktywuj wszystkie krawędzie)"""
         self.log("🔌 Włączanie wszystkich węzłów...", 'INFO')
-        for i in range(10):
-            for j in range(i+1, 10):
+        n = self.graph.n
+        for i in range(n):
+            for j in range(i+1, n):
                 if not self.graph.is_edge_active(i, j):
                     self.graph.toggle_edge(i, j)
         self.log("✅ Wszystkie węzły włączone", 'SUCCESS')
@@ -370,8 +452,9 @@ class MainWindow(QtWidgets.QMainWindow):
     def on_disable_all(self):
         """Wyłącz wszystkie węzły (deaktywuj wszystkie krawędzie)"""
         self.log("🔌 Wyłączanie wszystkich węzłów...", 'INFO')
-        for i in range(10):
-            for j in range(i+1, 10):
+        n = self.graph.n
+        for i in range(n):
+            for j in range(i+1, n):
                 if self.graph.is_edge_active(i, j):
                     self.graph.toggle_edge(i, j)
         self.log("✅ Wszystkie węzły wyłączone", 'SUCCESS')
@@ -379,15 +462,28 @@ class MainWindow(QtWidgets.QMainWindow):
     def on_repair_all(self):
         """Napraw wszystkie węzły - usuń wszystkie błędy"""
         self.log("🔧 Naprawianie wszystkich węzłów...", 'INFO')
-        for node in range(10):
-            send_control_to_node(node, {'cmd':'repair'})
+        self.io.call(self.cluster.control, {'cmd':'repair'}, callback=self._on_repaired_all)
+
+    def _on_repaired_all(self, result):
+        for node in result.results:
             self.graph.set_node_errors(node, False)
-        self.log("✅ Wszystkie węzły naprawione - błędy usunięte", 'SUCCESS')
+        if result.failures:
+            failed = ', '.join(f"{n} ({reason})" for n, reason in sorted(result.failures.items()))
+            self.log(f"❌ Nie udało się naprawić węzłów: {failed}", 'ERROR')
+        else:
+            self.log("✅ Wszystkie węzły naprawione - błędy usunięte", 'SUCCESS')
         if self.selected_node is not None:
             self.on_node_selected(self.selected_node)
 
-def run_gui():
+def run_gui(registry: NodeRegistry = None, log_file: str = None, log_max_entries: int = DEFAULT_MAX_ENTRIES,
+            trace_file: str = None):
     app = QtWidgets.QApplication(sys.argv)
-    w = MainWindow()
+    w = MainWindow(registry, log_file, log_max_entries, trace_file)
     w.show()
-    return app.exec_()
+    code = app.exec_()
+    w.status_cache.close()
+    if w.trace_file and w.traces.traces:
+        w._save_traces(w.trace_file)
+    w.log_sink.close()
+    w.io.wait(3000)
+    return code
@@ -0,0 +1,390 @@
+"""
+Generator ruchu dla klastra węzłów (bez GUI).
+
+Wysyła ramki protokołem węzłów przez trwałe połączenia z puli (pipelining):
+- ze stałą częstością (--rate, pętla otwarta: opóźnienie liczone od
+  zaplanowanej chwili wysłania, więc zator nie zaniża wyników),
+- albo z ustaloną liczbą żądań w locie (--concurrency, pętla zamknięta).
+
+Rozmiary wiadomości, wielomiany CRC, rozkłady nadawców i odbiorców oraz plan
+błędów na węzłach (--error-at) są konfigurowalne; na końcu drukowana jest
+przepustowość i percentyle opóźnień.
+
+    python loadgen.py --nodes 10 --rate 2000 --duration 10 --size 64-1024 --poly CRC-32,CRC-8
+    python loadgen.py --concurrency 64 --count 100000 --receivers zipf:1.2 --error-at 2:3:DROP_PACKET --error-at 5:3:
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import random
+import string
+import threading
+import time
+from array import array
+from collections import Counter
+from crc import build_frame
+from node_client import ConnectionPool
+from node_process import ERROR_TYPES
+from supervisor import NodeRegistry
+from tracing import Trace, TraceRecorder, span, now as trace_now
+
+# Ile różnych wiadomości (z gotowymi ramkami) przypada na wielomian - generator nie liczy CRC w pętli
+MESSAGE_POOL = 64
+# Co ile sekund wątek wysyłający sprawdza przeterminowane żądania
+SWEEP_INTERVAL = 0.05
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class NodeChoice:
+    """
+    Losowanie węzła według specyfikacji:
+    'uniform', 'zipf[:s]' (węzeł o indeksie k z wagą 1/(k+1)^s), 'fixed:<id>'.
+    """
+
+    def __init__(self, spec: str, node_ids, rng: random.Random):
+        self.node_ids = list(node_ids)
+        self.rng = rng
+        name, _, arg = spec.partition(':')
+        self._cum_weights = None
+        self._fixed = None
+        if name == 'uniform':
+            pass
+        elif name == 'zipf':
+            s = float(arg) if arg else 1.0
+            self._cum_weights = list(itertools.accumulate(1.0 / (k + 1) ** s for k in range(len(self.node_ids))))
+        elif name == 'fixed':
+            self._fixed = int(arg)
+            if self._fixed not in self.node_ids:
+                raise ValueError(f"Węzeł {self._fixed} nie należy do klastra")
+        else:
+            raise ValueError(f"Nieznany rozkład: {spec} (uniform, zipf[:s], fixed:<id>)")
+        self.spec = spec
+
+    def __call__(self, exclude=None) -> int:
+        if self._fixed is not None:
+            return self._fixed
+        for _ in range(100):
+            if self._cum_weights is None:
+                node = self.rng.choice(self.node_ids)
+            else:
+                node = self.node_ids[bisect.bisect(self._cum_weights, self.rng.random() * self._cum_weights[-1])]
+            if node != exclude:
+                return node
+        raise ValueError(f"Rozkład {self.spec} nie daje węzła innego niż {exclude}")
+
+
+def parse_size(spec: str):
+    """'64' albo '32-1024' (bajty) -> (min, max)."""
+    low, _, high = spec.partition('-')
+    low, high = int(low), int(high or low)
+    if low < 1 or high < low:
+        raise ValueError(f"Niepoprawny rozmiar: {spec}")
+    return low, high
+
+
+def parse_error_event(spec: str):
+    """'T:WĘZEŁ:BŁĄD+BŁĄD' -> (T, węzeł, [błędy]); pusta lista błędów naprawia węzeł."""
+    try:
+        at, node, errors = spec.split(':', 2)
+        errors = [e for e in errors.split('+') if e]
+        at, node = float(at), int(node)
+    except ValueError:
+        raise ValueError(f"Niepoprawny wpis planu błędów: {spec} (oczekiwano T:WĘZEŁ:BŁĄD+BŁĄD)") from None
+    unknown = [e for e in errors if e not in ERROR_TYPES]
+    if unknown:
+        raise ValueError(f"Nieznane błędy: {', '.join(unknown)} (dostępne: {', '.join(ERROR_TYPES)})")
+    return at, node, errors
+
+
+class LoadStats:
+    """Wyniki przebiegu: opóźnienia (s) udanych odpowiedzi i liczniki wyników."""
+
+    def __init__(self):
+        self.latencies = array('d')
+        self.outcomes = Counter()
+        self.sent = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str, latency: float = None):
+        with self._lock:
+            self.outcomes[outcome] += 1
+            if latency is not None:
+                self.latencies.append(latency)
+
+    @property
+    def completed(self) -> int:
+        return sum(self.outcomes.values()) - self.outcomes['timeout']
+
+    def percentile(self, p: float, ordered=None) -> float:
+        ordered = ordered if ordered is not None else sorted(self.latencies)
+        if not ordered:
+            return float('nan')
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def to_dict(self):
+        ordered = sorted(self.latencies)
+        return {
+            'sent': self.sent,
+            'completed': self.completed,
+            'elapsed': round(self.elapsed, 3),
+            'throughput': round(self.completed / self.elapsed, 1) if self.elapsed else 0.0,
+            'outcomes': dict(self.outcomes),
+            'latency_ms': {
+                **{f'p{p:g}': round(self.percentile(p, ordered) * 1e3, 3) for p in PERCENTILES},
+                'mean': round(sum(ordered) / len(ordered) * 1e3, 3) if ordered else float('nan'),
+                'max': round(ordered[-1] * 1e3, 3) if ordered else float('nan'),
+            },
+        }
+
+    def report(self) -> str:
+        d = self.to_dict()
+        lat = d['latency_ms']
+        lines = [
+            f"Wysłane: {d['sent']}, zakończone: {d['completed']} w {d['elapsed']:.2f} s "
+            f"-> {d['throughput']:.1f} wiad./s",
+            "Wyniki: " + ', '.join(f"{k}={v}" for k, v in sorted(d['outcomes'].items())),
+            "Opóźnienie [ms]: " + ', '.join(f"{k}={v:.2f}" for k, v in lat.items()),
+        ]
+        return '\n'.join(lines)
+
+
+class LoadGenerator:
+    """
+    Wątek wysyłający przygotowuje żądania i wysyła je bez czekania
+    (ConnectionPool.submit); odpowiedzi zbierają wywołania zwrotne Future w
+    wątkach czytających połączeń. Tylko wątek wysyłający pisze do gniazd.
+
+    Dokładnie jedno z `rate` (wiad./s) i `concurrency` (żądań w locie) musi być podane.
+    `corrupt` to prawdopodobieństwo odwrócenia jednego bitu ramki przed wysłaniem,
+    `trace_sample` - jaka część wiadomości jest śledzona (etapy w `traces`).
+    """
+
+    def __init__(self, node_ids, pool: ConnectionPool, rate: float = None, concurrency: int = None,
+                 size=(64, 64), polys=('CRC-32',), senders: str = 'uniform', receivers: str = 'uniform',
+                 corrupt: float = 0.0, timeout: float = 5.0, seed: int = None, trace_sample: float = 0.0):
+        if (rate is None) == (concurrency is None):
+            raise ValueError("Podaj dokładnie jedno: rate albo concurrency")
+        if rate is not None and rate <= 0 or concurrency is not None and concurrency < 1:
+            raise ValueError("rate i concurrency muszą być dodatnie")
+        self.node_ids = list(node_ids)
+        if len(self.node_ids) < 2:
+            raise ValueError("Potrzebne są co najmniej dwa węzły")
+        self.pool = pool
+        self.rate = rate
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.corrupt = corrupt
+        self.rng = random.Random(seed)
+        self.senders = NodeChoice(senders, self.node_ids, self.rng)
+        self.receivers = NodeChoice(receivers, self.node_ids, self.rng)
+        self.messages = self._build_messages(size, polys)
+        self.stats = LoadStats()
+        self.trace_sample = trace_sample
+        self.traces = TraceRecorder()
+        self._in_flight = {}  # id żądania -> (połączenie, future, termin)
+        self._slots = threading.Semaphore(concurrency or 0)
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._start = None
+
+    def _build_messages(self, size, polys):
+        low, high = size
+        alphabet = string.ascii_letters + string.digits
+        messages = []
+        for poly in polys:
+            for _ in range(MESSAGE_POOL):
+                text = ''.join(self.rng.choices(alphabet, k=self.rng.randint(low, high)))
+                messages.append((text, poly, build_frame(text, poly)))
+        return messages
+
+    def _payload(self):
+        sender = self.senders()
+        receiver = self.receivers(exclude=sender)
+        text, poly, frame = self.rng.choice(self.messages)
+        if self.corrupt and self.rng.random() < self.corrupt:
+            frame = frame.copy()
+            frame.flip_bit(self.rng.randrange(len(frame)))
+        return receiver, {'type': 'message', 'from': sender, 'message': text, 'frame': frame, 'crc_poly': poly}
+
+    def _send(self, started: float):
+        receiver, payload = self._payload()
+        key = next(self._seq)
+        self.stats.sent += 1
+        trace = None
+        if self.trace_sample and self.rng.random() < self.trace_sample:
+            trace = Trace()
+            trace.meta.update({'from': payload['from'], 'to': receiver, 'poly': payload['crc_poly']})
+        try:
+            with span(trace, 'client.connect'):
+                conn = self.pool.get(receiver, connect_timeout=self.timeout)
+            fut = conn.submit(payload, trace)
+        except (OSError, ConnectionError):
+            self._record('error')
+            return
+        with self._lock:
+            self._in_flight[key] = (conn, fut, started + self.timeout)
+        submitted = trace_now() if trace is not None else 0
+        fut.add_done_callback(lambda f: self._on_done(key, started, f, trace, submitted))
+
+    def _on_done(self, key, started, fut, trace=None, submitted=0):
+        latency = time.perf_counter() - started
+        try:
+            res = fut.result()
+        except Exception:
+            self._finish(key, 'error')
+            return
+        if trace is not None:
+            trace.add('client.wait', submitted)
+            trace.extend(res.pop('trace', None))
+            trace.meta['status'] = res.get('status')
+            self.traces.record(trace)
+        status = res.get('status')
+        if status == 'received':
+            outcome = 'ok' if res.get('crc_ok') else 'crc_error'
+        elif status in ('dropped', 'discarded'):
+            outcome = status
+        else:
+            outcome = 'error'
+        self._finish(key, outcome, latency)
+
+    def _finish(self, key, outcome, latency=None):
+        with self._lock:
+            if self._in_flight.pop(key, None) is None:
+                return  # już policzone jako timeout
+        self._record(outcome, latency)
+
+    def _record(self, outcome, latency=None):
+        self.stats.record(outcome, latency)
+        if self.concurrency:
+            self._slots.release()
+
+    def _sweep(self, now: float, force: bool = False):
+        """Przeterminowane żądania (albo wszystkie, gdy force) liczone są jako timeout."""
+        with self._lock:
+            expired = [key for key, (_, _, deadline) in self._in_flight.items() if force or deadline <= now]
+            entries = [self._in_flight.pop(key) for key in expired]
+        for conn, fut, _ in entries:
+            conn.cancel(fut)
+            self._record('timeout')
+
+    def _apply_errors(self, node: int, errors):
+        try:
+            self.pool.submit(node, {'type': 'control', 'cmd': 'set_errors', 'errors': errors})
+        except (OSError, ConnectionError) as e:
+            print(f"Nie udało się ustawić błędów na węźle {node}: {e}")
+
+    def run(self, duration: float = None, count: int = None, schedule=(), repair: bool = True) -> LoadStats:
+        """
+        Wysyła przez `duration` sekund albo `count` wiadomości (co nastąpi pierwsze),
+        stosując plan błędów `schedule` [(T, węzeł, błędy)], i czeka na odpowiedzi.
+        """
+        if duration is None and count is None:
+            raise ValueError("Podaj duration albo count")
+        schedule = sorted(schedule)
+        touched = {node for _, node, _ in schedule}
+        start = self._start = time.perf_counter()
+        end = start + duration if duration is not None else float('inf')
+        count = count if count is not None else float('inf')
+        next_sweep = start
+        while self.stats.sent < count:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            while schedule and now - start >= schedule[0][0]:
+                _, node, errors = schedule.pop(0)
+                self._apply_errors(node, errors)
+            if now >= next_sweep:
+                self._sweep(now)
+                next_sweep = now + SWEEP_INTERVAL
+            if self.rate:
+                # Pętla otwarta: chwila wysłania wynika z numeru wiadomości, nie z odpowiedzi
+                planned = start + self.stats.sent / self.rate
+                if planned > now:
+                    time.sleep(min(planned - now, SWEEP_INTERVAL))
+                    continue
+                self._send(planned)
+            else:
+                if not self._slots.acquire(timeout=SWEEP_INTERVAL):
+                    continue
+                self._send(time.perf_counter())
+        sent_until = time.perf_counter()
+        # Czekamy na odpowiedzi najwyżej `timeout`
+        drain_end = sent_until + self.timeout
+        while self._in_flight and time.perf_counter() < drain_end:
+            time.sleep(0.005)
+        self.stats.elapsed = time.perf_counter() - start
+        self._sweep(time.perf_counter(), force=True)
+        if repair:
+            for node in touched:
+                self._apply_errors(node, [])
+        return self.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generator ruchu dla węzłów CRC")
+    parser.add_argument('--registry', default=None, help="spis węzłów (JSON z main.py --registry)")
+    parser.add_argument('--nodes', type=int, default=10, help="liczba węzłów (bez --registry)")
+    parser.add_argument('--base-port', type=int, default=NodeRegistry().base_port, help="port węzła 0")
+    load = parser.add_mutually_exclusive_group(required=True)
+    load.add_argument('--rate', type=float, help="wiadomości na sekundę (pętla otwarta)")
+    load.add_argument('--concurrency', type=int, help="liczba żądań w locie (pętla zamknięta)")
+    parser.add_argument('--duration', type=float, default=None, help="czas wysyłania w sekundach")
+    parser.add_argument('--count', type=int, default=None, help="liczba wiadomości")
+    parser.add_argument('--size', default='64', help="rozmiar wiadomości w bajtach: N albo MIN-MAX")
+    parser.add_argument('--poly', default='CRC-32',
+                        help="wielomiany (nazwy z katalogu albo '0'/'1'), rozdzielone przecinkami")
+    parser.add_argument('--senders', default='uniform', help="rozkład nadawców: uniform, zipf[:s], fixed:<id>")
+    parser.add_argument('--receivers', default='uniform', help="rozkład odbiorców: uniform, zipf[:s], fixed:<id>")
+    parser.add_argument('--corrupt', type=float, default=0.0,
+                        help="prawdopodobieństwo odwrócenia bitu ramki przed wysłaniem")
+    parser.add_argument('--error-at', action='append', default=[], metavar='T:WĘZEŁ:BŁĄD+BŁĄD',
+                        help="po T sekundach ustaw błędy węzła (pusta lista naprawia); można powtarzać")
+    parser.add_argument('--keep-errors', action='store_true', help="nie naprawiaj węzłów z planu błędów na końcu")
+    parser.add_argument('--timeout', type=float, default=5.0, help="limit czasu odpowiedzi (s)")
+    parser.add_argument('--seed', type=int, default=None, help="ziarno losowania")
+    parser.add_argument('--trace-sample', type=float, default=0.0,
+                        help="część wiadomości śledzonych etap po etapie (0..1); histogramy etapów w wyniku")
+    parser.add_argument('--trace-file', default=None, help="zapisz ślady (format Chrome trace) do tego pliku")
+    parser.add_argument('--json', action='store_true', help="wynik jako JSON")
+    args = parser.parse_args(argv)
+
+    if args.duration is None and args.count is None:
+        args.duration = 10.0
+    try:
+        registry = (NodeRegistry.load(args.registry) if args.registry
+                    else NodeRegistry(range(args.nodes), args.base_port))
+        schedule = [parse_error_event(spec) for spec in args.error_at]
+        pool = ConnectionPool(registry.base_port, registry.host)
+        generator = LoadGenerator(
+            registry, pool, rate=args.rate, concurrency=args.concurrency, size=parse_size(args.size),
+            polys=[p.strip() for p in args.poly.split(',') if p.strip()], senders=args.senders,
+            receivers=args.receivers, corrupt=args.corrupt, timeout=args.timeout, seed=args.seed,
+            trace_sample=args.trace_sample or (1.0 if args.trace_file else 0.0))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    try:
+        stats = generator.run(args.duration, args.count, schedule, repair=not args.keep_errors)
+    except KeyboardInterrupt:
+        stats = generator.stats
+        stats.elapsed = time.perf_counter() - generator._start if generator._start else 0.0
+    finally:
+        time.sleep(0.05)  # naprawy z planu błędów zdążą wyjść
+        pool.close()
+    traces = generator.traces
+    if args.trace_file and traces.traces:
+        traces.save_chrome_trace(args.trace_file)
+    if args.json:
+        print(json.dumps({**stats.to_dict(), 'stages': traces.stats()} if traces.traces else stats.to_dict()))
+    else:
+        print(stats.report())
+        if traces.traces:
+            print(f"Etapy ({len(traces.traces)} śledzonych wiadomości):")
+            print(traces.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Konsola logów GUI: wpisy są zbierane i trafiają do widżetu paczkami z zegara.
+
+Widżet i pamięć mają stałą granicę (ostatnie `max_entries` wpisów), więc ruch
+w sieci nie spowalnia kolejnych dopisań. Opcjonalnie wpisy idą też do pliku
+rotowanego po `max_bytes` (logging.handlers.RotatingFileHandler).
+"""
+
+import logging
+import logging.handlers
+from collections import deque
+from datetime import datetime
+from PyQt5 import QtCore
+
+# Ile ostatnich wpisów trzyma konsola (i pierścień w pamięci)
+DEFAULT_MAX_ENTRIES = 2000
+# Co ile ms zebrane wpisy trafiają do widżetu
+FLUSH_INTERVAL_MS = 100
+# Najwięcej wpisów dopisywanych do widżetu w jednej paczce; reszta czeka na kolejną
+FLUSH_BATCH = 100
+# Plik logu: rozmiar, po którym zaczyna się nowy, i liczba starych plików
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# Color mapping for different log levels
+LEVEL_COLORS = {
+    'INFO': '#87CEEB',      # Sky blue
+    'SUCCESS': '#90EE90',   # Light green
+    'ERROR': '#FF6B6B',     # Light red
+    'WARNING': '#FFD700',   # Gold
+    'DEBUG': '#D8BFD8'      # Thistle
+}
+
+
+def format_entry(timestamp: str, level: str, text: str) -> str:
+    """Format message with timestamp and level (HTML jednego wpisu konsoli)"""
+    color = LEVEL_COLORS.get(level, '#87CEEB')
+    return f"""
+        <div style="margin: 5px 0; padding: 5px; border-left: 3px solid {color}; background-color: #f8f8f8;">
+            <span style="color: #888; font-size: 11px;">[{timestamp}]</span>
+            <span style="color: {color}; font-weight: bold; margin-left: 8px;">[{level}]</span>
+            <span style="color: #333; margin-left: 8px;">{text}</span>
+        </div>
+        """
+
+
+class LogSink(QtCore.QObject):
+    """
+    Zbiera wpisy (wołane w wątku GUI) i co `flush_ms` dopisuje do `widget`
+    (QTextEdit) najwyżej `batch` z nich jednym wywołaniem. Dokument widżetu ma limit bloków, a
+    `entries` to pierścień ostatnich `max_entries` wpisów (czas, poziom, tekst).
+    Wpisy, które i tak wypadłyby z konsoli przed wyświetleniem, nie są
+    formatowane - liczy je `skipped`.
+    """
+
+    def __init__(self, widget, parent=None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 flush_ms: int = FLUSH_INTERVAL_MS, batch: int = FLUSH_BATCH, file_path: str = None,
+                 max_bytes: int = LOG_FILE_MAX_BYTES, backup_count: int = LOG_FILE_BACKUPS):
+        super().__init__(parent)
+        if max_entries < 1:
+            raise ValueError("max_entries musi być dodatnie")
+        self.widget = widget
+        self.max_entries = max_entries
+        self.batch = batch
+        self.entries = deque(maxlen=max_entries)
+        self.skipped = 0
+        self._pending = deque(maxlen=max_entries)
+        widget.document().setMaximumBlockCount(max_entries)
+        self._file = None
+        self._file_pending = []  # do pliku idą wszystkie wpisy, także pominięte w konsoli
+        if file_path:
+            self._file = logging.handlers.RotatingFileHandler(
+                file_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+            self._file.setFormatter(logging.Formatter('%(message)s'))
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(flush_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def write(self, text: str, level: str = 'INFO'):
+        entry = (datetime.now(), level, text)
+        self.entries.append(entry)
+        if len(self._pending) == self._pending.maxlen:
+            self.skipped += 1
+        self._pending.append(entry)
+        if self._file is not None:
+            self._file_pending.append(entry)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        """Dopisuje paczkę zebranych wpisów do widżetu (i wszystkie do pliku)."""
+        if self._pending:
+            count = min(len(self._pending), self.batch)
+            batch = [self._pending.popleft() for _ in range(count)]
+            self.widget.append(''.join(format_entry(ts.strftime("%H:%M:%S"), level, text)
+                                       for ts, level, text in batch))
+            if self._pending:
+                self._timer.start()
+        if self._file_pending:
+            pending, self._file_pending = self._file_pending, []
+            for ts, level, text in pending:
+                self._file.handle(logging.makeLogRecord(
+                    {'msg': f"{ts.isoformat(sep=' ', timespec='milliseconds')} [{level}] {text}"}))
+
+    def close(self):
+        self._timer.stop()
+        self._pending.clear()
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,41 +1,70 @@
+import argparse
 import multiprocessing
 import signal
 import sys
 import time
-from node_process import run_node
+from node_process import run_node, SERVER_MODES, BASE_PORT
+from supervisor import NodeSupervisor
 import subprocess
 import os
 
-def start_nodes(n=10, base_port=12000):
+def start_nodes(n=10, base_port=12000, mode='thread'):
+    """Jeden proces na węzeł - dla małych klastrów i testów; main używa NodeSupervisor."""
     procs = []
     for i in range(n):
-        p = multiprocessing.Process(target=run_node, args=(i, base_port), daemon=True)
+        p = multiprocessing.Process(target=run_node, args=(i, base_port, mode), daemon=True)
         p.start()
         procs.append(p)
     return procs
 
 if __name__ == "__main__":
-    multiprocessing.set_start_method('spawn')  # bezpieczne na Windows i Unix
-    NUM_NODES = 10
-    BASE_PORT = 12000
+    parser = argparse.ArgumentParser(description="Symulacja sieci CRC")
+    parser.add_argument('--server-mode', choices=SERVER_MODES, default='thread',
+                        help="wątek na połączenie (thread) albo jedna pętla asyncio na węzeł (async)")
+    parser.add_argument('--nodes', type=int, default=10, help="liczba węzłów")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="liczba procesów z węzłami (domyślnie liczba rdzeni)")
+    parser.add_argument('--base-port', type=int, default=BASE_PORT, help="port węzła 0; węzeł i ma port base+i")
+    parser.add_argument('--registry', default=None, help="zapisz spis węzłów (JSON) do tego pliku")
+    parser.add_argument('--startup-timeout', type=float, default=30.0,
+                        help="ile sekund czekać na gotowość węzłów")
+    parser.add_argument('--log-file', default=None,
+                        help="zapisuj też logi konsoli do tego pliku (rotowany po 1 MB)")
+    parser.add_argument('--log-max-entries', type=int, default=2000,
+                        help="ile ostatnich wpisów trzyma konsola GUI")
+    parser.add_argument('--trace-file', default=None,
+                        help="przy zamknięciu GUI zapisz ślady wiadomości (format Chrome trace) do tego pliku")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="metryki węzłów przez HTTP (127.0.0.1): węzeł i na porcie METRICS_PORT+i, ścieżka /metrics")
+    parser.add_argument('--no-gui', action='store_true', help="tylko węzły, bez okna (Ctrl+C kończy)")
+    args = parser.parse_args()
 
-    # Start nodes
-    procs = start_nodes(NUM_NODES, BASE_PORT)
-    print("Uruchomiono procesy węzłów.")
+    # Start nodes (forkserver, a gdzie go nie ma - spawn; procesy zgłaszają gotowość przez potok)
+    supervisor = NodeSupervisor(args.nodes, args.base_port, args.server_mode, args.workers,
+                                metrics_base_port=args.metrics_port).start()
+    try:
+        startup = supervisor.wait_ready(args.startup_timeout)
+        print(f"Uruchomiono {args.nodes} węzłów w {len(supervisor.groups)} procesach "
+              f"({supervisor.ctx.get_start_method()}) w {startup:.2f} s.")
+    except TimeoutError as e:
+        print("Nie wszystkie węzły wystartowały:", e)
+    if args.registry:
+        supervisor.registry.save(args.registry)
 
     # Uruchom GUI
     try:
-        from gui import run_gui
-        run_gui()
+        if args.no_gui:
+            while True:
+                time.sleep(1)
+        else:
+            from gui import run_gui  # PyQt ładowany tylko w procesie GUI
+            run_gui(supervisor.registry, args.log_file, args.log_max_entries, args.trace_file)
+    except KeyboardInterrupt:
+        pass
     except Exception as e:
         print("Błąd GUI:", e)
     finally:
         print("Zamykanie procesów węzłów...")
-        for p in procs:
-            try:
-                p.terminate()
-            except:
-                pass
-        time.sleep(0.5)
+        supervisor.stop()
         print("Zakończono.")
         sys.exit(0)
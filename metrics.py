@@ -0,0 +1,212 @@
+"""
+Metryki węzła: liczniki i histogramy czasu bez wspólnej blokady na gorącej ścieżce.
+
+Każdy wątek pisze do własnej "części" (_Shard) - zwykłe `+=` na polach
+obiektu, którego używa tylko on. Odczyt (get_metrics, HTTP) sumuje części.
+Wątek połączenia oddaje swoją część przy końcu połączenia (release), a części
+innych zakończonych wątków są scalane przy rejestracji nowej - liczba części
+nie rośnie z liczbą połączeń, nawet gdy nikt nie pyta o metryki.
+Histogramy mają koszyki co 2x (tracing.HISTOGRAM_BOUNDS).
+
+Opcjonalny serwer HTTP na 127.0.0.1 wystawia metryki w formacie tekstowym
+Prometheusa pod /metrics.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tracing import HISTOGRAM_BOUNDS
+
+now = time.monotonic_ns
+
+# Liczniki (rosnące): nazwa -> opis
+COUNTERS = {
+    'requests': "Odczytane żądania (wiadomości i sterujące)",
+    'responses': "Wysłane odpowiedzi",
+    'errors': "Odpowiedzi ze statusem 'error'",
+    'packets_in': "Przyjęte pakiety (poprawnie zdekodowane ramki)",
+    'bytes_in': "Bajty przyjętych ramek",
+    'dropped': "Pakiety odrzucone przez DROP_PACKET",
+    'delayed': "Pakiety opóźnione przez DELAY_PACKET",
+    'delays_finished': "Pakiety, których opóźnienie (DELAY_PACKET) już minęło",
+    'crc_ok': "Pakiety dostarczone z poprawnym CRC",
+    'crc_failed': "Pakiety dostarczone z błędnym CRC",
+    'forwarded': "Pakiety przekazane dalej po trasie",
+    'discarded': "Pakiety odrzucone na trasie z powodu błędnego CRC",
+    'connections_opened': "Otwarte połączenia",
+    'connections_closed': "Zamknięte połączenia",
+}
+# Histogramy czasu (ns): nazwa -> opis
+HISTOGRAMS = {
+    'handler': "Czas od odczytu żądania do odpowiedzi",
+    'lock_wait': "Czas czekania na blokadę węzła",
+}
+# Koszyki histogramu (ostatni: powyżej HISTOGRAM_BOUNDS) i na końcu listy suma w ns
+_BUCKETS = len(HISTOGRAM_BOUNDS) + 1
+
+
+class _Shard:
+    __slots__ = tuple(COUNTERS) + ('hists', 'thread')
+
+    def __init__(self, thread=None):
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        self.hists = {name: [0] * (_BUCKETS + 1) for name in HISTOGRAMS}
+        self.thread = thread
+
+    def merge(self, other):
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name, values in other.hists.items():
+            mine = self.hists[name]
+            for i, v in enumerate(values):
+                mine[i] += v
+
+
+class NodeMetrics:
+    """
+    Liczniki i histogramy jednego węzła. Na gorącej ścieżce: `shard()` (część
+    bieżącego wątku) i `+=` na jej polach albo `observe(...)`.
+    `gauges()` daje dodatkowe wartości chwilowe (np. liczba subskrybentów).
+    """
+
+    def __init__(self, node_id: int, gauges=None):
+        self.node_id = node_id
+        self.gauges = gauges
+        self._local = threading.local()
+        self._shards = set()
+        self._retired = _Shard()
+        self._lock = threading.Lock()  # tylko rejestracja i oddawanie części oraz odczyt
+
+    def shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._prune()
+                self._shards.add(shard)
+            return shard
+
+    def release(self):
+        """Koniec pracy bieżącego wątku (np. połączenia): jego część trafia do wspólnej."""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            return
+        del self._local.shard
+        with self._lock:
+            self._shards.discard(shard)
+            self._retired.merge(shard)
+
+    def _prune(self):
+        """Pod blokadą: części zakończonych wątków (już nie piszą) są scalane na stałe."""
+        dead = [shard for shard in self._shards if not shard.thread.is_alive()]
+        for shard in dead:
+            self._shards.discard(shard)
+            self._retired.merge(shard)
+
+    def observe(self, name: str, ns: int):
+        hist = self.shard().hists[name]
+        hist[bisect_left(HISTOGRAM_BOUNDS, ns)] += 1
+        hist[-1] += ns
+
+    def lock_wait(self, started: int):
+        """Po wejściu pod blokadę: czas od `started` (now()) trafia do histogramu lock_wait."""
+        self.observe('lock_wait', now() - started)
+
+    def delay_started(self):
+        self.shard().delayed += 1
+
+    def delay_finished(self):
+        self.shard().delays_finished += 1
+
+    def started(self) -> int:
+        """Odczytano żądanie; zwraca chwilę odczytu (do finished)."""
+        self.shard().requests += 1
+        return now()
+
+    def finished(self, started, res):
+        shard = self.shard()
+        shard.responses += 1
+        if res and res.get('status') == 'error':
+            shard.errors += 1
+        if started is not None:
+            self.observe('handler', now() - started)
+
+    def _total(self) -> _Shard:
+        total = _Shard()
+        with self._lock:
+            self._prune()
+            total.merge(self._retired)
+            for shard in self._shards:
+                total.merge(shard)
+        return total
+
+    def snapshot(self) -> dict:
+        total = self._total()
+        counters = {name: getattr(total, name) for name in COUNTERS}
+        gauges = {
+            'queue_depth': total.requests - total.responses,  # żądania odczytane, jeszcze bez odpowiedzi
+            'connections': total.connections_opened - total.connections_closed,
+            'delayed_pending': total.delayed - total.delays_finished,  # pakiety w trakcie opóźnienia
+        }
+        if self.gauges is not None:
+            gauges.update(self.gauges())
+        histograms = {
+            name: {
+                'bounds_s': [b / 1e9 for b in HISTOGRAM_BOUNDS],
+                'counts': hist[:_BUCKETS],
+                'sum_s': hist[-1] / 1e9,
+                'count': sum(hist[:_BUCKETS]),
+            } for name, hist in total.hists.items()
+        }
+        return {'node': self.node_id, 'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+
+def exposition(snapshot: dict, prefix: str = 'crc_node') -> str:
+    """Metryki w formacie tekstowym Prometheusa (0.0.4)."""
+    label = f'node="{snapshot["node"]}"'
+    lines = []
+    for name, value in snapshot['counters'].items():
+        metric = f'{prefix}_{name}_total'
+        lines += [f'# HELP {metric} {COUNTERS.get(name, name)}', f'# TYPE {metric} counter',
+                  f'{metric}{{{label}}} {value}']
+    for name, value in snapshot['gauges'].items():
+        metric = f'{prefix}_{name}'
+        lines += [f'# TYPE {metric} gauge', f'{metric}{{{label}}} {value}']
+    for name, hist in snapshot['histograms'].items():
+        metric = f'{prefix}_{name}_seconds'
+        lines += [f'# HELP {metric} {HISTOGRAMS.get(name, name)}', f'# TYPE {metric} histogram']
+        cumulative = 0
+        for bound, count in zip(hist['bounds_s'], hist['counts']):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {hist["count"]}')
+        lines.append(f'{metric}_sum{{{label}}} {hist["sum_s"]:.9g}')
+        lines.append(f'{metric}_count{{{label}}} {hist["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def start_metrics_http(metrics: NodeMetrics, port: int, host: str = '127.0.0.1'):
+    """Serwer HTTP (wątek w tle) z GET /metrics; zwraca ThreadingHTTPServer."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = exposition(metrics.snapshot()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # bez wpisu na każde pobranie metryk
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name=f'metrics-http-{port}').start()
+    return server
@@ -1,26 +1,190 @@
 """Modele sieciowe - Node i Packet."""
 
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from contextlib import nullcontext
+
+DEFAULT_HISTORY_CAPACITY = 10000
+# Największy numer węzła (nadawcy) mieszczący się w kolumnach historii (array('i'))
+MAX_NODE_ID = 2 ** 31 - 1
+# Wspólny bufor bajtów ramek z historii (cykliczny - stare ramki są nadpisywane)
+DEFAULT_FRAME_BUFFER_SIZE = 4 * 1024 * 1024
+# Ile znaków wiadomości trafia do historii (pełna ramka nie jest przechowywana)
+MESSAGE_PREVIEW_CHARS = 64
+# Górne granice przedziałów histogramu opóźnień (s); ostatni przedział to "powyżej"
+DELAY_BUCKETS = (0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0)
+
+# Zwarty wpis historii: bez ramki, z długością ramki w bitach
+PacketRecord = namedtuple('PacketRecord', 'seq time sender receiver status delay crc_valid frame_len message')
+
+STATUS_CODES = ('sent', 'received', 'dropped', 'error', 'forwarded', 'discarded')
+_STATUS_INDEX = {s: i for i, s in enumerate(STATUS_CODES)}
+
+
 class Packet:
     """Pakiet danych w sieci."""
-    def __init__(self, sender_id, receiver_id, message, frame_bits, crc_poly):
+    __slots__ = ('sender_id', 'receiver_id', 'message', 'frame', 'crc_poly', 'status', 'delay', 'crc_valid')
+
+    def __init__(self, sender_id, receiver_id, message, frame, crc_poly):
         self.sender_id = sender_id
         self.receiver_id = receiver_id
         self.message = message
-        self.frame_bits = frame_bits
+        self.frame = frame  # crc.Frame (bajty + długość w bitach)
         self.crc_poly = crc_poly
         self.status = 'sent'
         self.delay = 0.0
         self.crc_valid = None
 
 
+class NodeStats:
+    """Liczniki zbiorcze węzła - liczone dla wszystkich pakietów, także tych wypchniętych z historii."""
+    def __init__(self):
+        self.received = 0
+        self.forwarded = 0
+        self.discarded = 0  # zły CRC na węźle pośrednim - ramka nie poszła dalej
+        self.dropped = 0
+        self.crc_ok = 0
+        self.crc_failed = 0
+        self.delayed = 0
+        self.delay_histogram = [0] * (len(DELAY_BUCKETS) + 1)
+
+    def record(self, packet):
+        if packet.status == 'dropped':
+            self.dropped += 1
+            return
+        if packet.status == 'forwarded':
+            self.forwarded += 1
+        elif packet.status == 'discarded':
+            self.discarded += 1
+        else:
+            self.received += 1
+        if packet.crc_valid:
+            self.crc_ok += 1
+        elif packet.crc_valid is not None:
+            self.crc_failed += 1
+        if packet.delay:
+            self.delayed += 1
+            self.delay_histogram[bisect_left(DELAY_BUCKETS, packet.delay)] += 1
+
+    def to_dict(self):
+        buckets = [str(b) for b in DELAY_BUCKETS] + ['+Inf']
+        return {
+            'received': self.received,
+            'forwarded': self.forwarded,
+            'discarded': self.discarded,
+            'dropped': self.dropped,
+            'crc_ok': self.crc_ok,
+            'crc_failed': self.crc_failed,
+            'delayed': self.delayed,
+            'delay_histogram': dict(zip(buckets, self.delay_histogram)),
+        }
+
+
+class PacketStore:
+    """
+    Historia pakietów w układzie kolumnowym (array) o stałej pojemności.
+
+    Każda kolumna to jedna tablica liczb, więc wpis kosztuje kilkadziesiąt bajtów
+    zamiast obiektu z __dict__. Bajty ramek leżą we wspólnym buforze cyklicznym;
+    wpis pamięta tylko przesunięcie (rosnące), więc stare ramki mogą już nie być dostępne.
+    """
+
+    def __init__(self, capacity=DEFAULT_HISTORY_CAPACITY, frame_buffer_size=DEFAULT_FRAME_BUFFER_SIZE):
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError(f"Pojemność historii musi być dodatnią liczbą całkowitą, nie {capacity!r}")
+        self.capacity = capacity
+        self.seq = array('q', bytes(8 * capacity))
+        self.time = array('d', bytes(8 * capacity))
+        self.sender = array('i', bytes(4 * capacity))
+        self.receiver = array('i', bytes(4 * capacity))
+        self.status = array('b', bytes(capacity))
+        self.delay = array('f', bytes(4 * capacity))
+        self.crc_valid = array('b', bytes(capacity))  # -1 = brak, 0 = błąd, 1 = OK
+        self.frame_len = array('q', bytes(8 * capacity))  # w bitach
+        self.frame_offset = array('q', bytes(8 * capacity))  # -1 = ramka nie zapisana
+        self.message = [''] * capacity
+        self.frame_buffer = bytearray(frame_buffer_size)
+        self._frame_pos = 0  # łączna liczba zapisanych bajtów ramek
+        self._next = 0  # łączna liczba zapisanych wpisów
+
+    def __len__(self):
+        return min(self._next, self.capacity)
+
+    def _slot(self, i):
+        """Pozycja w tablicach dla i-tego wpisu od najstarszego."""
+        return (self._next - len(self) + i) % self.capacity
+
+    def append(self, seq, t, packet, message):
+        """
+        Zapisuje wpis. Wartości są najpierw zamieniane na typy kolumn - błąd
+        (TypeError, OverflowError) nie zajmuje pozycji i nie psuje najstarszego wpisu.
+        """
+        ids = array('i', (packet.sender_id if packet.sender_id is not None else -1, packet.receiver_id))
+        delay = array('f', (packet.delay,))[0]
+        frame = packet.frame
+        frame_len = len(frame) if frame is not None else 0
+        slot = self._next % self.capacity
+        self.seq[slot] = seq
+        self.time[slot] = t
+        self.sender[slot], self.receiver[slot] = ids
+        self.status[slot] = _STATUS_INDEX.get(packet.status, _STATUS_INDEX['error'])
+        self.delay[slot] = delay
+        self.crc_valid[slot] = -1 if packet.crc_valid is None else int(bool(packet.crc_valid))
+        self.frame_len[slot] = frame_len
+        self.frame_offset[slot] = self._store_frame(frame)
+        self.message[slot] = message
+        self._next += 1
+
+    def _store_frame(self, frame):
+        size = len(self.frame_buffer)
+        if frame is None or not size:
+            return -1
+        nbytes = (frame.bit_len + 7) // 8
+        if nbytes > size:
+            return -1
+        offset = self._frame_pos
+        start = offset % size
+        first = min(nbytes, size - start)
+        self.frame_buffer[start:start + first] = frame.data[:first]
+        if first < nbytes:
+            self.frame_buffer[:nbytes - first] = frame.data[first:nbytes]
+        self._frame_pos += nbytes
+        return offset
+
+    def frame_bytes(self, slot):
+        """Bajty ramki dla pozycji `slot` albo None, jeśli zostały już nadpisane."""
+        offset = self.frame_offset[slot]
+        size = len(self.frame_buffer)
+        nbytes = (self.frame_len[slot] + 7) // 8
+        if offset < 0 or offset < self._frame_pos - size:
+            return None
+        start = offset % size
+        first = min(nbytes, size - start)
+        return bytes(self.frame_buffer[start:start + first]) + bytes(self.frame_buffer[:nbytes - first])
+
+    def record(self, slot):
+        crc = self.crc_valid[slot]
+        sender = self.sender[slot]
+        return PacketRecord(
+            self.seq[slot], self.time[slot], sender if sender >= 0 else None, self.receiver[slot],
+            STATUS_CODES[self.status[slot]], round(self.delay[slot], 3),
+            None if crc < 0 else bool(crc), self.frame_len[slot], self.message[slot])
+
+
 class Node:
     """Węzeł (komputer) w sieci."""
-    def __init__(self, node_id, port):
+    def __init__(self, node_id, port, history_capacity=DEFAULT_HISTORY_CAPACITY,
+                 frame_buffer_size=DEFAULT_FRAME_BUFFER_SIZE):
         self.node_id = node_id
         self.port = port
         self.errors = {'BIT_FLIP': False, 'DROP_PACKET': False, 'DELAY_PACKET': False}
-        self.packets_history = []
+        # Bufor cykliczny: najstarsze wpisy są nadpisywane po przekroczeniu pojemności
+        self.packets_history = PacketStore(history_capacity, frame_buffer_size)
+        self.stats = NodeStats()
         self.last_message = None
+        self._seq = 0
     
     def set_error(self, error_type, enabled):
         """Włącz/wyłącz błąd."""
@@ -32,5 +196,58 @@ class Node:
             self.errors[e] = False
     
     def add_packet(self, packet):
-        """Dodaj pakiet do historii."""
-        self.packets_history.append(packet)
+        """Dodaj pakiet do historii (jako zwarty wpis) i zaktualizuj liczniki."""
+        message = packet.message or ''
+        self.packets_history.append(self._seq + 1, time.time(), packet, message[:MESSAGE_PREVIEW_CHARS])
+        self._seq += 1
+        self.stats.record(packet)
+
+    def get_history(self, offset=0, limit=50, status=None, sender=None, crc_valid=None, with_frames=False,
+                    lock=nullcontext()):
+        """
+        Strona historii od najnowszych wpisów, z opcjonalnym filtrem.
+
+        Zwraca (wpisy, liczba wszystkich pasujących wpisów); przy with_frames
+        wpisy to pary (wpis, bajty ramki albo None). `lock` to blokada węzła:
+        pod nią są tylko kopie kolumn filtra i budowa wpisów strony, a
+        przejście po wszystkich pozycjach odbywa się już bez niej. Wpis
+        nadpisany w międzyczasie (inny 'seq' na pozycji) wypada ze strony.
+        """
+        store = self.packets_history
+        if status is None and sender is None and crc_valid is None:
+            with lock:
+                # Bez filtra: od razu właściwy fragment bufora
+                n = len(store)
+                slots = [store._slot(i) for i in range(n - 1 - offset, max(n - 1 - offset - limit, -1), -1)]
+                return self._history_page(slots, with_frames), n
+
+        with lock:
+            n, last = len(store), store._next - 1
+            seqs = store.seq[:]
+            statuses, senders, crcs = store.status[:], store.sender[:], store.crc_valid[:]
+        status_code = _STATUS_INDEX.get(status, -1) if status is not None else None
+        crc_code = None if crc_valid is None else int(bool(crc_valid))
+        capacity = store.capacity
+        matches = []
+        total = 0
+        for k in range(n):
+            slot = (last - k) % capacity
+            if status_code is not None and statuses[slot] != status_code:
+                continue
+            if sender is not None and senders[slot] != sender:
+                continue
+            if crc_code is not None and crcs[slot] != crc_code:
+                continue
+            if offset <= total < offset + limit:
+                matches.append(slot)
+            total += 1
+        with lock:
+            slots = [slot for slot in matches if store.seq[slot] == seqs[slot]]
+            return self._history_page(slots, with_frames), total
+
+    def _history_page(self, slots, with_frames):
+        store = self.packets_history
+        page = [store.record(s) for s in slots]
+        if with_frames:
+            page = [(r, store.frame_bytes(s)) for r, s in zip(page, slots)]
+        return page
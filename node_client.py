@@ -0,0 +1,361 @@
+"""Klient węzłów: trwałe połączenia z pulą i numerami żądań (pipelining)."""
+
+import itertools
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from node_process import BASE_PORT
+from protocol import encode_message, read_message
+from tracing import span
+
+
+class RequestNotSent(ConnectionError):
+    """Żądanie nie zostało wysłane (połączenie już zamknięte albo zerwane w trakcie wysyłki) - można je powtórzyć."""
+
+
+class NodeConnection:
+    """
+    Jedno trwałe połączenie TCP z węzłem.
+
+    Każde żądanie dostaje pole 'id'; wątek czytający dopasowuje odpowiedzi po 'id',
+    więc wiele żądań może czekać na tym samym gnieździe jednocześnie. Ramka
+    (obiekt Frame w polu 'frame') jest wysyłana jako ciało binarne.
+
+    Zdarzenia wysyłane przez węzeł bez pytania (subskrypcja) trafiają do
+    `on_event(zdarzenie)` w wątku czytającym; po zerwaniu połączenia przychodzi
+    jeszcze zdarzenie 'disconnected'.
+    """
+
+    def __init__(self, port: int, host: str = '127.0.0.1', connect_timeout: float = 2.0, on_event=None):
+        self.port = port
+        self.on_event = on_event
+        self.sock = socket.create_connection((host, port), timeout=connect_timeout)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self.closed = False
+        self._reader = threading.Thread(target=self._read_loop, daemon=True,
+                                        name=f'node-conn-{port}')
+        self._reader.start()
+
+    def _read_loop(self):
+        error = ConnectionError("Połączenie z węzłem zamknięte")
+        try:
+            with self.sock.makefile('rb') as rfile:
+                while True:
+                    res, _ = read_message(rfile, max_size=None)
+                    if res is None:
+                        break
+                    req_id = res.pop('id', None)
+                    if req_id is None and res.get('type') == 'event':
+                        self._dispatch(res)
+                        continue
+                    with self._lock:
+                        fut = self._pending.pop(req_id, None)
+                    if fut is not None:
+                        fut.set_result(res)
+        except (OSError, ValueError, EOFError) as e:
+            error = e
+        finally:
+            self._fail_pending(error)
+            self._dispatch({'type': 'event', 'event': 'disconnected'})
+
+    def _dispatch(self, event):
+        if self.on_event is not None:
+            try:
+                self.on_event(event)
+            except Exception:
+                traceback.print_exc()
+
+    def _fail_pending(self, error):
+        with self._lock:
+            self.closed = True
+            pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(error)
+
+    def submit(self, payload: dict, trace=None) -> Future:
+        """
+        Wysyła żądanie bez czekania; wynik (dict odpowiedzi) w zwróconym Future.
+        Z `trace` (tracing.Trace) wiadomość jest śledzona, a kodowanie i wysyłka trafiają do śladu.
+        """
+        if trace is not None:
+            payload = {**payload, 'trace': trace.trace_id}
+        fut = Future()
+        with self._lock:
+            if self.closed:
+                raise RequestNotSent("Połączenie z węzłem zamknięte")
+            req_id = next(self._ids)
+            self._pending[req_id] = fut
+        with span(trace, 'client.encode'):
+            buffers = encode_message({**payload, 'id': req_id})
+        try:
+            with self._send_lock, span(trace, 'client.send'):
+                for buf in buffers:
+                    self.sock.sendall(buf)
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(req_id, None)
+            self.close()
+            raise RequestNotSent(str(e)) from e
+        fut.req_id = req_id
+        return fut
+
+    def request(self, payload: dict, timeout: float = None, trace=None) -> dict:
+        return self.wait(self.submit(payload, trace), timeout, trace)
+
+    def wait(self, fut: Future, timeout: float = None, trace=None) -> dict:
+        """Odpowiedź na żądanie wysłane przez submit; TimeoutError po `timeout` s."""
+        try:
+            with span(trace, 'client.wait'):
+                res = fut.result(timeout)
+        except FutureTimeout:
+            self.cancel(fut)
+            raise TimeoutError(f"Brak odpowiedzi węzła (port {self.port}) w {timeout}s")
+        if trace is not None:
+            trace.extend(res.pop('trace', None))
+        return res
+
+    def cancel(self, fut: Future):
+        """Przestaje czekać na odpowiedź (spóźniona odpowiedź zostanie zignorowana)."""
+        with self._lock:
+            self._pending.pop(fut.req_id, None)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class ConnectionPool:
+    """
+    Pula trwałych połączeń: jedno połączenie na węzeł, tworzone przy pierwszym użyciu.
+
+    Zdarzenia z węzłów trafiają do funkcji dodanych przez add_event_handler
+    jako `handler(node_id, zdarzenie)`.
+    """
+
+    def __init__(self, base_port: int = BASE_PORT, host: str = '127.0.0.1'):
+        self.base_port = base_port
+        self.host = host
+        self._conns = {}
+        self._lock = threading.Lock()
+        self._event_handlers = []
+
+    def add_event_handler(self, handler):
+        self._event_handlers.append(handler)
+
+    def _dispatch(self, node_id, event):
+        for handler in list(self._event_handlers):
+            handler(node_id, event)
+
+    def get(self, node_id: int, connect_timeout: float = 2.0) -> NodeConnection:
+        with self._lock:
+            conn = self._conns.get(node_id)
+            if conn is not None and not conn.closed:
+                return conn
+        conn = NodeConnection(self.base_port + node_id, self.host, connect_timeout,
+                              on_event=lambda event: self._dispatch(node_id, event))
+        with self._lock:
+            existing = self._conns.get(node_id)
+            if existing is not None and not existing.closed:
+                conn.close()
+                return existing
+            self._conns[node_id] = conn
+        return conn
+
+    def request(self, node_id: int, payload: dict, timeout: float = 2.0, trace=None) -> dict:
+        """
+        Żądanie przez połączenie z puli. Zerwane połączenie jest odnawiane raz, ale
+        tylko gdy żądanie nie zostało wysłane - wysłane mogło już zostać obsłużone
+        przez węzeł, więc jego błąd trafia do wywołującego (bez podwójnej wiadomości).
+        """
+        for attempt in (0, 1):
+            with span(trace, 'client.connect'):
+                conn = self.get(node_id, connect_timeout=timeout)
+            try:
+                fut = conn.submit(payload, trace)
+            except RequestNotSent:
+                if attempt:
+                    raise
+                continue
+            return conn.wait(fut, timeout, trace)
+        raise ConnectionError("Nie udało się wysłać żądania")
+
+    def submit(self, node_id: int, payload: dict) -> Future:
+        return self.get(node_id).submit(payload)
+
+    def close(self):
+        with self._lock:
+            conns, self._conns = list(self._conns.values()), {}
+        for conn in conns:
+            conn.close()
+
+
+class ClusterResult:
+    """Wynik polecenia do wielu węzłów: odpowiedzi i błędy (timeout, brak połączenia) osobno."""
+
+    def __init__(self):
+        self.results = {}
+        self.failures = {}
+
+    @property
+    def all_ok(self) -> bool:
+        return not self.failures and all(r.get('status') == 'ok' for r in self.results.values())
+
+    def __repr__(self):
+        return f"ClusterResult(ok={sorted(self.results)}, failed={self.failures})"
+
+
+class ClusterClient:
+    """
+    Polecenia do całego klastra naraz.
+
+    Żądania do wszystkich węzłów są wysyłane od razu (trwałe połączenia z puli),
+    a odpowiedzi zbierane równolegle - całość trwa jeden czas odpowiedzi
+    najwolniejszego węzła, a nie sumę czasów.
+    """
+
+    def __init__(self, node_ids, pool: ConnectionPool = None):
+        self.node_ids = list(node_ids)
+        self.pool = pool or _default_pool
+        self._connector = ThreadPoolExecutor(max_workers=32, thread_name_prefix='cluster-connect')
+
+    def broadcast(self, payload: dict, timeout: float = 2.0, node_ids=None) -> ClusterResult:
+        node_ids = self.node_ids if node_ids is None else list(node_ids)
+        deadline = time.monotonic() + timeout
+        result = ClusterResult()
+
+        # Nawiązanie brakujących połączeń równolegle, potem wysłanie bez czekania
+        def submit(node_id):
+            conn = self.pool.get(node_id, connect_timeout=timeout)
+            return conn, conn.submit(payload)
+        submitted = {node_id: self._connector.submit(submit, node_id) for node_id in node_ids}
+
+        pending = {}
+        for node_id, job in submitted.items():
+            try:
+                pending[node_id] = job.result(max(deadline - time.monotonic(), 0))
+            except FutureTimeout:
+                result.failures[node_id] = 'timeout (połączenie)'
+            except Exception as e:
+                result.failures[node_id] = str(e)
+
+        for node_id, (conn, fut) in pending.items():
+            try:
+                result.results[node_id] = fut.result(max(deadline - time.monotonic(), 0))
+            except FutureTimeout:
+                conn.cancel(fut)
+                result.failures[node_id] = 'timeout'
+            except Exception as e:
+                result.failures[node_id] = str(e)
+        return result
+
+    def control(self, payload: dict, timeout: float = 2.0, node_ids=None) -> ClusterResult:
+        return self.broadcast({'type': 'control', **payload}, timeout, node_ids)
+
+
+class StatusCache:
+    """
+    Lokalna kopia stanu węzłów (błędy, ostatnia wiadomość, liczniki) aktualizowana
+    zdarzeniami z subskrypcji - odczyt nie wymaga pytania węzła.
+
+    Stan węzła jest znany od udanego subscribe() do zerwania połączenia;
+    zdarzenia starsze (mniejsze 'version') niż posiadany stan są pomijane.
+    `on_change(node_id, stan albo None)` jest wołane w wątku czytającym połączenia.
+    """
+
+    def __init__(self, node_ids, pool: ConnectionPool = None, on_change=None):
+        self.cluster = ClusterClient(node_ids, pool)
+        self.pool = self.cluster.pool
+        self.on_change = on_change
+        self._status = {}
+        self._lock = threading.Lock()
+        self.pool.add_event_handler(self._on_event)
+
+    @property
+    def node_ids(self):
+        return self.cluster.node_ids
+
+    def subscribe(self, timeout: float = 2.0, node_ids=None) -> ClusterResult:
+        """Subskrybuje węzły (domyślnie te bez znanego stanu); wynik jak ClusterClient.control."""
+        if node_ids is None:
+            with self._lock:
+                node_ids = [n for n in self.node_ids if n not in self._status]
+        result = self.cluster.control({'cmd': 'subscribe'}, timeout, node_ids)
+        for node_id, status in result.results.items():
+            if status.get('status') == 'ok':
+                self._apply(node_id, status)
+        return result
+
+    def get(self, node_id: int):
+        """Ostatni znany stan węzła albo None (brak subskrypcji / zerwane połączenie)."""
+        return self._status.get(node_id)
+
+    def errors(self, node_id: int):
+        status = self._status.get(node_id)
+        return None if status is None else status['errors']
+
+    def close(self):
+        """Odłącza on_change (np. przed zamknięciem okna, które je obsługuje)."""
+        self.on_change = None
+
+    def _apply(self, node_id, status):
+        with self._lock:
+            current = self._status.get(node_id)
+            if current is not None and current.get('version', -1) > status.get('version', -1):
+                return
+            status = {k: v for k, v in status.items() if k not in ('type', 'event')}
+            status['status'] = 'ok'
+            self._status[node_id] = status
+        if self.on_change is not None:
+            self.on_change(node_id, status)
+
+    def _on_event(self, node_id, event):
+        kind = event.get('event')
+        if kind == 'status':
+            self._apply(node_id, event)
+        elif kind == 'disconnected':
+            with self._lock:
+                known = self._status.pop(node_id, None) is not None
+            if known and self.on_change is not None:
+                self.on_change(node_id, None)
+
+
+_default_pool = ConnectionPool()
+
+
+def send_control_to_node(node_id:int, payload:dict, timeout=2.0, pool:ConnectionPool=None):
+    try:
+        return (pool or _default_pool).request(node_id, {'type':'control', **payload}, timeout)
+    except Exception as e:
+        return {'status':'error','reason':str(e)}
+
+def send_message_to_node(node_id:int, payload:dict, timeout=3.0, pool:ConnectionPool=None, trace=None):
+    try:
+        return (pool or _default_pool).request(node_id, {'type':'message', **payload}, timeout, trace)
+    except Exception as e:
+        return {'status':'error','reason':str(e)}
+
+def get_node_status(node_id:int, timeout=2.0):
+    """Get status of a node including its errors"""
+    return send_control_to_node(node_id, {'cmd': 'get_status'}, timeout=timeout)
+
+def get_node_metrics(node_id:int, timeout=2.0, pool:ConnectionPool=None):
+    """Liczniki i histogramy węzła (metrics.NodeMetrics.snapshot) w polu 'metrics'."""
+    return send_control_to_node(node_id, {'cmd': 'get_metrics'}, timeout=timeout, pool=pool)
+
+def profile_node(node_id:int, seconds=5.0, interval_ms=5.0, top=50, skip_idle=False, pool:ConnectionPool=None):
+    """Profil próbkujący procesu węzła (profiler.profile) w polu 'profile'; odpowiedź po `seconds`."""
+    payload = {'cmd': 'profile', 'seconds': seconds, 'interval_ms': interval_ms, 'top': top, 'skip_idle': skip_idle}
+    return send_control_to_node(node_id, payload, timeout=seconds + 10.0, pool=pool)
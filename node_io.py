@@ -0,0 +1,63 @@
+"""Żądania do węzłów poza wątkiem GUI: pula wątków Qt, wyniki wracają sygnałami."""
+
+from PyQt5 import QtCore
+from node_client import send_control_to_node, send_message_to_node
+
+
+class _TaskSignals(QtCore.QObject):
+    done = QtCore.pyqtSignal(object)
+
+
+class _Task(QtCore.QRunnable):
+    def __init__(self, fn, args, kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = _TaskSignals()
+
+    def run(self):
+        try:
+            res = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            res = {'status': 'error', 'reason': str(e)}
+        self.signals.done.emit(res)
+
+
+class NodeIO(QtCore.QObject):
+    """
+    Wykonuje blokujące wywołania (gniazda węzłów) w QThreadPool.
+
+    `callback(wynik)` jest wołany w wątku GUI (połączenie kolejkowane), więc
+    może bezpiecznie zmieniać widżety.
+    """
+
+    def __init__(self, parent=None, max_threads: int = 16, pool=None):
+        super().__init__(parent)
+        self.conn_pool = pool  # node_client.ConnectionPool; None = pula domyślna
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._running = set()  # referencje do zadań, dopóki nie skończą
+
+    def call(self, fn, *args, callback=None, **kwargs):
+        task = _Task(fn, args, kwargs)
+        task.setAutoDelete(False)
+        self._running.add(task)
+        task.signals.done.connect(lambda res, task=task: self._finished(task, res, callback),
+                                  QtCore.Qt.QueuedConnection)
+        self.pool.start(task)
+
+    def _finished(self, task, res, callback):
+        self._running.discard(task)
+        if callback is not None:
+            callback(res)
+
+    def control(self, node_id: int, payload: dict, callback=None, timeout: float = 2.0):
+        self.call(send_control_to_node, node_id, payload, timeout, self.conn_pool, callback=callback)
+
+    def message(self, node_id: int, payload: dict, callback=None, timeout: float = 3.0):
+        self.call(send_message_to_node, node_id, payload, timeout, self.conn_pool, callback=callback)
+
+    def wait(self, msecs: int = -1) -> bool:
+        """Czeka na zakończenie wszystkich zadań (np. przy zamykaniu okna)."""
+        return self.pool.waitForDone(msecs)
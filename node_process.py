@@ -1,109 +1,891 @@
+import asyncio
+import base64
+import heapq
+import itertools
+import os
 import socket
 import threading
-import json
 import time
 import random
-from crc import check_frame
-from network_models import Node, Packet
+import traceback
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from crc import check_frame, Frame
+from metrics import NodeMetrics, start_metrics_http, now as metrics_now
+from network_models import Node, Packet, DEFAULT_HISTORY_CAPACITY, MAX_NODE_ID
+from protocol import (DEFAULT_MAX_MESSAGE_SIZE, MessageTooLarge, encode_message,
+                      read_message, read_message_async)
+from tracing import Trace, span, now as trace_now
 
 
 BASE_PORT = 12000
 ERROR_TYPES = ('BIT_FLIP', 'DROP_PACKET', 'DELAY_PACKET')
+SERVER_MODES = ('thread', 'async')
+# Wartości pola 'type' żądania
+REQUEST_TYPES = ('control', 'message')
+LISTEN_BACKLOG = 1024
+# Ramki dłuższe niż ten próg (w bitach) są sprawdzane w puli wątków, żeby nie blokować pętli asyncio
+EXECUTOR_CRC_BITS = 64 * 1024 * 8
+# Wątki obsługujące żądania z numerem 'id' (pipelining na trwałym połączeniu)
+REQUEST_WORKERS = 32
+# Największa strona zwracana przez get_history
+MAX_HISTORY_PAGE = 1000
+# Najdłuższa trasa (lista kolejnych węzłów w polu 'route') przyjmowana przez węzeł
+MAX_ROUTE_HOPS = 255
+# Najwyższy numer portu TCP - węzeł trasy musi mieć port base_port + numer w tym zakresie
+MAX_PORT = 65535
+# Jak długo zwykłe (bez 'id') żądanie czeka na odpowiedź z dalszej części trasy
+FORWARD_TIMEOUT = 30.0
+# Jak długo połączenie zamknięte przez klienta czeka z zamknięciem gniazda na odpowiedzi żądań w toku
+CONNECTION_DRAIN_TIMEOUT = FORWARD_TIMEOUT
+# Zmiany liczników (nowe pakiety) są wysyłane subskrybentom najwyżej raz na tyle sekund
+STATUS_PUSH_INTERVAL = 0.1
+# Wątki wysyłające zdarzenia subskrybentom w trybie wątkowym (wolny subskrybent zajmuje jeden)
+PUSH_WORKERS = 4
+
+def decode_frame(msg: dict) -> Frame:
+    """Odtwarza ramkę z wiadomości; stary format 'frame_bits' ('0'/'1') nadal działa."""
+    if isinstance(msg.get('frame'), Frame):
+        return msg['frame']  # ciało binarne, już odczytane przez protocol.read_message
+    if 'frame' in msg:
+        return Frame.from_base64(msg['frame'], msg['frame_len'])
+    return Frame.from_bitstr(msg.get('frame_bits') or '')
+
+class DelayScheduler:
+    """
+    Planista opóźnień: jeden wątek i kopiec terminów.
+
+    Opóźniony pakiet (DELAY_PACKET) czeka w kopcu, a nie w uśpionym wątku,
+    więc nie blokuje ani blokady węzła, ani puli wątków obsługi.
+    """
+
+    def __init__(self, name: str = 'delay-scheduler'):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    def call_later(self, delay: float, fn, *args):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), fn, args))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                timeout = self._heap[0][0] - time.monotonic()
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+                _, _, fn, args = heapq.heappop(self._heap)
+            try:
+                fn(*args)
+            except Exception:
+                traceback.print_exc()
+
+class _Subscription:
+    """
+    Jeden subskrybent: najwyżej jedno czekające zdarzenie (nowsze zastępuje
+    starsze - każde niesie pełny stan i 'version') i znacznik trwającej wysyłki.
+    """
+
+    def __init__(self, push):
+        self.push = push
+        self.pending = None
+        self.sending = False
+        self._lock = threading.Lock()
+
+    def offer(self, event) -> bool:
+        """Odkłada zdarzenie; True, gdy trzeba uruchomić wysyłkę (żadna nie trwa)."""
+        with self._lock:
+            self.pending = event
+            if self.sending:
+                return False
+            self.sending = True
+            return True
+
+    def take(self):
+        """Następne zdarzenie do wysłania albo None (wysyłka się kończy)."""
+        with self._lock:
+            event, self.pending = self.pending, None
+            if event is None:
+                self.sending = False
+            return event
+
+class StatusPublisher:
+    """
+    Subskrypcje stanu węzła: zdarzenia {'type': 'event', 'event': 'status', ...}
+    wysyłane bez pytania do klientów, którzy wysłali 'subscribe'.
+
+    Zmiana błędów idzie od razu (publish), a nowe pakiety tylko oznaczają stan
+    jako zmieniony (mark_dirty) - wiele zmian w oknie STATUS_PUSH_INTERVAL daje
+    jedno zdarzenie. `call_later(delay, fn)` ustawia serwer przy starcie; bez
+    niego zdarzenia idą od razu.
+
+    publish nie wysyła sam: zdarzenie trafia do miejsca subskrybenta, a wysyłką
+    zajmuje się `start_sender(sub)` (wątek z puli albo zadanie asyncio, które
+    wywołuje drain / drain_async). Wolny subskrybent nie wstrzymuje więc
+    publikującego, a czeka na niego najwyżej jedno, najnowsze zdarzenie.
+    """
+
+    def __init__(self, snapshot, interval: float = STATUS_PUSH_INTERVAL):
+        self.snapshot = snapshot
+        self.interval = interval
+        self.call_later = None
+        self.start_sender = None
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._flush_pending = False
+
+    def subscribe(self, key, push):
+        """
+        `push(event)` wysyła zdarzenie (w trybie asyncio to korutyna, która czeka
+        na drain); `key` (połączenie) służy do wypisania.
+        """
+        with self._lock:
+            self._subscribers[key] = _Subscription(push)
+
+    def unsubscribe(self, key):
+        with self._lock:
+            self._subscribers.pop(key, None)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def publish(self):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        if not subscribers:
+            return
+        event = {'type': 'event', 'event': 'status', **self.snapshot()}
+        for sub in subscribers:
+            if sub.offer(event):
+                if self.start_sender is None:
+                    self.drain(sub)
+                else:
+                    self.start_sender(sub)
+
+    @staticmethod
+    def drain(sub):
+        """Wysyła czekające zdarzenia subskrybenta, aż miejsce będzie puste."""
+        while True:
+            event = sub.take()
+            if event is None:
+                return
+            sub.push(event)
+
+    @staticmethod
+    async def drain_async(sub):
+        while True:
+            event = sub.take()
+            if event is None:
+                return
+            try:
+                await sub.push(event)
+            except ConnectionError:
+                pass  # subskrybent się rozłączył - dalsze zdarzenia tylko opróżniają miejsce
+
+    def mark_dirty(self):
+        if not self._subscribers:
+            return
+        if self.call_later is None:
+            self.publish()
+            return
+        with self._lock:
+            if self._flush_pending:
+                return
+            self._flush_pending = True
+        self.call_later(self.interval, self._flush)
+
+    def _flush(self):
+        with self._lock:
+            self._flush_pending = False
+        self.publish()
+
+class _InFlight:
+    """Liczba żądań połączenia, na które nie wysłano jeszcze odpowiedzi."""
+
+    def __init__(self):
+        self._count = 0
+        self._cond = threading.Condition()
+
+    def add(self):
+        with self._cond:
+            self._count += 1
+
+    def done(self):
+        with self._cond:
+            self._count -= 1
+            if not self._count:
+                self._cond.notify_all()
+
+    def wait(self, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._count, timeout)
+
+
+def request_error(error: Exception) -> dict:
+    """Odpowiedź na żądanie, którego obsługa zgłosiła wyjątek; połączenie działa dalej."""
+    return {'status': 'error', 'reason': f"Błąd obsługi żądania: {error!r}"}
+
+
+def forward_timeout_error() -> dict:
+    return {'status': 'error', 'reason': f"Brak odpowiedzi z dalszej trasy w ciągu {FORWARD_TIMEOUT} s"}
+
+
+def unknown_type_error(kind) -> dict:
+    return {'status': 'error', 'reason': f"nieznany typ żądania: {kind!r} (oczekiwano {' albo '.join(REQUEST_TYPES)})"}
+
+
+def build_response(msg: dict, res) -> dict:
+    """
+    'id' z żądania jest odsyłane w odpowiedzi, żeby klient mógł ją dopasować.
+    Śledzona wiadomość dostaje w 'trace' etapy tego węzła (przed etapami dalszej trasy).
+    """
+    if res is None:
+        res = {'status': 'error', 'reason': f"nieznane żądanie: {msg.get('cmd')}"}
+    if 'id' in msg:
+        res = {**res, 'id': msg['id']}
+    trace = msg.get('_trace')
+    if trace is not None:
+        res = {**res, 'trace': trace.spans + res.get('trace', [])}
+    return res
 
 class NodeServer:
-    def __init__(self, node_id: int, base_port: int):
+    def __init__(self, node_id: int, base_port: int, max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE,
+                 history_capacity: int = DEFAULT_HISTORY_CAPACITY, metrics_port: int = None):
         self.node = Node(
             node_id=node_id,
-            port=base_port + node_id
+            port=base_port + node_id,
+            history_capacity=history_capacity
         )
+        self.base_port = base_port
+        self.max_message_size = max_message_size
         self.lock = threading.Lock()
+        self._forward_pool = None
+        self.executor = None
+        self.request_pool = None
+        self.push_pool = None
+        self._push_tasks = set()  # zadania asyncio wysyłające zdarzenia subskrybentom
+        self.scheduler = None
+        self.status_version = 0  # rośnie przy każdej zmianie stanu (kolejność zdarzeń u klienta)
+        self.publisher = StatusPublisher(self.status_snapshot)
+        self.metrics = NodeMetrics(node_id, self._metric_gauges)
+        self.metrics_port = metrics_port  # opcjonalny HTTP /metrics na 127.0.0.1
+        self.metrics_http = None
 
-    def start(self):
+    def start(self, ready=None):
+        """Tryb wątkowy; `ready(server)` jest wołane, gdy gniazdo już nasłuchuje."""
         srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         srv.bind(('127.0.0.1', self.node.port))
-        srv.listen(5)
+        srv.listen(LISTEN_BACKLOG)
+        self.request_pool = ThreadPoolExecutor(max_workers=REQUEST_WORKERS, thread_name_prefix=f'node{self.node.node_id}-req')
+        self.scheduler = DelayScheduler(name=f'node{self.node.node_id}-delay')
+        self.push_pool = ThreadPoolExecutor(max_workers=PUSH_WORKERS, thread_name_prefix=f'node{self.node.node_id}-push')
+        self.publisher.call_later = lambda delay, fn: self.scheduler.call_later(delay, self.request_pool.submit, fn)
+        self.publisher.start_sender = lambda sub: self.push_pool.submit(self.publisher.drain, sub)
+        self._start_metrics_http()
         print(f"[NODE {self.node.node_id}] Listening on {self.node.port}")
+        if ready is not None:
+            ready(self)
 
         while True:
             conn, _ = srv.accept()
             threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
 
+    def start_async(self, ready=None):
+        """Tryb asyncio: wszystkie połączenia na jednej pętli zdarzeń."""
+        asyncio.run(self.serve_async(ready))
+
+    async def serve_async(self, ready=None):
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix=f'node{self.node.node_id}-crc')
+        loop = asyncio.get_running_loop()
+        # mark_dirty bywa wołane także z wątków puli (_forward) - planowanie przez call_soon_threadsafe
+        self.publisher.call_later = lambda delay, fn: loop.call_soon_threadsafe(loop.call_later, delay, fn)
+        self.publisher.start_sender = lambda sub: loop.call_soon_threadsafe(self._start_push_task, sub)
+        srv = await asyncio.start_server(
+            self.handle_async, '127.0.0.1', self.node.port,
+            backlog=LISTEN_BACKLOG, limit=self.max_message_size + 1, reuse_address=True)
+        self._start_metrics_http()
+        print(f"[NODE {self.node.node_id}] Listening on {self.node.port} (asyncio)")
+        if ready is not None:
+            ready(self)
+        async with srv:
+            await srv.serve_forever()
+
+    def _start_push_task(self, sub):
+        task = asyncio.get_running_loop().create_task(self.publisher.drain_async(sub))
+        self._push_tasks.add(task)  # referencja do końca wysyłki
+        task.add_done_callback(self._push_tasks.discard)
+
+    def _start_metrics_http(self):
+        if self.metrics_port is not None and self.metrics_http is None:
+            self.metrics_http = start_metrics_http(self.metrics, self.metrics_port)
+            print(f"[NODE {self.node.node_id}] Metrics on http://127.0.0.1:{self.metrics_port}/metrics")
+
+    def _metric_gauges(self):
+        return {
+            'subscribers': len(self.publisher),
+        }
+
+    def _response(self, msg, res):
+        """build_response + metryki: odpowiedź, błąd, czas od odczytu żądania."""
+        self.metrics.finished(msg.get('_read_ns'), res)
+        return build_response(msg, res)
+
+    async def handle_async(self, reader, writer):
+        """Jak handle: wiele żądań na połączeniu, te z 'id' obsługiwane współbieżnie."""
+        tasks = set()
+        self.metrics.shard().connections_opened += 1
+        try:
+            while True:
+                try:
+                    msg, framed = await read_message_async(reader, self.max_message_size, EXECUTOR_CRC_BITS)
+                except MessageTooLarge as e:
+                    # Bajty wiadomości zostały pominięte - połączenie działa dalej
+                    writer.writelines(encode_message(build_response(e.msg, {'status': 'error', 'reason': str(e)}), e.framed))
+                    await writer.drain()
+                    continue
+                except ValueError as e:
+                    writer.writelines(encode_message({'status': 'error', 'reason': str(e)}))
+                    await writer.drain()
+                    break
+                if msg is None:
+                    break
+                msg['_read_ns'] = self.metrics.started()
+                if 'id' in msg:
+                    task = asyncio.create_task(self._respond_async(writer, msg, framed))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    await self._respond_async(writer, msg, framed)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (EOFError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.publisher.unsubscribe(writer)
+            self.metrics.shard().connections_closed += 1
+            writer.close()
+
+    async def _respond_async(self, writer, msg, framed):
+        kind = msg.get('type')
+        try:
+            if kind not in REQUEST_TYPES:
+                res = unknown_type_error(kind)
+            elif kind == 'control' and msg.get('cmd') in ('subscribe', 'unsubscribe'):
+                async def push(ev):
+                    writer.writelines(encode_message(ev, framed))
+                    await writer.drain()  # bufor gniazda nie rośnie ponad limit transportu
+                res = self.handle_subscription(msg, writer, push)
+            elif kind == 'control' and msg.get('cmd') == 'profile':
+                # Profilowanie trwa sekundy - w wątku, pętla w tym czasie obsługuje (i jest profilowana)
+                res = await asyncio.get_running_loop().run_in_executor(None, self.handle_control, msg)
+            elif kind == 'control':
+                res = self.handle_control(msg)
+            else:
+                res = await self.handle_message_async(msg)
+        except Exception as e:
+            res = request_error(e)
+        writer.writelines(encode_message(self._response(msg, res), framed))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass  # klient rozłączył się przed odpowiedzią
+
     def handle(self, conn):
-        with conn:
-            data = conn.recv(8192).decode().strip()
-            msg = json.loads(data)
+        """
+        Obsługa połączenia: kolejne żądania (protocol.read_message) aż do zamknięcia.
 
-            if msg['type'] == 'control':
+        Żądania z polem 'id' idą do puli wątków, a odpowiedź niesie to samo 'id',
+        więc klient może wysłać wiele żądań bez czekania (pipelining).
+        """
+        write_lock = threading.Lock()
+        inflight = _InFlight()
+        self.metrics.shard().connections_opened += 1
+        try:
+            with conn:
+                try:
+                    self._serve_connection(conn, write_lock, inflight)
+                finally:
+                    # Koniec odczytu (np. shutdown(SHUT_WR) klienta) - odpowiedzi z puli i planisty wychodzą przed zamknięciem
+                    inflight.wait(CONNECTION_DRAIN_TIMEOUT)
+        finally:
+            self.publisher.unsubscribe(conn)
+            self.metrics.shard().connections_closed += 1
+            self.metrics.release()  # wątek połączenia kończy się - jego część nie zostaje na liście
+
+    def _serve_connection(self, conn, write_lock, inflight):
+        with conn.makefile('rb') as rfile:
+            while True:
+                try:
+                    msg, framed = read_message(rfile, self.max_message_size)
+                except MessageTooLarge as e:
+                    # Bajty wiadomości zostały pominięte - połączenie działa dalej
+                    self._send(conn, write_lock, encode_message(build_response(e.msg, {'status': 'error', 'reason': str(e)}), e.framed))
+                    continue
+                except ValueError as e:
+                    # Uszkodzony nagłówek - strumień jest nie do odzyskania, zamykamy połączenie
+                    self._send(conn, write_lock, encode_message({'status': 'error', 'reason': str(e)}))
+                    return
+                except (EOFError, OSError):
+                    return
+                if msg is None:
+                    return
+                msg['_read_ns'] = self.metrics.started()
+                inflight.add()
+                if 'id' in msg and self.request_pool is not None:
+                    self.request_pool.submit(self._respond, conn, write_lock, msg, framed, inflight)
+                else:
+                    self._respond(conn, write_lock, msg, framed, inflight)
+
+    def _respond(self, conn, write_lock, msg, framed, inflight=None):
+        """Obsługuje żądanie i wysyła dokładnie jedną odpowiedź - także gdy obsługa zgłosi wyjątek."""
+        replied = threading.Event()
+
+        def reply(res):
+            if not replied.is_set():
+                replied.set()
+                try:
+                    self._send(conn, write_lock, encode_message(self._response(msg, res), framed))
+                finally:
+                    if inflight is not None:
+                        inflight.done()
+
+        kind = msg.get('type')
+        try:
+            if kind not in REQUEST_TYPES:
+                res = unknown_type_error(kind)
+            elif kind == 'control' and msg.get('cmd') in ('subscribe', 'unsubscribe'):
+                res = self.handle_subscription(
+                    msg, conn, lambda ev: self._send(conn, write_lock, encode_message(ev, framed)))
+            elif kind == 'control':
                 res = self.handle_control(msg)
+            elif 'id' in msg and self.scheduler is not None:
+                # Odpowiedź może przyjść później (DELAY_PACKET) - wątek wraca od razu do puli
+                self.handle_message_deferred(msg, reply)
+                return
             else:
                 res = self.handle_message(msg)
+        except Exception as e:
+            res = request_error(e)
+        reply(res)
+
+    def _send(self, conn, write_lock, buffers):
+        try:
+            with write_lock:
+                for buf in buffers:
+                    conn.sendall(buf)
+        except OSError:
+            pass  # klient rozłączył się przed odpowiedzią
+
+    def status_snapshot(self):
+        """Stan wysyłany subskrybentom: bez bajtów ostatniej ramki (te daje get_status)."""
+        with self.lock:
+            last = self.node.last_message
+            return {
+                'node': self.node.node_id,
+                'version': self.status_version,
+                'errors': dict(self.node.errors),
+                'last_message': {k: v for k, v in last.items() if k != 'frame'} if last else last,
+                'stats': self.node.stats.to_dict()
+            }
 
-            conn.sendall((json.dumps(res) + '\n').encode())
+    def handle_subscription(self, msg, key, push):
+        """
+        'subscribe': od teraz zmiany stanu są wysyłane tym połączeniem jako zdarzenia
+        (bez 'id'); odpowiedź zawiera bieżący stan. 'unsubscribe' to wyłącza.
+        """
+        if msg['cmd'] == 'unsubscribe':
+            self.publisher.unsubscribe(key)
+            return {'status': 'ok'}
+        self.publisher.subscribe(key, push)
+        return {'status': 'ok', **self.status_snapshot()}
 
     def handle_control(self, msg):
         cmd = msg['cmd']
 
         if cmd == 'set_errors':
+            errors_to_enable = msg.get('errors')
+            if not isinstance(errors_to_enable, list):
+                return {'status': 'error', 'reason': f"set_errors wymaga listy 'errors' (z {', '.join(ERROR_TYPES)})"}
             with self.lock:
-                errors_to_enable = msg['errors']
                 for e in ERROR_TYPES:
                     self.node.set_error(e, e in errors_to_enable)
+                self.status_version += 1
+            self.publisher.publish()
             return {'status': 'ok', 'errors': self.node.errors}
 
         if cmd == 'repair':
             with self.lock:
                 self.node.disable_all_errors()
+                self.status_version += 1
+            self.publisher.publish()
             return {'status': 'ok', 'errors': self.node.errors}
 
         if cmd == 'get_status':
             return {
                 'status': 'ok',
+                'version': self.status_version,
                 'errors': self.node.errors,
-                'last_message': self.node.last_message
+                'last_message': self.node.last_message,
+                'stats': self.node.stats.to_dict()
             }
 
-    def handle_message(self, msg):
+        if cmd == 'get_metrics':
+            return {'status': 'ok', 'metrics': self.metrics.snapshot()}
+
+        if cmd == 'profile':
+            # Blokuje wywołujący wątek na czas profilowania; profil obejmuje cały proces
+            from profiler import profile, DEFAULT_PROFILE_SECONDS, DEFAULT_INTERVAL_MS, TOP_FUNCTIONS
+            try:
+                return {'status': 'ok', 'node': self.node.node_id, 'pid': os.getpid(),
+                        'profile': profile(msg.get('seconds', DEFAULT_PROFILE_SECONDS),
+                                           msg.get('interval_ms', DEFAULT_INTERVAL_MS), msg.get('top', TOP_FUNCTIONS),
+                                           msg.get('skip_idle', False))}
+            except (RuntimeError, ValueError, TypeError) as e:
+                return {'status': 'error', 'reason': str(e)}
+
+        if cmd == 'get_history':
+            try:
+                offset = max(int(msg.get('offset', 0)), 0)
+                limit = min(max(int(msg.get('limit', 50)), 0), MAX_HISTORY_PAGE)
+            except (TypeError, ValueError):
+                return {'status': 'error', 'reason': "'offset' i 'limit' muszą być liczbami całkowitymi"}
+            with_frames = bool(msg.get('with_frames'))
+            records, total = self.node.get_history(
+                offset, limit, status=msg.get('status'),
+                sender=msg.get('sender'), crc_valid=msg.get('crc_valid'),
+                with_frames=with_frames, lock=self.lock)
+            with self.lock:
+                stats = self.node.stats.to_dict()
+            if with_frames:
+                packets = [{**r._asdict(), 'frame': base64.b64encode(data).decode('ascii') if data is not None else None}
+                           for r, data in records]
+            else:
+                packets = [r._asdict() for r in records]
+            return {
+                'status': 'ok',
+                'total': total,
+                'offset': offset,
+                'packets': packets,
+                'stats': stats
+            }
+
+    def _prepare_packet(self, msg):
+        """Dekoduje ramkę i tworzy pakiet; zwraca (pakiet, None) albo (None, odpowiedź z błędem)."""
         sender = msg.get('from')
-        frame_bits = msg.get('frame_bits')
-        poly = msg.get('crc_poly')
+        if sender is not None and (not isinstance(sender, int) or isinstance(sender, bool)
+                                   or not 0 <= sender <= MAX_NODE_ID):
+            return None, {'status': 'error', 'reason': f"Niepoprawny nadawca 'from': {sender!r} (oczekiwano numeru węzła)"}
+        poly = msg.get('crc_poly')  # wielomian '0'/'1' albo nazwa z katalogu, np. "CRC-32"
         message_text = msg.get('message', '')
+        if message_text is not None and not isinstance(message_text, str):
+            return None, {'status': 'error', 'reason': f"Pole 'message' musi być tekstem, nie {type(message_text).__name__}"}
+        route = msg.get('route')
+        if route is not None and (not isinstance(route, list) or len(route) > MAX_ROUTE_HOPS
+                                  or not all(self._valid_hop(hop) for hop in route)):
+            return None, {'status': 'error', 'reason': f"Niepoprawna trasa (lista najwyżej {MAX_ROUTE_HOPS} węzłów)"}
+        try:
+            frame = decode_frame(msg)
+        except Exception as e:
+            return None, {'status': 'error', 'reason': str(e)}
+
+        # Stwórz pakiet (CRC mogło zostać sprawdzone już w trakcie odbioru ciała)
+        packet = Packet(sender, self.node.node_id, message_text, frame, poly)
+        packet.crc_valid = msg.pop('_crc_ok', None)
+        shard = self.metrics.shard()
+        shard.packets_in += 1
+        shard.bytes_in += len(frame.data)
+        return packet, None
 
-        # Stwórz pakiet
-        packet = Packet(sender, self.node.node_id, message_text, frame_bits, poly)
+    def _valid_hop(self, hop) -> bool:
+        """Numer węzła trasy: int (nie bool), nieujemny, z portem w zakresie TCP."""
+        return isinstance(hop, int) and not isinstance(hop, bool) and 0 <= hop and self.base_port + hop <= MAX_PORT
 
-        delay_time = None
+    def _start_trace(self, msg):
+        """Ślad węzła dla wiadomości z polem 'trace' (msg['_trace']); None dla pozostałych."""
+        received = msg.pop('_received', None)
+        if received is None:
+            return None
+        trace = msg['_trace'] = Trace(str(msg['trace']), self.node.node_id)
+        trace.add('node.receive', *received)
+        trace.add('node.queue', received[1])
+        return trace
+
+    def _admit(self, packet, trace=None):
+        """_drop_or_delay pod blokadą węzła; czas czekania na blokadę trafia do metryk i śladu."""
+        waiting = metrics_now()
         with self.lock:
-            # DROP_PACKET
-            if self.node.errors['DROP_PACKET']:
-                packet.status = 'dropped'
-                self.node.add_packet(packet)
-                return {'status': 'dropped', 'node': self.node.node_id}
-            
-            # DELAY_PACKET
-            if self.node.errors['DELAY_PACKET']:
-                delay_time = random.uniform(0.5, 1.5)
-                packet.delay = delay_time
-                time.sleep(delay_time)
+            self.metrics.lock_wait(waiting)
+            if trace is not None:
+                trace.add('node.lock_wait', waiting)
+            return self._drop_or_delay(packet)
 
-        # Sprawdź CRC
+    def _drop_or_delay(self, packet):
+        """Wywoływane pod blokadą: odpowiedź 'dropped' albo None (ustawia packet.delay przy DELAY_PACKET)."""
+        # DROP_PACKET
+        if self.node.errors['DROP_PACKET']:
+            packet.status = 'dropped'
+            self.node.add_packet(packet)  # wywołujący trzyma już self.lock
+            self.status_version += 1
+            self.metrics.shard().dropped += 1
+            return {'status': 'dropped', 'node': self.node.node_id}
+
+        # DELAY_PACKET
+        if self.node.errors['DELAY_PACKET']:
+            packet.delay = random.uniform(0.5, 1.5)
+        return None
+
+    def _complete_packet(self, packet, crc_ok):
+        packet.status = 'received'
+        packet.crc_valid = crc_ok
+        frame = packet.frame
+        shard = self.metrics.shard()
+        if crc_ok:
+            shard.crc_ok += 1
+        else:
+            shard.crc_failed += 1
+        waiting = metrics_now()
+        with self.lock:
+            self.metrics.lock_wait(waiting)
+            self.node.add_packet(packet)
+            self.node.last_message = {'from': packet.sender_id, 'crc_ok': crc_ok, 'message': packet.message, 'frame_len': len(frame), 'frame': frame.to_base64()}
+            self.status_version += 1
+        self.publisher.mark_dirty()
+
+        response = {'status': 'received', 'node': self.node.node_id, 'from': packet.sender_id, 'crc_ok': crc_ok, 'frame_len': len(frame)}
+        if packet.delay:
+            response['delay'] = round(packet.delay, 2)
+        return response
+
+    def _deliver(self, packet, route=None, trace=None):
+        """
+        Sprawdza CRC (o ile nie zrobiono tego przy odbiorze) i zapisuje pakiet.
+
+        Z niepustą trasą ramka idzie dalej (_forward) i wynikiem jest Future
+        z odpowiedzią końca trasy.
+        """
         try:
-            crc_ok = check_frame(frame_bits, poly)
+            crc_ok = packet.crc_valid
+            if crc_ok is None:
+                with span(trace, 'node.check_crc'):
+                    crc_ok = check_frame(packet.frame, packet.crc_poly)
         except Exception as e:
             return {'status': 'error', 'reason': str(e)}
 
-        packet.status = 'received'
+        if route:
+            return self._forward(packet, crc_ok, route, trace)
+        return self._complete_packet(packet, crc_ok)
+
+    def _forward(self, packet, crc_ok, route, trace=None):
+        """
+        Węzeł pośredni: ramka z błędnym CRC jest odrzucana ('discarded'), poprawna
+        idzie do route[0] z resztą trasy. Przy BIT_FLIP węzeł psuje bit wysyłanej
+        kopii. Zwraca Future z odpowiedzią, do której 'hops' dopisano ten węzeł.
+        """
+        frame = packet.frame
         packet.crc_valid = crc_ok
-        self.node.add_packet(packet)
-        self.node.last_message = {'from': sender, 'crc_ok': crc_ok, 'message': message_text, 'frame_len': len(frame_bits), 'frame_bits': frame_bits}
+        packet.status = 'forwarded' if crc_ok else 'discarded'
+        shard = self.metrics.shard()
+        if crc_ok:
+            shard.forwarded += 1
+        else:
+            shard.discarded += 1
+        waiting = metrics_now()
+        with self.lock:
+            self.metrics.lock_wait(waiting)
+            self.node.add_packet(packet)
+            self.status_version += 1
+            bit_flip = self.node.errors['BIT_FLIP']
+        self.publisher.mark_dirty()
 
-        response = {'status': 'received', 'node': self.node.node_id, 'from': sender, 'crc_ok': crc_ok, 'frame_len': len(frame_bits)}
-        if delay_time:
-            response['delay'] = round(delay_time, 2)
-        return response
+        hop = {'node': self.node.node_id, 'status': packet.status, 'crc_ok': crc_ok}
+        result = Future()
+        if not crc_ok:
+            result.set_result({'status': 'discarded', 'node': self.node.node_id, 'from': packet.sender_id,
+                               'crc_ok': False, 'frame_len': len(frame), 'hops': [hop]})
+            return result
+
+        if bit_flip and len(frame):
+            frame = frame.copy()
+            hop['bit_flip'] = random.randrange(len(frame))
+            frame.flip_bit(hop['bit_flip'])
+        payload = {'type': 'message', 'from': packet.sender_id, 'message': packet.message,
+                   'frame': frame, 'crc_poly': packet.crc_poly, 'route': route[1:]}
+        if packet.delay:
+            hop['delay'] = round(packet.delay, 2)
+        if trace is not None:
+            payload['trace'] = trace.trace_id
+        forwarded_at = trace_now() if trace is not None else 0
+
+        def done(downstream):
+            try:
+                res = downstream.result()
+            except Exception as e:
+                res = {'status': 'error', 'node': self.node.node_id, 'reason': f"węzeł {route[0]} nieosiągalny: {e}"}
+            if trace is not None:
+                trace.add('node.forward', forwarded_at)
+            _settle(result, {**res, 'hops': [hop] + res.get('hops', [])})
+
+        try:
+            self.forward_pool().submit(route[0], payload).add_done_callback(done)
+        except Exception as e:
+            done(_failed_future(e))
+        return result
+
+    def forward_pool(self):
+        if self._forward_pool is None:
+            from node_client import ConnectionPool  # node_client importuje ten moduł
+            self._forward_pool = ConnectionPool(self.base_port)
+        return self._forward_pool
+
+    def _with_hop(self, msg, res):
+        """Odpowiedź węzła, na którym trasa się kończy: dopisuje go do 'hops' (tylko dla wiadomości z trasą)."""
+        if 'route' in msg and 'hops' not in res:
+            hop = {'node': self.node.node_id, 'status': res.get('status')}
+            if 'crc_ok' in res:
+                hop['crc_ok'] = res['crc_ok']
+            res = {**res, 'hops': [hop]}
+        return res
+
+    def handle_message(self, msg):
+        trace = self._start_trace(msg)
+        with span(trace, 'node.decode'):
+            packet, error = self._prepare_packet(msg)
+        if error:
+            return error
+
+        dropped = self._admit(packet, trace)
+        if dropped:
+            self.publisher.mark_dirty()
+            return self._with_hop(msg, dropped)
+        if packet.delay:
+            # Śpi tylko wątek tego żądania - blokada węzła jest już zwolniona
+            self.metrics.delay_started()
+            try:
+                with span(trace, 'node.delay'):
+                    time.sleep(packet.delay)
+            finally:
+                self.metrics.delay_finished()
+
+        res = self._deliver(packet, msg.get('route'), trace)
+        if isinstance(res, Future):
+            try:
+                return res.result(FORWARD_TIMEOUT)
+            except TimeoutError:
+                return forward_timeout_error()
+        return self._with_hop(msg, res)
+
+    def handle_message_deferred(self, msg, reply):
+        """
+        Jak handle_message, ale wynik trafia do `reply(res)`; opóźniony pakiet jest
+        dostarczany przez planistę, bez trzymania blokady i bez usypiania wątku.
+        """
+        trace = self._start_trace(msg)
+        with span(trace, 'node.decode'):
+            packet, error = self._prepare_packet(msg)
+        if error:
+            reply(error)
+            return
+
+        dropped = self._admit(packet, trace)
+        if dropped:
+            self.publisher.mark_dirty()
+            reply(self._with_hop(msg, dropped))
+        elif packet.delay:
+            self.metrics.delay_started()  # delay_finished w _deliver_and_reply
+            self.scheduler.call_later(packet.delay, self.request_pool.submit,
+                                      self._deliver_and_reply, msg, packet, reply, trace_now())
+        else:
+            self._deliver_and_reply(msg, packet, reply)
+
+    def _deliver_and_reply(self, msg, packet, reply, delayed_at=None):
+        trace = msg.get('_trace')
+        if delayed_at is not None:
+            self.metrics.delay_finished()
+            if trace is not None:
+                trace.add('node.delay', delayed_at)
+        try:
+            res = self._deliver(packet, msg.get('route'), trace)
+        except Exception as e:
+            # Wołane także z planisty (DELAY_PACKET) - wyjątek nie może zostać w Future puli
+            reply(request_error(e))
+            return
+        if isinstance(res, Future):
+            # Odpowiedź przyjdzie z dalszej części trasy - wątek nie czeka, a planista pilnuje limitu
+            self.scheduler.call_later(FORWARD_TIMEOUT, _settle, res, forward_timeout_error())
+            res.add_done_callback(lambda f: reply(f.result()))
+        else:
+            reply(self._with_hop(msg, res))
+
+    async def handle_message_async(self, msg):
+        """Jak handle_message, ale opóźnienie nie blokuje pętli, a duże ramki idą do puli wątków."""
+        trace = self._start_trace(msg)
+        with span(trace, 'node.decode'):
+            packet, error = self._prepare_packet(msg)
+        if error:
+            return error
+
+        dropped = self._admit(packet, trace)
+        if dropped:
+            self.publisher.mark_dirty()
+            return self._with_hop(msg, dropped)
+        if packet.delay:
+            self.metrics.delay_started()
+            try:
+                with span(trace, 'node.delay'):
+                    await asyncio.sleep(packet.delay)
+            finally:
+                self.metrics.delay_finished()
+
+        # Sprawdź CRC
+        try:
+            with span(trace, 'node.check_crc'):
+                if packet.crc_valid is not None:
+                    crc_ok = packet.crc_valid
+                elif len(packet.frame) > EXECUTOR_CRC_BITS:
+                    loop = asyncio.get_running_loop()
+                    crc_ok = await loop.run_in_executor(self.executor, check_frame, packet.frame, packet.crc_poly)
+                else:
+                    crc_ok = check_frame(packet.frame, packet.crc_poly)
+        except Exception as e:
+            return {'status': 'error', 'reason': str(e)}
+
+        route = msg.get('route')
+        if route:
+            # Wysyłka w puli wątków: następny węzeł może działać na tej samej pętli
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(self.executor, self._forward, packet, crc_ok, route, trace)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(res), FORWARD_TIMEOUT)
+            except asyncio.TimeoutError:
+                return forward_timeout_error()
+        return self._with_hop(msg, self._complete_packet(packet, crc_ok))
+
+
+def _settle(fut: Future, res):
+    """Ustawia wynik Future, o ile nie zrobił tego wcześniej ktoś inny (odpowiedź albo limit czasu)."""
+    try:
+        fut.set_result(res)
+    except InvalidStateError:
+        pass
+
+
+def _failed_future(error):
+    fut = Future()
+    fut.set_exception(error)
+    return fut
 
 
-def run_node(node_id: int, base_port: int):
-    server = NodeServer(node_id, base_port)
-    server.start()
+def run_node(node_id: int, base_port: int, mode: str = 'thread', max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE,
+             history_capacity: int = DEFAULT_HISTORY_CAPACITY, metrics_port: int = None):
+    server = NodeServer(node_id, base_port, max_message_size, history_capacity, metrics_port)
+    if mode == 'async':
+        server.start_async()
+    else:
+        server.start()
 
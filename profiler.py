@@ -0,0 +1,209 @@
+"""
+Profiler próbkujący dla działającego procesu węzła (komenda sterująca 'profile').
+
+Co `interval_ms` wątek profilera odczytuje stosy wszystkich wątków procesu
+(sys._current_frames) i zlicza je. Wynik:
+- 'collapsed' - stosy w formacie "wątek;moduł:funkcja;... liczba" (flamegraph.pl,
+  speedscope, inferno),
+- 'functions' - czas własny i łączny funkcji (próbki x średni odstęp, na wątek),
+- 'focus' - te same dane dla ścieżki obsługi wiadomości (FOCUS_FUNCTIONS).
+Z `skip_idle` stosy wątków czekających (IDLE_LEAVES) są tylko liczone ('idle_samples').
+
+Proces roboczy nadzorcy obsługuje kilka węzłów - profil obejmuje je wszystkie.
+
+    python profiler.py --node 3 --seconds 10 -o node3.folded
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from node_client import ConnectionPool, profile_node
+from supervisor import NodeRegistry
+
+# Domyślny i najdłuższy czas profilowania (s)
+DEFAULT_PROFILE_SECONDS = 5.0
+MAX_PROFILE_SECONDS = 60.0
+# Odstęp między próbkami (ms) i najmniejszy dopuszczalny
+DEFAULT_INTERVAL_MS = 5.0
+MIN_INTERVAL_MS = 1.0
+# Najgłębszy zapisywany stos (ramki od wierzchołka)
+MAX_STACK_DEPTH = 128
+# Ile funkcji (wg czasu łącznego) trafia do tabeli 'functions'
+TOP_FUNCTIONS = 50
+# Funkcje ścieżki obsługi wiadomości raportowane osobno w 'focus'
+FOCUS_FUNCTIONS = ('handle', 'handle_async', '_serve_connection', '_respond', '_respond_async',
+                   'handle_message', 'handle_message_deferred', 'handle_message_async', '_deliver',
+                   '_complete_packet', '_forward', 'check_frame')
+# Wierzchołki stosów wątków czekających (pusta kolejka puli, blokada, accept, odczyt z gniazda, select)
+IDLE_LEAVES = frozenset({'thread:_worker', 'threading:Condition.wait', 'threading:Event.wait', 'socket:socket.accept',
+                         'socket:SocketIO.readinto', 'selectors:EpollSelector.select', 'selectors:PollSelector.select',
+                         'selectors:SelectSelector.select', 'selectors:KqueueSelector.select'})
+
+_active = threading.Lock()  # jeden profil naraz w procesie
+_THREAD_NUMBER = re.compile(r'[-_]\d+')
+
+
+def _thread_label(name: str) -> str:
+    """'node1-req_7' -> 'node1-req', 'Thread-12 (handle)' -> 'Thread (handle)': wątki jednej puli razem."""
+    return _THREAD_NUMBER.sub('', name).replace(';', ',')
+
+
+class SamplingProfiler:
+    """Zlicza stosy wątków procesu (poza własnym) co `interval_ms`; `run(seconds)` blokuje wywołującego."""
+
+    def __init__(self, interval_ms: float = DEFAULT_INTERVAL_MS, skip_idle: bool = False):
+        self.interval = interval_ms / 1000
+        self.skip_idle = skip_idle
+        self.stacks = Counter()  # (wątek, (kod, ...) od korzenia) -> liczba próbek
+        self.idle_samples = 0
+        self.rounds = 0
+        self.elapsed = 0.0
+        self._labels = {}
+
+    def run(self, seconds: float):
+        me = threading.get_ident()
+        start = time.perf_counter()
+        deadline = start + seconds
+        next_at = start
+        names = {}
+        while True:
+            frames = sys._current_frames()
+            if not frames.keys() <= names.keys():
+                names = {t.ident: t.name for t in threading.enumerate()}  # tylko gdy pojawił się nowy wątek
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                if self.skip_idle and self._label(frame.f_code) in IDLE_LEAVES:
+                    self.idle_samples += 1
+                    continue
+                codes = []
+                while frame is not None and len(codes) < MAX_STACK_DEPTH:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                self.stacks[(names.get(ident, str(ident)), tuple(codes))] += 1
+            self.rounds += 1
+            next_at += self.interval
+            now = time.perf_counter()
+            if next_at >= deadline:
+                break
+            if next_at > now:
+                time.sleep(next_at - now)
+            else:
+                next_at = now  # próbkowanie nie nadąża - bez nadrabiania serią
+        self.elapsed = time.perf_counter() - start
+        return self
+
+    @property
+    def period(self) -> float:
+        """Średni rzeczywisty odstęp próbek (s) - waga jednej próbki."""
+        return self.elapsed / self.rounds if self.rounds else self.interval
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = self._labels[code] = f"{module}:{getattr(code, 'co_qualname', code.co_name)}".replace(';', ',')
+        return label
+
+    def collapsed(self) -> str:
+        folded = Counter()
+        for (thread, codes), count in self.stacks.items():
+            folded[';'.join([_thread_label(thread)] + [self._label(c) for c in codes])] += count
+        return '\n'.join(f"{stack} {count}" for stack, count in folded.most_common())
+
+    def functions(self):
+        """{funkcja: [próbki własne, próbki łączne]}; rekurencja liczona raz na stos."""
+        table = {}
+        for (_, codes), count in self.stacks.items():
+            if not codes:
+                continue
+            for label in {self._label(c) for c in codes}:
+                table.setdefault(label, [0, 0])[1] += count
+            table[self._label(codes[-1])][0] += count
+        return table
+
+    def _row(self, label, own, total):
+        return {'function': label, 'self_s': round(own * self.period, 4), 'total_s': round(total * self.period, 4),
+                'self_samples': own, 'total_samples': total}
+
+    def to_dict(self, top: int = TOP_FUNCTIONS) -> dict:
+        table = self.functions()
+        ranked = sorted(table.items(), key=lambda item: (-item[1][1], -item[1][0]))
+        focus = [(label, v) for label, v in ranked if label.replace(':', '.').rsplit('.', 1)[-1] in FOCUS_FUNCTIONS]
+        return {
+            'seconds': round(self.elapsed, 3),
+            'interval_ms': round(self.period * 1000, 3),
+            'rounds': self.rounds,
+            'samples': sum(self.stacks.values()),
+            'idle_samples': self.idle_samples,
+            'threads': len({thread for thread, _ in self.stacks}),
+            'collapsed': self.collapsed(),
+            'functions': [self._row(label, *v) for label, v in ranked[:top]],
+            'focus': [self._row(label, *v) for label, v in focus],
+        }
+
+
+def profile(seconds: float = DEFAULT_PROFILE_SECONDS, interval_ms: float = DEFAULT_INTERVAL_MS,
+            top: int = TOP_FUNCTIONS, skip_idle: bool = False) -> dict:
+    """Profiluje bieżący proces przez `seconds`; RuntimeError, gdy inny profil już trwa."""
+    seconds = float(seconds)
+    interval_ms = float(interval_ms)
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise ValueError(f"Czas profilowania musi być w (0, {MAX_PROFILE_SECONDS:g}] s")
+    if interval_ms < MIN_INTERVAL_MS:
+        raise ValueError(f"Odstęp próbek musi wynosić co najmniej {MIN_INTERVAL_MS:g} ms")
+    if not _active.acquire(blocking=False):
+        raise RuntimeError("Profilowanie już trwa")
+    try:
+        return SamplingProfiler(interval_ms, bool(skip_idle)).run(seconds).to_dict(int(top))
+    finally:
+        _active.release()
+
+
+def format_functions(rows) -> str:
+    lines = [f"{'łącznie [s]':>12} {'własny [s]':>10}  funkcja"]
+    lines += [f"{r['total_s']:>12.3f} {r['self_s']:>10.3f}  {r['function']}" for r in rows]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profil próbkujący procesu węzła CRC")
+    parser.add_argument('--node', type=int, required=True, help="numer węzła")
+    parser.add_argument('--registry', default=None, help="spis węzłów (JSON z main.py --registry)")
+    parser.add_argument('--base-port', type=int, default=NodeRegistry().base_port, help="port węzła 0")
+    parser.add_argument('--seconds', type=float, default=DEFAULT_PROFILE_SECONDS, help="czas profilowania (s)")
+    parser.add_argument('--interval-ms', type=float, default=DEFAULT_INTERVAL_MS, help="odstęp próbek (ms)")
+    parser.add_argument('--top', type=int, default=TOP_FUNCTIONS, help="liczba funkcji w tabeli")
+    parser.add_argument('--skip-idle', action='store_true', help="pomiń stosy wątków czekających na pracę")
+    parser.add_argument('-o', '--output', default=None, help="zapisz stosy (format collapsed) do pliku")
+    args = parser.parse_args(argv)
+
+    registry = NodeRegistry.load(args.registry) if args.registry else NodeRegistry(base_port=args.base_port)
+    pool = ConnectionPool(registry.base_port, registry.host)
+    try:
+        res = profile_node(args.node, args.seconds, args.interval_ms, args.top, args.skip_idle, pool=pool)
+    finally:
+        pool.close()
+    if res.get('status') != 'ok':
+        print("Błąd:", res.get('reason'), file=sys.stderr)
+        return 1
+    prof = res['profile']
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(prof['collapsed'] + '\n')
+    print(f"{prof['samples']} próbek z {prof['threads']} wątków w {prof['seconds']} s "
+          f"(co {prof['interval_ms']} ms), pominięte czekające: {prof['idle_samples']}")
+    print("Ścieżka obsługi wiadomości:")
+    print(format_functions(prof['focus']))
+    print("Najdroższe funkcje:")
+    print(format_functions(prof['functions']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
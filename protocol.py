@@ -0,0 +1,234 @@
+"""
+Protokół przewodowy węzłów.
+
+Wiadomość: 4 bajty długości nagłówka, 8 bajtów długości ciała (big-endian),
+nagłówek JSON i opcjonalne ciało binarne z bajtami ramki (liczba bitów w
+polu 'frame_len'). Stary format - jeden JSON w linii - jest rozpoznawany po
+pierwszym bajcie '{' i nadal obsługiwany.
+
+Ciało jest czytane kawałkami (READ_CHUNK) wprost do jednego bufora o docelowym
+rozmiarze (bytearray(długość ciała)), bez kopii pośrednich i sklejania
+kawałków. Pełny bufor jest świadomym kompromisem: węzeł i tak potrzebuje całej
+ramki (historia, przekazanie dalej, get_status), a zajętą pamięć na wiadomość
+ogranicza max_size - bufor powstaje dopiero po sprawdzeniu limitu.
+"""
+
+import asyncio
+import json
+import struct
+import time
+from crc import Frame, FrameValidator
+
+_PREFIX = struct.Struct('>IQ')
+DEFAULT_MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+READ_CHUNK = 64 * 1024
+
+
+class MessageTooLarge(ValueError):
+    """
+    Wiadomość przekracza limit węzła. Jej bajty zostały już pominięte, więc
+    połączenie nadaje się do dalszego użytku; `msg` to nagłówek (jeśli dało
+    się go odczytać), żeby odpowiedź z błędem miała właściwe 'id'.
+    """
+
+    def __init__(self, reason: str, msg=None, framed: bool = True):
+        super().__init__(reason)
+        self.msg = msg or {}
+        self.framed = framed
+
+
+def encode_message(msg: dict, framed: bool = True):
+    """
+    Koduje wiadomość; zwraca listę buforów do wysłania po kolei.
+
+    Jeśli msg['frame'] jest obiektem Frame, jego bajty idą jako ciało binarne.
+    """
+    frame = msg.get('frame')
+    if not framed:
+        if isinstance(frame, Frame):
+            msg = {**msg, 'frame': frame.to_base64(), 'frame_len': len(frame)}
+        return [(json.dumps(msg) + '\n').encode()]
+    body = b''
+    if isinstance(frame, Frame):
+        body = memoryview(frame.data)[:(frame.bit_len + 7) // 8]
+        msg = {k: v for k, v in msg.items() if k != 'frame'}
+        msg['frame_len'] = len(frame)
+    header = json.dumps(msg).encode()
+    return [_PREFIX.pack(len(header), len(body)) + header, body]
+
+
+def _too_large(header_len, body_len, max_size) -> bool:
+    return max_size is not None and header_len + body_len > max_size
+
+
+def _too_large_error(header_len, body_len, max_size, msg):
+    return MessageTooLarge(f"Wiadomość ma {header_len + body_len} B, limit to {max_size} B", msg)
+
+
+def _start_body(msg: dict, body_len: int, validate_max_bits=None):
+    """
+    Tworzy pustą ramkę na ciało i (jeśli się da) walidator CRC liczony w trakcie
+    odbioru. Ramki dłuższe niż `validate_max_bits` nie dostają walidatora.
+    """
+    bit_len = msg.get('frame_len', body_len * 8)
+    if not isinstance(bit_len, int) or not 0 <= bit_len <= body_len * 8:
+        raise ValueError(f"frame_len {bit_len} nie pasuje do ciała {body_len} B")
+    frame = Frame()
+    frame.data = bytearray(body_len)
+    frame.bit_len = bit_len
+    if validate_max_bits is not None and bit_len > validate_max_bits:
+        return frame, None
+    try:
+        validator = FrameValidator(msg.get('crc_poly'), bit_len)
+    except (ValueError, TypeError, AttributeError):
+        validator = None  # brak trybu strumieniowego - CRC sprawdzi handle_message
+    return frame, validator
+
+
+def _finish_body(msg: dict, frame: Frame, validator):
+    msg['frame'] = frame
+    if validator is not None:
+        try:
+            msg['_crc_ok'] = validator.is_valid()
+        except ValueError:
+            pass
+    return msg
+
+
+def _stamp(msg: dict, started: int) -> dict:
+    """Śledzona wiadomość (pole 'trace') dostaje czas odbioru: od pierwszego bajtu do końca ciała."""
+    if 'trace' in msg:
+        msg['_received'] = (started, time.monotonic_ns())
+    return msg
+
+
+def _read_exact(rfile, n: int) -> bytes:
+    data = rfile.read(n)
+    if len(data) != n:
+        raise EOFError("Połączenie zamknięte w trakcie wiadomości")
+    return data
+
+
+def _skip(rfile, n: int):
+    while n > 0:
+        chunk = rfile.read(min(n, READ_CHUNK))
+        if not chunk:
+            raise EOFError("Połączenie zamknięte w trakcie wiadomości")
+        n -= len(chunk)
+
+
+def read_message(rfile, max_size=DEFAULT_MAX_MESSAGE_SIZE):
+    """
+    Czyta jedną wiadomość z pliku gniazda (makefile('rb')).
+
+    Zwraca (msg, framed) albo (None, None) na końcu strumienia. Ciało binarne
+    jest czytane kawałkami prosto do bajtów ramki, a CRC liczone po drodze
+    (wynik w msg['_crc_ok']). Wiadomość z polem 'trace' dostaje też
+    msg['_received'] = (początek, koniec) odbioru w time.monotonic_ns().
+    """
+    first = rfile.peek(1)[:1]
+    while first in (b'\n', b'\r', b' '):
+        rfile.read(1)
+        first = rfile.peek(1)[:1]
+    if not first:
+        return None, None
+    started = time.monotonic_ns()
+    if first == b'{':
+        limit = -1 if max_size is None else max_size + 1
+        line = rfile.readline(limit)
+        if max_size is not None and len(line) > max_size:
+            while line and not line.endswith(b'\n'):
+                line = rfile.readline(READ_CHUNK)
+            raise MessageTooLarge(f"Linia JSON dłuższa niż {max_size} B", framed=False)
+        return _stamp(json.loads(line), started), False
+
+    header_len, body_len = _PREFIX.unpack(_read_exact(rfile, _PREFIX.size))
+    if _too_large(header_len, body_len, max_size):
+        msg = None
+        if header_len <= max_size:
+            msg = json.loads(_read_exact(rfile, header_len))
+        else:
+            _skip(rfile, header_len)
+        _skip(rfile, body_len)
+        raise _too_large_error(header_len, body_len, max_size, msg)
+    msg = json.loads(_read_exact(rfile, header_len))
+    if not body_len:
+        return _stamp(msg, started), True
+    frame, validator = _start_body(msg, body_len)
+    view = memoryview(frame.data)
+    pos = 0
+    while pos < body_len:
+        n = rfile.readinto(view[pos:pos + READ_CHUNK])
+        if not n:
+            raise EOFError("Połączenie zamknięte w trakcie ciała wiadomości")
+        if validator is not None:
+            validator.update(view[pos:pos + n])
+        pos += n
+    return _stamp(_finish_body(msg, frame, validator), started), True
+
+
+async def _skip_line_async(reader):
+    """Pomija bajty do najbliższego '\\n' włącznie, kawałkami nie większymi niż bufor czytnika."""
+    while True:
+        try:
+            await reader.readuntil(b'\n')
+            return
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError as e:
+            raise EOFError("Połączenie zamknięte w trakcie wiadomości") from e
+
+
+async def read_message_async(reader, max_size=DEFAULT_MAX_MESSAGE_SIZE, validate_max_bits=None):
+    """
+    Wersja read_message dla asyncio.StreamReader. CRC w trakcie odbioru liczy
+    się na pętli zdarzeń, więc ramki dłuższe niż `validate_max_bits` przychodzą
+    bez msg['_crc_ok'] - węzeł sprawdza je potem w puli wątków.
+    """
+    first = await reader.read(1)
+    while first in (b'\n', b'\r', b' '):
+        first = await reader.read(1)
+    if not first:
+        return None, None
+    started = time.monotonic_ns()
+    if first == b'{':
+        try:
+            line = first + await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as e:
+            line = first + e.partial  # ostatnia linia bez '\n'
+        except asyncio.LimitOverrunError:
+            # Linia dłuższa niż bufor czytnika (limit) - pomijamy ją, połączenie działa dalej
+            await _skip_line_async(reader)
+            line = None
+        if line is None or (max_size is not None and len(line) > max_size):
+            raise MessageTooLarge(f"Linia JSON dłuższa niż {max_size} B", framed=False)
+        return _stamp(json.loads(line), started), False
+
+    prefix = first + await reader.readexactly(_PREFIX.size - 1)
+    header_len, body_len = _PREFIX.unpack(prefix)
+    if _too_large(header_len, body_len, max_size):
+        msg = None
+        remaining = header_len + body_len
+        if header_len <= max_size:
+            msg = json.loads(await reader.readexactly(header_len))
+            remaining = body_len
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, READ_CHUNK))
+            if not chunk:
+                raise EOFError("Połączenie zamknięte w trakcie wiadomości")
+            remaining -= len(chunk)
+        raise _too_large_error(header_len, body_len, max_size, msg)
+    msg = json.loads(await reader.readexactly(header_len))
+    if not body_len:
+        return _stamp(msg, started), True
+    frame, validator = _start_body(msg, body_len, validate_max_bits)
+    pos = 0
+    while pos < body_len:
+        chunk = await reader.read(min(READ_CHUNK, body_len - pos))
+        if not chunk:
+            raise EOFError("Połączenie zamknięte w trakcie ciała wiadomości")
+        frame.data[pos:pos + len(chunk)] = chunk
+        if validator is not None:
+            validator.update(chunk)
+        pos += len(chunk)
+    return _stamp(_finish_body(msg, frame, validator), started), True
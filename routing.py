@@ -0,0 +1,96 @@
+"""Trasowanie po aktywnych łączach grafu: najkrótsze ścieżki (liczba skoków)."""
+
+from collections import deque
+
+UNREACHABLE = -1
+
+
+class RoutingTable:
+    """
+    Tablica tras dla grafu nieskierowanego bez wag.
+
+    Dla każdego celu trzymane jest drzewo BFS liczone od celu: next_hop[v] to
+    sąsiad v bliżej celu, dist[v] - liczba skoków. Drzewo powstaje przy pierwszym
+    zapytaniu o dany cel, potem trasa to tylko odczyty z list. Zmiana łącza
+    unieważnia wyłącznie drzewa, na które wpływa:
+    - usunięcie (a, b): drzewa, w których a->b albo b->a jest krawędzią drzewa,
+    - dodanie (a, b): drzewa, w których dist[a] i dist[b] różnią się o więcej
+      niż 1 (albo tylko jeden z węzłów jest osiągalny) - nowe łącze coś skraca.
+    """
+
+    def __init__(self, n: int, edges=()):
+        self.n = n
+        self.adj = [set() for _ in range(n)]
+        for a, b in edges:
+            self.adj[a].add(b)
+            self.adj[b].add(a)
+        self._trees = {}  # cel -> (next_hop, dist)
+        self.recomputed = 0  # ile drzew policzono (do pomiarów)
+
+    def has_edge(self, a: int, b: int) -> bool:
+        return b in self.adj[a]
+
+    def set_edge(self, a: int, b: int, active: bool):
+        """Włącza/wyłącza łącze i unieważnia drzewa, które przestały być aktualne."""
+        if a == b or active == (b in self.adj[a]):
+            return
+        if active:
+            self.adj[a].add(b)
+            self.adj[b].add(a)
+            stale = [dst for dst, (_, dist) in self._trees.items() if _shortens(dist[a], dist[b])]
+        else:
+            self.adj[a].discard(b)
+            self.adj[b].discard(a)
+            stale = [dst for dst, (next_hop, _) in self._trees.items()
+                     if next_hop[a] == b or next_hop[b] == a]
+        for dst in stale:
+            del self._trees[dst]
+
+    def _tree(self, dst: int):
+        tree = self._trees.get(dst)
+        if tree is None:
+            tree = self._trees[dst] = self._bfs(dst)
+            self.recomputed += 1
+        return tree
+
+    def _bfs(self, dst: int):
+        next_hop = [UNREACHABLE] * self.n
+        dist = [UNREACHABLE] * self.n
+        next_hop[dst] = dst
+        dist[dst] = 0
+        queue = deque([dst])
+        adj = self.adj
+        while queue:
+            v = queue.popleft()
+            d = dist[v] + 1
+            for u in adj[v]:
+                if dist[u] == UNREACHABLE:
+                    dist[u] = d
+                    next_hop[u] = v
+                    queue.append(u)
+        return next_hop, dist
+
+    def next_hop(self, src: int, dst: int):
+        """Następny węzeł na trasie src -> dst albo None, gdy dst jest nieosiągalny."""
+        hop = self._tree(dst)[0][src]
+        return None if hop == UNREACHABLE else hop
+
+    def distance(self, src: int, dst: int):
+        d = self._tree(dst)[1][src]
+        return None if d == UNREACHABLE else d
+
+    def path(self, src: int, dst: int):
+        """Pełna trasa [src, ..., dst] albo None."""
+        next_hop, dist = self._tree(dst)
+        if dist[src] == UNREACHABLE:
+            return None
+        path = [src]
+        while path[-1] != dst:
+            path.append(next_hop[path[-1]])
+        return path
+
+
+def _shortens(da: int, db: int) -> bool:
+    if da == UNREACHABLE or db == UNREACHABLE:
+        return da != db
+    return abs(da - db) > 1
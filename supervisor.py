@@ -0,0 +1,285 @@
+"""
+Nadzorca klastra węzłów.
+
+Zamiast jednego procesu na węzeł kilka NodeServerów działa w jednym procesie
+roboczym (procesów tyle, ile rdzeni). Nadzorca pilnuje procesów roboczych i
+uruchamia ponownie te, które padły; NodeRegistry mówi GUI i narzędziom, jakie
+węzły istnieją i pod jakimi adresami.
+
+Procesy są tworzone przez forkserver (tam, gdzie jest dostępny) z wstępnie
+zaimportowanymi modułami węzła, a każdy proces zgłasza przez potok, że jego
+węzły już nasłuchują - wait_ready() czeka na to zamiast zgadywać.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from network_models import DEFAULT_HISTORY_CAPACITY
+from node_process import NodeServer, BASE_PORT, SERVER_MODES
+from protocol import DEFAULT_MAX_MESSAGE_SIZE
+
+# Co ile sekund nadzorca sprawdza procesy robocze
+CHECK_INTERVAL = 0.5
+# Opóźnienia kolejnych restartów tego samego procesu (s); po dłuższej pracy licznik się zeruje
+RESTART_BACKOFF = (0.5, 1.0, 2.0, 5.0)
+STABLE_RUN_TIME = 30.0
+# Metody startu procesów w kolejności preferencji (spawn jest zawsze dostępny)
+START_METHODS = ('forkserver', 'spawn')
+# Moduły ładowane raz w forkserverze - procesy robocze dostają je od razu
+PRELOAD_MODULES = ['supervisor']
+
+
+class NodeRegistry:
+    """Spis węzłów klastra: identyfikatory i adresy (port = base_port + id)."""
+
+    def __init__(self, node_ids=range(10), base_port: int = BASE_PORT, host: str = '127.0.0.1'):
+        self.node_ids = list(node_ids)
+        self.base_port = base_port
+        self.host = host
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __iter__(self):
+        return iter(self.node_ids)
+
+    def port(self, node_id: int) -> int:
+        return self.base_port + node_id
+
+    def to_dict(self):
+        return {'node_ids': self.node_ids, 'base_port': self.base_port, 'host': self.host}
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(d['node_ids'], d.get('base_port', BASE_PORT), d.get('host', '127.0.0.1'))
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+class _ReadySignal:
+    """Liczy nasłuchujące węzły procesu; gdy są wszystkie, wysyła 'ready' przez potok."""
+
+    def __init__(self, conn, count: int):
+        self.conn = conn
+        self.remaining = count
+        self._lock = threading.Lock()
+
+    def __call__(self, server):
+        with self._lock:
+            self.remaining -= 1
+            if self.remaining or self.conn is None:
+                return
+            conn, self.conn = self.conn, None
+        conn.send(('ready', os.getpid()))
+        conn.close()
+
+
+def run_worker(node_ids, base_port: int, mode: str = 'thread', max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE,
+               history_capacity: int = DEFAULT_HISTORY_CAPACITY, ready_conn=None, metrics_base_port: int = None):
+    """
+    Proces roboczy: kilka węzłów naraz. Awaria któregokolwiek węzła kończy cały
+    proces kodem 1 - nadzorca uruchamia grupę od nowa. Gdy wszystkie węzły
+    nasłuchują, przez `ready_conn` idzie ('ready', pid). Z `metrics_base_port`
+    węzeł i wystawia metryki HTTP na porcie metrics_base_port+i.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C obsługuje nadzorca (stop)
+    servers = [NodeServer(i, base_port, max_message_size, history_capacity,
+                          None if metrics_base_port is None else metrics_base_port + i) for i in node_ids]
+    ready = _ReadySignal(ready_conn, len(servers))
+    if mode == 'async':
+        asyncio.run(_serve_all_async(servers, ready))  # wyjątek z gather kończy proces
+    else:
+        _serve_all_threads(servers, ready)
+
+
+async def _serve_all_async(servers, ready):
+    await asyncio.gather(*(server.serve_async(ready) for server in servers))
+
+
+def _serve_all_threads(servers, ready):
+    failed = threading.Event()
+
+    def serve(server):
+        try:
+            server.start(ready)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            failed.set()
+
+    for server in servers:
+        threading.Thread(target=serve, args=(server,), daemon=True,
+                         name=f'node{server.node.node_id}-accept').start()
+    failed.wait()
+    sys.exit(1)
+
+
+class NodeSupervisor:
+    """
+    Uruchamia `num_nodes` węzłów w `workers` procesach (domyślnie liczba rdzeni)
+    i restartuje procesy, które się zakończyły. Węzły są przydzielane do procesów
+    na przemian (węzeł i -> proces i % workers).
+
+    `start_method` to metoda multiprocessing; domyślnie pierwsza dostępna z START_METHODS.
+    `metrics_base_port`: węzeł i wystawia metryki HTTP na porcie metrics_base_port+i.
+    """
+
+    def __init__(self, num_nodes: int = 10, base_port: int = BASE_PORT, mode: str = 'thread', workers: int = None,
+                 max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE, history_capacity: int = DEFAULT_HISTORY_CAPACITY,
+                 host: str = '127.0.0.1', start_method: str = None, metrics_base_port: int = None):
+        if mode not in SERVER_MODES:
+            raise ValueError(f"Nieznany tryb serwera: {mode}")
+        if num_nodes < 1:
+            raise ValueError("Klaster musi mieć co najmniej jeden węzeł")
+        self.registry = NodeRegistry(range(num_nodes), base_port, host)
+        self.mode = mode
+        self.max_message_size = max_message_size
+        self.history_capacity = history_capacity
+        self.metrics_base_port = metrics_base_port
+        workers = max(1, min(workers or os.cpu_count() or 1, num_nodes))
+        self.groups = [list(range(w, num_nodes, workers)) for w in range(workers)]
+        self.procs = [None] * workers
+        self.restarts = [0] * workers
+        self._started_at = [0.0] * workers
+        self._next_restart = [None] * workers
+        self._ready_conns = [None] * workers
+        self.ready = [False] * workers
+        self.start_time = None
+        self.startup_time = None  # sekundy od start() do gotowości wszystkich węzłów
+        if start_method is None:
+            available = multiprocessing.get_all_start_methods()
+            start_method = next(m for m in START_METHODS if m in available)
+        self.ctx = multiprocessing.get_context(start_method)
+        if start_method == 'forkserver':
+            self.ctx.set_forkserver_preload(PRELOAD_MODULES)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._monitor_thread = None
+
+    def start(self):
+        self.start_time = time.monotonic()
+        for idx in range(len(self.groups)):
+            self._spawn(idx)
+        self._monitor_thread = threading.Thread(target=self._monitor, daemon=True, name='node-supervisor')
+        self._monitor_thread.start()
+        return self
+
+    def _spawn(self, idx: int):
+        reader, writer = self.ctx.Pipe(duplex=False)
+        p = self.ctx.Process(
+            target=run_worker, daemon=True, name=f'node-worker-{idx}',
+            args=(self.groups[idx], self.registry.base_port, self.mode, self.max_message_size,
+                  self.history_capacity, writer, self.metrics_base_port))
+        p.start()
+        writer.close()  # koniec zapisu zostaje tylko w procesie roboczym - jego śmierć daje EOF
+        self.procs[idx] = p
+        self._ready_conns[idx] = reader
+        self.ready[idx] = False
+        self._started_at[idx] = time.monotonic()
+        self._next_restart[idx] = None
+
+    def _collect_ready(self, conns):
+        """Wywoływane pod blokadą: odbiera zgłoszenia gotowości (albo EOF po śmierci procesu)."""
+        for idx, conn in enumerate(self._ready_conns):
+            if conn is None or conn not in conns:
+                continue
+            try:
+                conn.recv()
+                self.ready[idx] = True
+            except (EOFError, OSError):
+                pass  # proces padł przed gotowością - check() go zrestartuje
+            conn.close()
+            self._ready_conns[idx] = None
+        if self.startup_time is None and all(self.ready):
+            self.startup_time = time.monotonic() - self.start_time
+
+    def wait_ready(self, timeout: float = 30.0) -> float:
+        """
+        Czeka, aż wszystkie procesy zgłoszą nasłuchujące węzły (procesy, które
+        w międzyczasie padły, są restartowane). Zwraca czas startu klastra w sekundach.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            self.check()
+            with self._lock:
+                pending = [c for c in self._ready_conns if c is not None]
+                if pending:
+                    wait_for = min(max(deadline - time.monotonic(), 0), CHECK_INTERVAL)
+                    self._collect_ready(multiprocessing.connection.wait(pending, wait_for))
+                if all(self.ready):
+                    return self.startup_time
+            if time.monotonic() >= deadline:
+                missing = [i for i, r in enumerate(self.ready) if not r]
+                raise TimeoutError(f"Procesy {missing} nie zgłosiły gotowości w {timeout}s")
+            if not pending:
+                time.sleep(0.01)  # czekamy na restart procesu
+
+    def _monitor(self):
+        while not self._stopping.wait(CHECK_INTERVAL):
+            self.check()
+
+    def check(self):
+        """Restartuje zakończone procesy robocze (z rosnącym odstępem przy kolejnych awariach)."""
+        now = time.monotonic()
+        with self._lock:
+            if self._stopping.is_set():
+                return
+            pending = [c for c in self._ready_conns if c is not None]
+            if pending:
+                self._collect_ready(multiprocessing.connection.wait(pending, 0))
+            for idx, p in enumerate(self.procs):
+                if p is None or p.is_alive():
+                    continue
+                self.ready[idx] = False
+                if self._next_restart[idx] is None:
+                    if now - self._started_at[idx] > STABLE_RUN_TIME:
+                        self.restarts[idx] = 0
+                    delay = RESTART_BACKOFF[min(self.restarts[idx], len(RESTART_BACKOFF) - 1)]
+                    self._next_restart[idx] = now + delay
+                    print(f"[SUPERVISOR] Proces {idx} (węzły {self._describe(idx)}) zakończył się "
+                          f"kodem {p.exitcode} - restart za {delay}s")
+                elif now >= self._next_restart[idx]:
+                    self.restarts[idx] += 1
+                    self._spawn(idx)
+
+    def _describe(self, idx: int) -> str:
+        group = self.groups[idx]
+        return ', '.join(map(str, group)) if len(group) <= 8 else f"{group[0]}, {group[1]}, ... ({len(group)})"
+
+    def worker_of(self, node_id: int) -> int:
+        return node_id % len(self.groups)
+
+    def is_alive(self, node_id: int) -> bool:
+        p = self.procs[self.worker_of(node_id)]
+        return p is not None and p.is_alive()
+
+    def is_ready(self, node_id: int) -> bool:
+        return self.ready[self.worker_of(node_id)] and self.is_alive(node_id)
+
+    def stop(self, timeout: float = 2.0):
+        with self._lock:
+            self._stopping.set()
+            procs = [p for p in self.procs if p is not None]
+            conns = [c for c in self._ready_conns if c is not None]
+            self._ready_conns = [None] * len(self._ready_conns)
+        for conn in conns:
+            conn.close()
+        for p in procs:
+            p.terminate()
+        deadline = time.monotonic() + timeout
+        for p in procs:
+            p.join(max(deadline - time.monotonic(), 0))
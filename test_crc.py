@@ -36,3 +36,71 @@ if frame:
         print("\n❌ BŁĄD! CRC nie wykrył zmiany bitu!")
     else:
         print("\n✅ OK! CRC prawidłowo wykrył błąd!")
+
+
+# Testy silnika tablicowego (pytest)
+import random
+from crc import (compute_crc_remainder, validate_crc, get_engine,
+                 _compute_crc_remainder_bitwise, _validate_crc_bitwise)
+
+
+def test_table_engine_matches_bitwise():
+    rnd = random.Random(0)
+    for width in (1, 3, 8, 16, 32, 64, 70):
+        p = '1' + ''.join(rnd.choice('01') for _ in range(width))
+        for n in (1, 7, 8, 63, 64, 200):
+            bits = ''.join(rnd.choice('01') for _ in range(n))
+            assert compute_crc_remainder(bits, p) == _compute_crc_remainder_bitwise(bits, p)
+            assert validate_crc(bits, p) == _validate_crc_bitwise(bits, p)
+
+
+def test_slice_variants_agree():
+    engine = get_engine('100000100110000010001110110110111')
+    data = bytes(range(256)) * 3 + b'abc'
+    assert engine.remainder(data, 1) == engine.remainder(data, 4) == engine.remainder(data, 8)
+
+
+def test_binary_frame_matches_bitstr():
+    from crc import build_frame, create_frame, check_frame, Frame
+    frame = build_frame("Hello", "1011")
+    assert frame.to_bitstr() == create_frame("Hello", "1011")
+    assert Frame.from_base64(frame.to_base64(), len(frame)) == frame
+    assert check_frame(frame, "1011")
+    frame.flip_bit(len(frame) // 2)
+    assert not check_frame(frame, "1011")
+
+
+def test_stream_matches_compute():
+    from crc import CrcStream, FrameValidator, build_frame, text_to_bitstr
+    poly = "100000100110000010001110110110111"
+    data = ("Hello " * 100).encode()
+    stream = CrcStream(poly)
+    for i in range(0, len(data), 13):
+        stream.update(data[i:i + 13])
+    assert stream.bitdigest() == compute_crc_remainder(text_to_bitstr("Hello " * 100), poly)
+    frame = build_frame("Hello", "1011")
+    validator = FrameValidator("1011", len(frame))
+    for b in frame.data:
+        validator.update(bytes([b]))
+    assert validator.is_valid()
+
+
+def test_catalog_check_values():
+    from crc import CRC_CATALOG, get_engine, build_frame, check_frame
+    for name, spec in CRC_CATALOG.items():
+        assert get_engine(name).remainder(b"123456789") == spec.check, name
+        assert check_frame(build_frame("Hello", name), name)
+    assert get_engine("crc-32") is get_engine("CRC-32")
+
+
+def test_batch_matches_scalar():
+    import pytest
+    np = pytest.importorskip("numpy")
+    from crc import build_frame, check_frame, check_frames_batch, crc_batch, compute_crc_bytes
+    payloads = [b"", b"a", b"Hello", b"x" * 37]
+    buf = np.frombuffer(b"".join(payloads), dtype=np.uint8)
+    got = crc_batch(buf, "CRC-32", lengths=[len(p) for p in payloads])
+    assert [int(c) for c in got] == [int(compute_crc_bytes(p, "CRC-32"), 2) for p in payloads]
+    frames = [build_frame(t, "1011") for t in ("Hello", "abc", "zażółć")]
+    frames[1].flip_bit(5)
+    assert list(check_frames_batch(frames, "1011")) == [check_frame(f, "1011") for f in frames]
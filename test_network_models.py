@@ -0,0 +1,107 @@
+"""Testy historii pakietów (PacketStore / Node): bufor cykliczny wpisów i ramek."""
+
+import pytest
+from crc import Frame
+from network_models import MAX_NODE_ID, Node, Packet
+from node_process import NodeServer
+
+
+def _packet(sender, text='abc', data=b'', status='received', crc_valid=True):
+    frame = Frame(data, len(data) * 8) if data else None
+    packet = Packet(sender, 0, text, frame, '1011')
+    packet.status = status
+    packet.crc_valid = crc_valid
+    return packet
+
+
+def test_history_wraps_around():
+    node = Node(0, 0, history_capacity=3)
+    for i in range(5):
+        node.add_packet(_packet(i, text=f"m{i}"))
+    page, total = node.get_history(limit=10)
+    assert total == 3
+    assert [r.sender for r in page] == [4, 3, 2]
+    assert [r.seq for r in page] == [5, 4, 3]
+    assert [r.message for r in page] == ['m4', 'm3', 'm2']
+    assert node.stats.received == 5
+    # filtr przechodzi tylko po wpisach, które zostały w buforze
+    page, total = node.get_history(sender=1)
+    assert (page, total) == ([], 0)
+    page, total = node.get_history(sender=3)
+    assert total == 1 and page[0].seq == 4
+
+
+def test_frame_buffer_overwrite():
+    node = Node(0, 0, history_capacity=10, frame_buffer_size=10)
+    frames = [bytes([i]) * 4 for i in range(1, 5)]
+    for i, data in enumerate(frames):
+        node.add_packet(_packet(i, data=data))
+    page, total = node.get_history(limit=10, with_frames=True)
+    assert total == 4
+    # 16 B ramek w buforze 10 B: dwie najstarsze nadpisane, najnowsza zawinięta przez koniec bufora
+    assert [data for _, data in page] == [frames[3], frames[2], None, None]
+    assert [r.frame_len for r, _ in page] == [32] * 4
+
+
+def test_frame_larger_than_buffer_is_not_stored():
+    node = Node(0, 0, frame_buffer_size=4)
+    node.add_packet(_packet(0, data=b'12345'))
+    (record, data), = node.get_history(with_frames=True)[0]
+    assert data is None and record.frame_len == 40
+
+
+def test_rejected_packet_leaves_history_untouched():
+    node = Node(0, 0, history_capacity=2)
+    node.add_packet(_packet(1, text='ok1'))
+    node.add_packet(_packet(2, text='ok2'))
+    with pytest.raises(TypeError):
+        node.add_packet(_packet('A', text='bad'))
+    page, total = node.get_history()
+    assert total == 2
+    assert [(r.seq, r.sender, r.status, r.message) for r in page] == [(2, 2, 'received', 'ok2'), (1, 1, 'received', 'ok1')]
+    assert node.stats.received == 2
+    node.add_packet(_packet(3))
+    assert node.get_history()[0][0].seq == 3
+
+
+@pytest.mark.parametrize('capacity', [0, -1])
+def test_non_positive_capacity_is_rejected(capacity):
+    with pytest.raises(ValueError):
+        Node(0, 0, history_capacity=capacity)
+
+
+def test_filtered_history_scans_outside_lock():
+    node = Node(0, 0, history_capacity=4)
+    for i in range(4):
+        node.add_packet(_packet(i % 2, text=f"m{i}"))
+
+    class Lock:
+        """Blokada węzła, między fazami zapytania dopisuje nowy pakiet (nadpisuje najstarszy wpis)."""
+        entered = 0
+
+        def __enter__(self):
+            self.entered += 1
+            if self.entered == 2:
+                node.add_packet(_packet(5, text='m4'))
+
+        def __exit__(self, *exc):
+            return False
+
+    lock = Lock()
+    page, total = node.get_history(sender=0, lock=lock)
+    assert lock.entered == 2  # kopia kolumn i budowa strony - skanowanie bez blokady
+    assert total == 2
+    # 'm0' (seq 1) nadpisany w trakcie zapytania - wypada ze strony
+    assert [r.message for r in page] == ['m2']
+
+
+def test_sender_outside_column_range_is_rejected_up_front():
+    node = Node(0, 0)
+    with pytest.raises(OverflowError):
+        node.add_packet(_packet(MAX_NODE_ID + 1))
+    server = NodeServer(0, 0)
+    for sender in (2 ** 40, MAX_NODE_ID + 1, -1, True):
+        packet, error = server._prepare_packet({'from': sender, 'message': 'x', 'frame_bits': '1011'})
+        assert packet is None and error['reason'].startswith("Niepoprawny nadawca"), sender
+    packet, error = server._prepare_packet({'from': MAX_NODE_ID, 'message': 'x', 'frame_bits': '1011'})
+    assert error is None and packet.sender_id == MAX_NODE_ID
@@ -0,0 +1,141 @@
+"""Testy protokołu węzłów: read_message i read_message_async na tych samych strumieniach."""
+
+import asyncio
+import io
+import pytest
+from crc import build_frame
+from protocol import MessageTooLarge, encode_message, read_message, read_message_async
+
+POLY = '1' + format(0x1021, '016b')
+
+
+def _wire(msg, framed=True) -> bytes:
+    return b''.join(bytes(b) for b in encode_message(msg, framed))
+
+
+class _Trickle(io.RawIOBase):
+    """Strumień oddający najwyżej `piece` bajtów na odczyt (kawałki jak z gniazda)."""
+
+    def __init__(self, data: bytes, piece: int):
+        self.data = data
+        self.pos = 0
+        self.piece = piece
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        n = min(len(buf), self.piece, len(self.data) - self.pos)
+        buf[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+def _read_sync(data, max_size=None, piece=None):
+    rfile = io.BufferedReader(_Trickle(data, piece or len(data) or 1))
+    out = []
+    while True:
+        try:
+            msg, framed = read_message(rfile, max_size)
+        except MessageTooLarge as e:
+            out.append(e)
+            continue
+        if msg is None:
+            return out
+        out.append((msg, framed))
+
+
+def _read_async(data, max_size=None, piece=None, **kwargs):
+    async def run():
+        reader = asyncio.StreamReader(limit=(max_size or 64 * 1024) + 1)
+
+        async def feed():
+            step = piece or len(data) or 1
+            for i in range(0, len(data), step):
+                reader.feed_data(data[i:i + step])
+                await asyncio.sleep(0)  # czytnik dostaje kolejne kawałki osobno
+            reader.feed_eof()
+
+        feeder = asyncio.create_task(feed())
+        out = []
+        while True:
+            try:
+                msg, framed = await read_message_async(reader, max_size, **kwargs)
+            except MessageTooLarge as e:
+                out.append(e)
+                continue
+            if msg is None:
+                break
+            out.append((msg, framed))
+        await feeder
+        return out
+    return asyncio.run(run())
+
+
+readers = pytest.mark.parametrize('read', [_read_sync, _read_async], ids=['sync', 'async'])
+
+
+@readers
+def test_framed_round_trip(read):
+    frame = build_frame('Hello, CRC!', POLY)
+    bad = frame.copy()
+    bad.flip_bit(5)
+    data = (_wire({'type': 'message', 'id': 1, 'frame': frame, 'crc_poly': POLY})
+            + _wire({'type': 'control', 'cmd': 'get_status', 'id': 2})
+            + _wire({'type': 'message', 'id': 3, 'frame': bad, 'crc_poly': POLY}))
+    (first, framed), (second, _), (third, _) = read(data)
+    assert framed is True
+    assert bytes(first['frame'].data) == bytes(frame.data) and len(first['frame']) == len(frame)
+    assert first['_crc_ok'] is True and third['_crc_ok'] is False
+    assert second == {'type': 'control', 'cmd': 'get_status', 'id': 2}
+
+
+@readers
+def test_legacy_json_line(read):
+    frame = build_frame('abc', POLY)
+    data = b'\n' + _wire({'type': 'message', 'id': 7, 'frame': frame}, framed=False) + b'  '
+    [(msg, framed)] = read(data)
+    assert framed is False
+    assert msg['id'] == 7 and msg['frame'] == frame.to_base64() and msg['frame_len'] == len(frame)
+
+
+@readers
+def test_oversize_is_skipped_and_connection_stays_usable(read):
+    big = build_frame('x' * 4000, POLY)
+    data = (_wire({'type': 'message', 'id': 1, 'frame': big, 'crc_poly': POLY})
+            + _wire({'type': 'control', 'cmd': 'get_status', 'id': 2})
+            + _wire({'type': 'control', 'cmd': 'get_status', 'id': 3, 'pad': 'y' * 4000}, framed=False)
+            + _wire({'type': 'control', 'cmd': 'get_status', 'id': 4}, framed=False))
+    too_large, (after, _), too_long, (last, framed) = read(data, max_size=1024)
+    assert isinstance(too_large, MessageTooLarge) and too_large.msg['id'] == 1 and too_large.framed
+    assert after['id'] == 2
+    assert isinstance(too_long, MessageTooLarge) and not too_long.framed
+    assert last['id'] == 4 and framed is False
+
+
+@readers
+@pytest.mark.parametrize('piece', [1, 3, 7, 100])
+def test_split_segments(read, piece):
+    frame = build_frame('split across segments' * 20, POLY)
+    data = (_wire({'type': 'message', 'id': 1, 'frame': frame, 'crc_poly': POLY})
+            + _wire({'type': 'control', 'cmd': 'repair', 'id': 2}, framed=False)
+            + _wire({'type': 'message', 'id': 3, 'frame': frame, 'crc_poly': POLY}))
+    results = read(data, piece=piece)
+    assert [msg['id'] for msg, _ in results] == [1, 2, 3]
+    assert all(bytes(results[i][0]['frame'].data) == bytes(frame.data) and results[i][0]['_crc_ok'] for i in (0, 2))
+
+
+def test_async_large_frame_is_left_for_executor():
+    frame = build_frame('z' * 100, POLY)
+    data = _wire({'type': 'message', 'id': 1, 'frame': frame, 'crc_poly': POLY})
+    [(msg, _)] = _read_async(data, validate_max_bits=len(frame) - 1)
+    assert '_crc_ok' not in msg and bytes(msg['frame'].data) == bytes(frame.data)
+    [(msg, _)] = _read_async(data, validate_max_bits=len(frame))
+    assert msg['_crc_ok'] is True
+
+
+@readers
+def test_truncated_body_raises_eof(read):
+    data = _wire({'type': 'message', 'id': 1, 'frame': build_frame('abc', POLY), 'crc_poly': POLY})
+    with pytest.raises((EOFError, asyncio.IncompleteReadError)):
+        read(data[:-1])
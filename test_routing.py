@@ -0,0 +1,159 @@
+"""Testy trasowania: tablica tras (RoutingTable) i przekazywanie ramki po trasie przez węzły."""
+
+import json
+import random
+import socket
+import threading
+import pytest
+import node_process
+from crc import build_frame
+from node_client import ConnectionPool, send_control_to_node
+from node_process import NodeServer
+from protocol import encode_message
+from routing import RoutingTable
+
+
+def _check_against_full_recompute(table: RoutingTable, edges):
+    fresh = RoutingTable(table.n, edges)
+    for dst in range(table.n):
+        for src in range(table.n):
+            assert table.distance(src, dst) == fresh.distance(src, dst), (src, dst)
+            path = table.path(src, dst)
+            if path is None:
+                assert fresh.path(src, dst) is None
+                continue
+            assert path[0] == src and path[-1] == dst and len(path) - 1 == table.distance(src, dst)
+            assert all(table.has_edge(a, b) for a, b in zip(path, path[1:]))
+
+
+def test_incremental_invalidation_matches_full_recompute():
+    rng = random.Random(17)
+    for n in (2, 5, 12):
+        pairs = [(a, b) for a in range(n) for b in range(a + 1, n)]
+        edges = {p for p in pairs if rng.random() < 0.3}
+        table = RoutingTable(n, edges)
+        for _ in range(150):
+            _check_against_full_recompute(table, edges)  # wszystkie drzewa w pamięci przed zmianą
+            a, b = rng.choice(pairs)
+            active = rng.random() < 0.5
+            table.set_edge(a, b, active)
+            (edges.add if active else edges.discard)((a, b))
+        _check_against_full_recompute(table, edges)
+
+
+def test_unchanged_trees_are_kept():
+    table = RoutingTable(4, [(0, 1), (1, 2), (2, 3)])
+    for dst in range(4):
+        table.path(0, dst)
+    computed = table.recomputed
+    table.set_edge(0, 2, True)  # skraca trasy do celów 0, 2 i 3 - drzewo celu 1 zostaje
+    table.path(3, 1)
+    assert table.recomputed == computed
+    table.set_edge(1, 1, True)  # pętla - bez zmian
+    table.set_edge(0, 1, True)  # już aktywne - bez zmian
+    assert table.recomputed == computed
+
+
+def test_invalid_route_is_rejected():
+    server = NodeServer(0, 65000)  # bez start() - odpowiedź z walidacji, bez połączeń
+    poly = 'CRC-16/CCITT'
+    frame = build_frame('x', poly)
+    for route in ([-5], [True], [1, 'a'], [536], [1.0], 'route', list(range(300))):
+        res = server.handle_message({'type': 'message', 'from': 9, 'message': 'x', 'frame': frame,
+                                     'crc_poly': poly, 'route': route})
+        assert res['status'] == 'error' and 'trasa' in res['reason'], route
+    assert server.node.get_history()[1] == 0
+    assert server._forward_pool is None
+
+
+def _free_base_port(count: int) -> int:
+    """Port bazowy, od którego `count` kolejnych portów jest wolnych."""
+    for _ in range(50):
+        probe = socket.socket()
+        probe.bind(('127.0.0.1', 0))
+        base = probe.getsockname()[1]
+        probe.close()
+        if base + count >= 65536:
+            continue
+        socks = []
+        try:
+            for port in range(base, base + count):
+                s = socket.socket()
+                s.bind(('127.0.0.1', port))
+                socks.append(s)
+            return base
+        except OSError:
+            continue
+        finally:
+            for s in socks:
+                s.close()
+    raise RuntimeError("Brak wolnych portów")
+
+
+def test_route_through_discarding_hop():
+    base = _free_base_port(3)
+    servers = [NodeServer(i, base) for i in range(3)]
+    ready = threading.Barrier(4)
+    for server in servers:
+        threading.Thread(target=server.start, args=(lambda _: ready.wait(5),), daemon=True).start()
+    ready.wait(5)
+    pool = ConnectionPool(base)
+    try:
+        poly = 'CRC-16/CCITT'
+        frame = build_frame('route me', poly)
+        payload = {'type': 'message', 'from': 9, 'message': 'route me', 'frame': frame, 'crc_poly': poly,
+                   'route': [1, 2]}
+
+        res = pool.request(0, payload, 5)
+        assert res['status'] == 'received' and res['node'] == 2 and res['crc_ok'] is True
+        assert [h['node'] for h in res['hops']] == [0, 1, 2]
+
+        # Węzeł 0 psuje bit kopii wysyłanej dalej - węzeł 1 odrzuca ramkę, do 2 nic nie dociera
+        assert send_control_to_node(0, {'cmd': 'set_errors', 'errors': ['BIT_FLIP']}, pool=pool)['status'] == 'ok'
+        res = pool.request(0, payload, 5)
+        assert res['status'] == 'discarded' and res['node'] == 1 and res['crc_ok'] is False
+        assert [(h['node'], h['status']) for h in res['hops']] == [(0, 'forwarded'), (1, 'discarded')]
+        assert 'bit_flip' in res['hops'][0]
+        stats = [s.node.stats for s in servers]
+        assert (stats[0].forwarded, stats[1].forwarded, stats[1].discarded, stats[2].received) == (2, 1, 1, 1)
+        assert servers[1].node.get_history(status='discarded')[1] == 1
+    finally:
+        pool.close()
+        for server in servers:
+            if server._forward_pool is not None:
+                server._forward_pool.close()
+
+
+@pytest.mark.parametrize('mode', ['thread', 'async'])
+def test_silent_next_hop_times_out(monkeypatch, mode):
+    monkeypatch.setattr(node_process, 'FORWARD_TIMEOUT', 0.3)
+    base = _free_base_port(2)
+    silent = socket.socket()  # węzeł 1: przyjmuje połączenie i nigdy nie odpowiada
+    silent.bind(('127.0.0.1', base + 1))
+    silent.listen()
+    server = NodeServer(0, base)
+    ready = threading.Event()
+    start = server.start if mode == 'thread' else server.start_async
+    threading.Thread(target=start, args=(lambda _: ready.set(),), daemon=True).start()
+    assert ready.wait(5)
+    pool = ConnectionPool(base)
+    try:
+        poly = 'CRC-16/CCITT'
+        payload = {'type': 'message', 'from': 9, 'message': 'x', 'frame': build_frame('x', poly), 'crc_poly': poly,
+                   'route': [1]}
+        for with_id in (False, True):
+            # ConnectionPool nadaje 'id'; bez 'id' - stary format, jedno żądanie na połączenie
+            if with_id:
+                res = pool.request(0, payload, 5)
+            else:
+                with socket.create_connection(('127.0.0.1', base)) as conn:
+                    conn.sendall(b''.join(bytes(b) for b in encode_message(payload, framed=False)))
+                    conn.settimeout(5)
+                    res = json.loads(conn.makefile('rb').readline())
+            assert res['status'] == 'error' and 'dalszej trasy' in res['reason'], (with_id, res)
+        assert server.metrics.snapshot()['gauges']['queue_depth'] == 0
+    finally:
+        pool.close()
+        silent.close()
+        if server._forward_pool is not None:
+            server._forward_pool.close()
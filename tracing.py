@@ -0,0 +1,201 @@
+"""
+Śledzenie opóźnień pakietu od nadawcy przez sieć do węzła (i dalej po trasie).
+
+Wiadomość z polem 'trace' (identyfikator) jest śledzona: nadawca i każdy węzeł
+zapisują etapy jako [nazwa, początek, koniec, gdzie] w nanosekundach
+time.monotonic_ns() - na jednym hoście to wspólny zegar wszystkich procesów,
+więc etapy nadawcy i węzłów można układać na jednej osi. Węzeł odsyła swoje
+etapy w odpowiedzi (pole 'trace'), nadawca dołącza je do swojego śladu.
+
+TraceRecorder zbiera ślady: histogramy czasu etapów i plik w formacie Chrome
+Trace Event (chrome://tracing, ui.perfetto.dev).
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+now = time.monotonic_ns
+
+# Ile ostatnich śladów trzyma TraceRecorder do eksportu
+MAX_TRACES = 10000
+# Granice koszyków histogramu etapów (ns): 1 us ... ~67 s, co 2x
+HISTOGRAM_BOUNDS = tuple(1000 << k for k in range(27))
+# 'gdzie' dla etapów nadawcy; węzły zapisują swój numer
+SENDER = 'sender'
+
+
+def new_trace_id() -> str:
+    return os.urandom(8).hex()
+
+
+class Trace:
+    """Etapy jednego pakietu: lista [nazwa, początek_ns, koniec_ns, gdzie]."""
+
+    __slots__ = ('trace_id', 'where', 'spans', 'meta')
+
+    def __init__(self, trace_id: str = None, where=SENDER):
+        self.trace_id = trace_id or new_trace_id()
+        self.where = where
+        self.spans = []
+        self.meta = {}
+
+    def add(self, name: str, start: int, end: int = None):
+        self.spans.append([name, start, now() if end is None else end, self.where])
+
+    def extend(self, spans):
+        """Etapy odesłane przez węzeł (pole 'trace' odpowiedzi)."""
+        if spans:
+            self.spans.extend(spans)
+
+    @property
+    def start(self) -> int:
+        return min(s[1] for s in self.spans) if self.spans else 0
+
+    @property
+    def end(self) -> int:
+        return max(s[2] for s in self.spans) if self.spans else 0
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = now()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.start)
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(trace, name: str):
+    """`with span(trace, 'etap'):` - bez kosztu, gdy trace to None."""
+    return _NO_SPAN if trace is None else _Span(trace, name)
+
+
+class StageHistogram:
+    """Histogram czasów etapu w koszykach co 2x (HISTOGRAM_BOUNDS) + liczba, suma, maksimum."""
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns: int):
+        self.counts[bisect_left(HISTOGRAM_BOUNDS, ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p: float) -> int:
+        """Górna granica koszyka, w którym leży percentyl (ns)."""
+        if not self.count:
+            return 0
+        rank = self.count * p / 100
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return min(HISTOGRAM_BOUNDS[i], self.max) if i < len(HISTOGRAM_BOUNDS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_us': round(self.total / self.count / 1e3, 1) if self.count else 0.0,
+            'p50_us': round(self.percentile(50) / 1e3, 1),
+            'p99_us': round(self.percentile(99) / 1e3, 1),
+            'max_us': round(self.max / 1e3, 1),
+            'buckets_us': {f"<={b // 1000}": c for b, c in zip(HISTOGRAM_BOUNDS, self.counts) if c},
+        }
+
+
+class TraceRecorder:
+    """
+    Zbiera zakończone ślady (wołane z dowolnego wątku): histogram na etap
+    oraz wyliczone etapy 'wire.request' (koniec wysyłania -> pierwszy etap
+    węzła), 'wire.reply' (ostatni etap węzła -> odpowiedź u nadawcy) i 'total'.
+    """
+
+    def __init__(self, max_traces: int = MAX_TRACES):
+        self.traces = deque(maxlen=max_traces)
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace):
+        durations = [(name, end - start) for name, start, end, _ in trace.spans]
+        durations += _wire_stages(trace)
+        if trace.spans:
+            durations.append(('total', trace.end - trace.start))
+        with self._lock:
+            self.traces.append(trace)
+            for name, ns in durations:
+                hist = self.histograms.get(name)
+                if hist is None:
+                    hist = self.histograms[name] = StageHistogram()
+                hist.add(max(ns, 0))
+
+    def stats(self):
+        with self._lock:
+            return {name: hist.to_dict() for name, hist in self.histograms.items()}
+
+    def summary(self) -> str:
+        lines = []
+        for name, s in sorted(self.stats().items(), key=lambda item: -item[1]['mean_us'] * item[1]['count']):
+            lines.append(f"{name:<22} n={s['count']:<7} średnio {s['mean_us']:>10.1f} us  "
+                         f"p50≤{s['p50_us']:>10.1f} us  p99≤{s['p99_us']:>10.1f} us  max {s['max_us']:>10.1f} us")
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """Ślady w formacie Chrome Trace Event: proces na nadawcę i na węzeł, ślad pakietu jako zdarzenia async."""
+        with self._lock:
+            traces = list(self.traces)
+        events = []
+        processes = {}
+        for trace in traces:
+            for name, start, end, where in trace.spans:
+                pid = processes.setdefault(where, len(processes) + 1)
+                common = {'name': name, 'cat': 'packet', 'id': trace.trace_id, 'pid': pid, 'tid': pid}
+                events.append({**common, 'ph': 'b', 'ts': start / 1e3, 'args': trace.meta})
+                events.append({**common, 'ph': 'e', 'ts': end / 1e3})
+        for where, pid in processes.items():
+            label = 'nadawca' if where == SENDER else f"węzeł {where}"
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': label}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def _wire_stages(trace: Trace):
+    sender = [s for s in trace.spans if s[3] == SENDER]
+    nodes = [s for s in trace.spans if s[3] != SENDER]
+    sent = [s[2] for s in sender if s[0] == 'client.send']
+    replied = [s[2] for s in sender if s[0] == 'client.wait']
+    if not nodes or not sent:
+        return []
+    stages = [('wire.request', min(s[1] for s in nodes) - sent[0])]
+    if replied:
+        stages.append(('wire.reply', replied[0] - max(s[2] for s in nodes)))
+    return stages